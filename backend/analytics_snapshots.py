@@ -0,0 +1,141 @@
+"""
+Versioned Analytics Snapshots
+- Each pipeline run publishes an immutable snapshot (version, run id, timestamp)
+- The API keeps the latest snapshot in memory and swaps in new versions
+- Earlier versions can be fetched and diffed
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import DESCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+
+def publish_snapshot(db, analytics, source):
+    """
+    Write `analytics` as a new immutable snapshot and return it.
+    The legacy `analytics` collection is replaced in place (never emptied).
+    """
+    db.analytics_snapshots.create_index('version', unique=True)
+    version = db.counters.find_one_and_update(
+        {'_id': 'analytics_snapshots'},
+        {'$inc': {'seq': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )['seq']
+
+    snapshot = {
+        'version': version,
+        'run_id': uuid.uuid4().hex,
+        'created_at': datetime.now(),
+        'source': source,
+        'analytics': dict(analytics)
+    }
+    db.analytics_snapshots.insert_one(snapshot.copy())
+
+    db.analytics.replace_one(
+        {'_id': 'latest'},
+        {**analytics, 'version': version, 'run_id': snapshot['run_id']},
+        upsert=True
+    )
+    db.analytics.delete_many({'_id': {'$ne': 'latest'}})
+    return snapshot
+
+
+def to_public(snapshot):
+    """JSON-friendly copy of a snapshot document"""
+    public = {k: v for k, v in snapshot.items() if k != '_id'}
+    if isinstance(public.get('created_at'), datetime):
+        public['created_at'] = public['created_at'].isoformat()
+    return public
+
+
+def _as_counts(value):
+    """Map a distribution list like [{'gender': 'F', 'count': 3}] to {'F': 3}"""
+    if not isinstance(value, list) or not all(isinstance(v, dict) and 'count' in v for v in value):
+        return None
+    counts = {}
+    for entry in value:
+        label = next((v for k, v in entry.items() if k != 'count'), None)
+        counts[str(label)] = entry['count']
+    return counts
+
+
+def diff_snapshots(old, new):
+    """Per-metric differences between two snapshots' analytics"""
+    old_analytics, new_analytics = old.get('analytics', {}), new.get('analytics', {})
+    diff = {}
+    for metric in sorted(set(old_analytics) | set(new_analytics)):
+        before, after = old_analytics.get(metric), new_analytics.get(metric)
+        before_counts, after_counts = _as_counts(before or []), _as_counts(after or [])
+        if before_counts is not None and after_counts is not None:
+            changes = {}
+            for label in sorted(set(before_counts) | set(after_counts)):
+                a, b = before_counts.get(label, 0), after_counts.get(label, 0)
+                if a != b:
+                    changes[label] = {'from': a, 'to': b, 'delta': b - a}
+            if changes:
+                diff[metric] = changes
+        elif before != after:
+            diff[metric] = {'from': before, 'to': after}
+    return diff
+
+
+class SnapshotCache:
+    """
+    Holds the latest analytics snapshot in memory.
+    A cheap version check (indexed, projected to `version`) runs at most every
+    `check_interval` seconds; new versions are swapped in with one assignment.
+    While MongoDB fails, the cached snapshot keeps being served and the
+    interval doubles per failure, up to `max_backoff` seconds.
+    """
+
+    def __init__(self, collection, check_interval=2.0, max_backoff=60.0):
+        self.collection = collection
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+        self._snapshot = None
+        self._next_check = 0.0
+        self._failures = 0
+        self._refresh_lock = threading.Lock()
+
+    def latest(self):
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        return self._snapshot
+
+    def refresh(self):
+        # Only one thread checks; the others keep serving the current snapshot
+        if not self._refresh_lock.acquire(blocking=False):
+            return self._snapshot
+        try:
+            head = self.collection.find_one({}, {'version': 1, '_id': 0}, sort=[('version', DESCENDING)])
+            current = self._snapshot
+            if head and (current is None or head['version'] != current['version']):
+                snapshot = self.collection.find_one({'version': head['version']}, {'_id': 0})
+                if snapshot:
+                    self._snapshot = snapshot
+            self._failures = 0
+            self._next_check = time.monotonic() + self.check_interval
+        except PyMongoError as e:
+            self._failures += 1
+            backoff = min(self.check_interval * 2 ** self._failures, self.max_backoff)
+            self._next_check = time.monotonic() + backoff
+            print(f"⚠️  Analytics snapshot check failed, retrying in {backoff:.0f}s: {e}")
+        finally:
+            self._refresh_lock.release()
+        return self._snapshot
+
+    def get_version(self, version):
+        current = self._snapshot
+        if current is not None and current['version'] == version:
+            return current
+        return self.collection.find_one({'version': version}, {'_id': 0})
+
+    def list_versions(self, limit=20):
+        return list(self.collection.find(
+            {}, {'_id': 0, 'version': 1, 'run_id': 1, 'created_at': 1, 'source': 1}
+        ).sort('version', DESCENDING).limit(limit))
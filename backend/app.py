@@ -1,13 +1,24 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, make_response
 from flask_cors import CORS
 from pymongo import MongoClient
+import atexit
 import os
 from datetime import datetime
 import boto3
 from werkzeug.utils import secure_filename
 import json
+import csv
+import functools
+import threading
+import time
 from dotenv import load_dotenv
-from ml_models import HealthcareMLModels
+from ml_models import HealthcareMLModels, BATCH_MODELS, TIERS, tier_name
+from sketches import AnalyticsSketches, load_merged_sketches, merge_into_document
+from analytics_snapshots import SnapshotCache, diff_snapshots, to_public
+from micro_batching import MicroBatcher
+from model_watcher import ModelWatcher
+from ingest_scoring import IngestScorer
+from metrics import REGISTRY, StageTimer, server_timing, stage_summary, trace_stages
 
 # Load environment variables from .env file
 load_dotenv()
@@ -39,7 +50,8 @@ in_memory_db = {
     'patients': [],
     'visits': [],
     'prescriptions': [],
-    'uploads': []
+    'uploads': [],
+    'predictions': []
 }
 
 # Initialize MongoDB client
@@ -52,6 +64,13 @@ try:
 except Exception as e:
     print(f"⚠️  MongoDB not available, using in-memory storage")
     db = None
+    analytics_collection = None
+
+# Latest analytics snapshot kept in memory (version-checked, swapped atomically)
+ANALYTICS_VERSION_CHECK_SECONDS = float(os.getenv('ANALYTICS_VERSION_CHECK_SECONDS', '2'))
+analytics_cache = SnapshotCache(db['analytics_snapshots'], ANALYTICS_VERSION_CHECK_SECONDS) if db is not None else None
+# Most snapshot versions one /api/analytics/versions request returns
+ANALYTICS_MAX_VERSIONS = int(os.getenv('ANALYTICS_MAX_VERSIONS', '100'))
 
 # Initialize AWS S3 client
 try:
@@ -73,6 +92,59 @@ except Exception as e:
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Streaming sketches of the writes this worker has not flushed yet. A flush
+# merges them into the shared 'api' document of the analytics_sketches
+# collection and starts them over, so workers leave no documents of their own
+# behind; reads merge the stored documents with the unflushed sketches.
+SKETCH_FLUSH_SECONDS = float(os.getenv('SKETCH_FLUSH_SECONDS', '5'))
+SKETCH_DOCUMENT_ID = 'api'
+live_sketches = AnalyticsSketches()
+live_sketches_dirty = False
+sketch_lock = threading.Lock()
+last_sketch_flush = 0.0
+
+def record_sketches(patients=None, visits=None):
+    """Fold newly written records into the live sketches and flush periodically"""
+    global last_sketch_flush, live_sketches_dirty
+    with sketch_lock:
+        if patients:
+            live_sketches.update_from_patients(patients)
+        if visits:
+            live_sketches.update_from_visits(visits)
+        live_sketches_dirty = True
+        if db is None or time.time() - last_sketch_flush < SKETCH_FLUSH_SECONDS:
+            return
+        last_sketch_flush = time.time()
+    flush_sketches()
+
+def flush_sketches():
+    """Merge the unflushed sketches into the shared document; on failure they wait for the next flush"""
+    global live_sketches, live_sketches_dirty
+    with sketch_lock:
+        if db is None or not live_sketches_dirty:
+            return
+        pending, live_sketches, live_sketches_dirty = live_sketches, AnalyticsSketches(), False
+    try:
+        merged = merge_into_document(db.analytics_sketches, SKETCH_DOCUMENT_ID, pending)
+        if not merged:
+            print("⚠️  Sketch flush kept losing to other workers; retrying at the next flush")
+    except Exception as e:
+        print(f"⚠️  Sketch flush failed: {e}")
+        merged = False
+    if not merged:
+        with sketch_lock:
+            live_sketches.merge(pending)
+            live_sketches_dirty = True
+
+# Writes since the last flush are not lost when the worker stops
+atexit.register(flush_sketches)
+
+def current_sketches():
+    """Stored sketches from every source merged with this worker's unflushed sketches"""
+    with sketch_lock:
+        local = AnalyticsSketches().merge(live_sketches)
+    return load_merged_sketches(db.analytics_sketches if db is not None else None, extra=local)
+
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -128,6 +200,9 @@ def upload_file():
                 except Exception as e:
                     print(f"⚠️  MongoDB insert failed: {e}")
 
+            if file_type == 'visits' and ML_SCORE_ON_INGEST:
+                score_uploaded_visits(filepath)
+
             return jsonify({
                 'success': True,
                 'message': 'File uploaded successfully',
@@ -170,6 +245,8 @@ def create_patient():
         
         data['created_at'] = datetime.now().isoformat()
         data['updated_at'] = datetime.now().isoformat()
+        record_sketches(patients=[data])
+        ingest_scorer.update_patient(data)
 
         # ✅ STORAGE - Job #3: Store data safely
         if db is not None:
@@ -252,6 +329,10 @@ def create_visit():
         
         data['created_at'] = datetime.now().isoformat()
         data['updated_at'] = datetime.now().isoformat()
+        record_sketches(visits=[data])
+        if ML_SCORE_ON_INGEST:
+            # Queued for the background ingest scorer; the prediction lands in `predictions`
+            ingest_scorer.submit([data.copy()])
 
         # ✅ STORAGE - Store visit data
         if db is not None:
@@ -537,18 +618,147 @@ def get_dashboard():
 # MACHINE LEARNING PREDICTION ENDPOINTS
 # =========================================================================
 
+# Prediction cache: repeat inputs for the same model version skip the model
+ML_CACHE_SIZE = int(os.getenv('ML_CACHE_SIZE', '10000'))
+ML_CACHE_TTL_SECONDS = float(os.getenv('ML_CACHE_TTL_SECONDS', '300'))
+
+# Models are loaded on first use per endpoint; compiled arrays are
+# memory-mapped, so worker processes share one page-cache copy
+ML_LAZY_LOAD = os.getenv('ML_LAZY_LOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# Inference backend: compiled (NumPy tree arrays), onnx (exported graphs
+# run by onnxruntime) or sklearn; missing artifacts fall back to the pickles
+ML_BACKEND = os.getenv('ML_BACKEND', 'compiled')
+ML_ONNX_THREADS = int(os.getenv('ML_ONNX_THREADS', '0'))
+
 # Initialize ML models (will load trained models)
-ml_models = HealthcareMLModels()
+ml_models = HealthcareMLModels(cache_size=ML_CACHE_SIZE, cache_ttl=ML_CACHE_TTL_SECONDS, lazy_load=ML_LAZY_LOAD,
+                               backend=ML_BACKEND, onnx_threads=ML_ONNX_THREADS)
+
+# Hot reload: new bundles saved to ml_models_saved/ are loaded in the
+# background and swapped in without interrupting predictions
+ML_WATCH_MODELS = os.getenv('ML_WATCH_MODELS', 'true').lower() in ('1', 'true', 'yes')
+ML_WATCH_INTERVAL_SECONDS = float(os.getenv('ML_WATCH_INTERVAL_SECONDS', '5'))
+model_watcher = ModelWatcher(ml_models, interval_seconds=ML_WATCH_INTERVAL_SECONDS)
+
+# Micro-batching: concurrent single-row predictions for a model are scored
+# together in one call (window adapts to load, capped at the values below)
+ML_MICROBATCH = os.getenv('ML_MICROBATCH', 'true').lower() in ('1', 'true', 'yes')
+ML_MICROBATCH_MAX_WAIT_MS = float(os.getenv('ML_MICROBATCH_MAX_WAIT_MS', '2'))
+ML_MICROBATCH_MAX_ROWS = int(os.getenv('ML_MICROBATCH_MAX_ROWS', '64'))
+
+prediction_batchers = {
+    (name, tier): MicroBatcher(
+        tier_name(name, tier),
+        lambda records, name=name, tier=tier: ml_models.predict_many(name, records, tier=tier),
+        max_batch_size=ML_MICROBATCH_MAX_ROWS,
+        max_wait_ms=ML_MICROBATCH_MAX_WAIT_MS
+    )
+    for name in BATCH_MODELS
+    for tier in TIERS
+}
+
+# Optional score-on-ingest (off by default): visits written through /api/visit
+# or uploaded as a visits CSV are scored in the background and stored in the
+# predictions collection
+ML_SCORE_ON_INGEST = os.getenv('ML_SCORE_ON_INGEST', 'false').lower() in ('1', 'true', 'yes')
+ML_INGEST_PATIENT_CACHE_SIZE = int(os.getenv('ML_INGEST_PATIENT_CACHE_SIZE', '10000'))
+ingest_scorer = IngestScorer(ml_models, db, in_memory_db, patient_cache_size=ML_INGEST_PATIENT_CACHE_SIZE)
+
+def score_uploaded_visits(filepath):
+    """Queue the rows of an uploaded visits CSV for scoring"""
+    try:
+        with open(filepath, newline='') as f:
+            visits = [
+                {k: v for k, v in row.items() if v not in (None, '')}
+                for row in csv.DictReader(f)
+                if row.get('visit_id') and row.get('patient_id')
+            ]
+        ingest_scorer.submit(visits)
+        print(f"🧠 Queued {len(visits)} uploaded visits for scoring")
+    except Exception as e:
+        print(f"⚠️  Could not queue uploaded visits for scoring: {e}")
+
+def explain_requested():
+    """Opt-in per-prediction feature contributions (?explain=true)"""
+    return request.args.get('explain', 'false').lower() in ('1', 'true', 'yes')
+
+def requested_tier():
+    """Model tier for this request: ?tier=fast for the compact models, full by default"""
+    return request.args.get('tier', 'full').lower()
+
+def unknown_tier_response(tier):
+    """400 response for a tier that is not in TIERS"""
+    return jsonify({
+        'success': False,
+        'message': f'Unknown tier: {tier} (expected one of {", ".join(TIERS)})'
+    }), 400
+
+def score_one(name, data, explain=False, tier='full'):
+    """Score a single record with one model, through the micro-batcher if enabled"""
+    if explain:
+        # Explanations are per request; they skip the shared batch
+        return ml_models.predict_many(name, [data], explain=True, tier=tier)[0]
+    if ML_MICROBATCH:
+        return prediction_batchers[(name, tier)].submit(data)
+    return ml_models.predict_many(name, [data], tier=tier)[0]
+
+def timed_prediction(model):
+    """
+    Time a prediction endpoint by stage into ml_prediction_stage_seconds:
+    parse (JSON body), validate, predict (including any micro-batch queue
+    wait), serialize and total, next to the encode/scale/cache/model/format
+    stages recorded by HealthcareMLModels. With ?debug=timing the request's
+    own breakdown comes back in a Server-Timing header (model stages are
+    missing when the request was scored by the micro-batcher thread).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if model in BATCH_MODELS:
+                version = ml_models.model_versions.get(model)
+            else:
+                version = ml_models.model_version
+            tier = requested_tier()
+            with trace_stages() as stages:
+                timer = g.stage_timer = StageTimer(tier_name(model, tier if tier in TIERS else 'full'), version)
+                request.get_json(silent=True)  # parsed once, reused by the view
+                timer.lap('parse')
+                response = make_response(view(*args, **kwargs))
+                timer.lap('serialize')
+                timer.finish()
+            if request.args.get('debug') == 'timing':
+                response.headers['Server-Timing'] = server_timing(stages)
+            return response
+        return wrapper
+    return decorator
 
 @app.route('/api/ml/load-models', methods=['GET'])
 def load_ml_models():
-    """Load the latest trained ML models"""
+    """
+    Load the latest trained ML models (or ?timestamp=...)
+    
+    The bundle is loaded in the background and swapped in atomically;
+    predictions keep using the current models meanwhile.
+    
+    Query params:
+    - wait: true (default) to respond once loaded, false to respond immediately
+    """
     try:
-        success = ml_models.load_models()
+        future = model_watcher.reload(request.args.get('timestamp'))
+        if request.args.get('wait', 'true').lower() == 'false':
+            return jsonify({
+                'success': True,
+                'message': 'Model reload started',
+                'model_version': ml_models.model_version
+            }), 202
+        
+        success = future.result()
         if success:
             return jsonify({
                 'success': True,
-                'message': 'ML models loaded successfully'
+                'message': 'ML models loaded successfully',
+                'model_version': ml_models.model_version
             }), 200
         else:
             return jsonify({
@@ -561,7 +771,73 @@ def load_ml_models():
             'message': f'Error loading models: {str(e)}'
         }), 500
 
+@app.route('/api/ml/models', methods=['GET'])
+def list_ml_models():
+    """Registered bundles, the active version of each model and the versions being served"""
+    registry = ml_models.registry
+    bundles = []
+    for bundle_id in registry.bundle_ids():
+        manifest = registry.manifest(bundle_id)
+        bundles.append({
+            'bundle_id': bundle_id,
+            'created_at': manifest['created_at'],
+            'models': {name: entry['metrics'] for name, entry in manifest['models'].items()}
+        })
+    return jsonify({
+        'success': True,
+        'active': registry.active(),
+        'serving': ml_models.model_versions,
+        'bundles': bundles
+    }), 200
+
+@app.route('/api/ml/models/activate', methods=['POST'])
+def activate_ml_models():
+    """
+    Point models at a registered bundle (roll forward or back) and reload
+    
+    Body: {"bundle_id": "...", "models": ["risk_score"]}  (models optional: all in the bundle)
+    """
+    try:
+        data = request.json or {}
+        active = ml_models.registry.activate(data.get('bundle_id'), data.get('models'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    success = model_watcher.reload().result()
+    return jsonify({
+        'success': success,
+        'active': active,
+        'serving': ml_models.model_versions
+    }), 200 if success else 500
+
+@app.route('/api/patient/<patient_id>/risk', methods=['GET'])
+def get_patient_risk(patient_id):
+    """
+    Current risk for a patient: the stored predictions of their latest
+    scored visit (written by score-on-ingest or batch_scoring.py)
+    """
+    try:
+        prediction = ingest_scorer.current(patient_id)
+        if prediction is None:
+            return jsonify({
+                'success': False,
+                'message': f'No predictions for patient {patient_id}'
+            }), 404
+        return jsonify({
+            'success': True,
+            'prediction': prediction
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 @app.route('/api/ml/predict/readmission', methods=['POST'])
+@timed_prediction('readmission')
 def predict_readmission():
     """
     Predict 30-day readmission risk
@@ -587,8 +863,14 @@ def predict_readmission():
                 'message': f'Missing required fields: {", ".join(missing_fields)}'
             }), 400
         
+        tier = requested_tier()
+        if tier not in TIERS:
+            return unknown_tier_response(tier)
+        
         # Make prediction
-        result = ml_models.predict_readmission(patient_data)
+        g.stage_timer.lap('validate')
+        result = score_one('readmission', patient_data, explain_requested(), tier)
+        g.stage_timer.lap('predict')
         
         if 'error' in result:
             return jsonify({
@@ -608,6 +890,7 @@ def predict_readmission():
         }), 500
 
 @app.route('/api/ml/predict/risk-score', methods=['POST'])
+@timed_prediction('risk_score')
 def predict_risk_score():
     """
     Predict overall health risk score (0-100)
@@ -632,8 +915,14 @@ def predict_risk_score():
                 'message': f'Missing required fields: {", ".join(missing_fields)}'
             }), 400
         
+        tier = requested_tier()
+        if tier not in TIERS:
+            return unknown_tier_response(tier)
+        
         # Make prediction
-        result = ml_models.predict_risk_score(patient_data)
+        g.stage_timer.lap('validate')
+        result = score_one('risk_score', patient_data, explain_requested(), tier)
+        g.stage_timer.lap('predict')
         
         if 'error' in result:
             return jsonify({
@@ -653,6 +942,7 @@ def predict_risk_score():
         }), 500
 
 @app.route('/api/ml/predict/disease-progression', methods=['POST'])
+@timed_prediction('disease_progression')
 def predict_disease_progression():
     """
     Predict disease progression trend (Improving/Stable/Worsening)
@@ -677,8 +967,14 @@ def predict_disease_progression():
                 'message': f'Missing required fields: {", ".join(missing_fields)}'
             }), 400
         
+        tier = requested_tier()
+        if tier not in TIERS:
+            return unknown_tier_response(tier)
+        
         # Make prediction
-        result = ml_models.predict_disease_progression(visit_data)
+        g.stage_timer.lap('validate')
+        result = score_one('disease_progression', visit_data, explain_requested(), tier)
+        g.stage_timer.lap('predict')
         
         if 'error' in result:
             return jsonify({
@@ -698,6 +994,7 @@ def predict_disease_progression():
         }), 500
 
 @app.route('/api/ml/batch-predict', methods=['POST'])
+@timed_prediction('batch_predict')
 def batch_predict():
     """
     Make all three predictions for a patient in one request
@@ -714,10 +1011,15 @@ def batch_predict():
         risk_score_data = {**patient_data, **{k: v for k, v in visit_data.items() if k != 'prev_severity' and k != 'previous_visit_gap_days'}}
         
         results = {}
+        explain = explain_requested()
+        tier = requested_tier()
+        if tier not in TIERS:
+            return unknown_tier_response(tier)
+        g.stage_timer.lap('validate')
         
         # Try readmission prediction
         try:
-            readmission = ml_models.predict_readmission(readmission_data)
+            readmission = ml_models.predict_readmission(readmission_data, explain, tier)
             if 'error' not in readmission:
                 results['readmission'] = readmission
             else:
@@ -727,7 +1029,7 @@ def batch_predict():
         
         # Try risk score prediction
         try:
-            risk_score = ml_models.predict_risk_score(risk_score_data)
+            risk_score = ml_models.predict_risk_score(risk_score_data, explain, tier)
             if 'error' not in risk_score:
                 results['risk_score'] = risk_score
             else:
@@ -737,13 +1039,14 @@ def batch_predict():
         
         # Try disease progression prediction
         try:
-            progression = ml_models.predict_disease_progression(visit_data)
+            progression = ml_models.predict_disease_progression(visit_data, explain, tier)
             if 'error' not in progression:
                 results['disease_progression'] = progression
             else:
                 results['disease_progression'] = {'error': progression['error']}
         except Exception as e:
             results['disease_progression'] = {'error': str(e)}
+        g.stage_timer.lap('predict')
         
         return jsonify({
             'success': True,
@@ -758,14 +1061,121 @@ def batch_predict():
             'message': str(e)
         }), 500
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Service metrics (prediction queue depth, batch sizes, latencies)
+
+    Query params:
+    - format: json (default) or prometheus
+    """
+    if request.args.get('format') == 'prometheus':
+        return Response(REGISTRY.to_prometheus(), mimetype='text/plain; version=0.0.4')
+    return jsonify({
+        'success': True,
+        'metrics': REGISTRY.to_json()
+    }), 200
+
+@app.route('/api/ml/latency', methods=['GET'])
+def get_prediction_latency():
+    """Prediction latency by model, model version and stage (seconds)"""
+    return jsonify({
+        'success': True,
+        'serving': ml_models.model_versions,
+        'latency': stage_summary()
+    }), 200
+
+@app.route('/api/ml/cache', methods=['GET'])
+def get_prediction_cache_stats():
+    """Prediction cache size and per-model hit rates"""
+    return jsonify({
+        'success': True,
+        'model_version': ml_models.model_version,
+        'cache': ml_models.prediction_cache.stats()
+    }), 200
+
+# Upper bound on records per vectorized batch request
+ML_MAX_BATCH_ROWS = int(os.getenv('ML_MAX_BATCH_ROWS', '10000'))
+
+@app.route('/api/ml/predict/batch', methods=['POST'])
+@timed_prediction('batch')
+def predict_batch():
+    """
+    Score many patient/visit records in one request
+    
+    Records are encoded once into a matrix and each model runs once over
+    the whole batch. Results come back in input order; a record that
+    cannot be scored gets an 'error' entry for that model.
+    
+    Request body:
+    - records: list of dicts with the fields of every requested model
+    - models: optional subset of readmission, risk_score, disease_progression
+    """
+    try:
+        data = request.json or {}
+        records = data.get('records')
+        models = data.get('models') or BATCH_MODELS
+        
+        if not isinstance(records, list) or not records:
+            return jsonify({
+                'success': False,
+                'message': "'records' must be a non-empty list"
+            }), 400
+        
+        if len(records) > ML_MAX_BATCH_ROWS:
+            return jsonify({
+                'success': False,
+                'message': f'Too many records: {len(records)} (max {ML_MAX_BATCH_ROWS})'
+            }), 400
+        
+        unknown = [m for m in models if m not in BATCH_MODELS]
+        if unknown:
+            return jsonify({
+                'success': False,
+                'message': f'Unknown models: {", ".join(map(str, unknown))}'
+            }), 400
+        
+        tier = requested_tier()
+        if tier not in TIERS:
+            return unknown_tier_response(tier)
+        
+        g.stage_timer.lap('validate')
+        results = ml_models.predict_batch(records, models, explain_requested(), tier)
+        g.stage_timer.lap('predict')
+        failed = sum(1 for r in results if any('error' in out for out in r.values()))
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'failed': failed,
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 @app.route('/api/get-analytics', methods=['GET'])
 def get_analytics():
     """
-    Get analytics data calculated from PySpark processing
+    Get analytics data calculated from PySpark processing (latest snapshot)
     """
     try:
-        analytics_data = analytics_collection.find_one({}, {'_id': 0})
+        snapshot = analytics_cache.latest() if analytics_cache is not None else None
+        
+        if snapshot:
+            return jsonify({
+                'success': True,
+                'analytics': snapshot['analytics'],
+                'version': snapshot['version'],
+                'run_id': snapshot['run_id'],
+                'created_at': to_public(snapshot)['created_at']
+            }), 200
         
+        # Data written before versioned snapshots existed
+        analytics_data = analytics_collection.find_one({}, {'_id': 0}) if analytics_collection is not None else None
         if analytics_data:
             return jsonify({
                 'success': True,
@@ -783,6 +1193,198 @@ def get_analytics():
             'message': str(e)
         }), 500
 
+@app.route('/api/analytics/versions', methods=['GET'])
+def list_analytics_versions():
+    """
+    List analytics snapshot versions, newest first
+
+    Query params:
+    - limit: number of versions to return (default: 20, at most ANALYTICS_MAX_VERSIONS)
+    """
+    try:
+        try:
+            limit = int(request.args.get('limit', 20))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return jsonify({'success': False, 'message': 'limit must be a positive integer'}), 400
+        limit = min(limit, ANALYTICS_MAX_VERSIONS)
+        if analytics_cache is None:
+            return jsonify({'success': False, 'message': 'MongoDB not available'}), 503
+        
+        versions = [to_public(v) for v in analytics_cache.list_versions(limit)]
+        return jsonify({
+            'success': True,
+            'count': len(versions),
+            'versions': versions
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/analytics/versions/<int:version>', methods=['GET'])
+def get_analytics_version(version):
+    """
+    Fetch one analytics snapshot by version
+    """
+    try:
+        if analytics_cache is None:
+            return jsonify({'success': False, 'message': 'MongoDB not available'}), 503
+        
+        snapshot = analytics_cache.get_version(version)
+        if not snapshot:
+            return jsonify({'success': False, 'message': f'Analytics version {version} not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'snapshot': to_public(snapshot)
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/analytics/diff', methods=['GET'])
+def diff_analytics_versions():
+    """
+    Diff two analytics snapshots
+
+    Query params:
+    - from: older version (required)
+    - to: newer version (default: latest)
+    """
+    try:
+        if analytics_cache is None:
+            return jsonify({'success': False, 'message': 'MongoDB not available'}), 503
+        
+        try:
+            from_version = int(request.args['from'])
+            to_version = int(request.args['to']) if 'to' in request.args else None
+        except (KeyError, ValueError):
+            return jsonify({'success': False, 'message': "Query param 'from' (and optional 'to') must be version numbers"}), 400
+        
+        old = analytics_cache.get_version(from_version)
+        new = analytics_cache.get_version(to_version) if to_version is not None else analytics_cache.latest()
+        if not old or not new:
+            return jsonify({'success': False, 'message': 'Analytics version not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'from': {'version': old['version'], 'run_id': old['run_id']},
+            'to': {'version': new['version'], 'run_id': new['run_id']},
+            'diff': diff_snapshots(old, new)
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+# =========================================================================
+# APPROXIMATE ANALYTICS (STREAMING SKETCHES)
+# =========================================================================
+
+@app.route('/api/analytics/distinct-patients', methods=['GET'])
+def get_distinct_patients():
+    """
+    Approximate number of distinct patients (HyperLogLog)
+    """
+    try:
+        hll = current_sketches().distinct_patients
+        estimate = hll.count()
+        error = hll.relative_error()
+        return jsonify({
+            'success': True,
+            'distinct_patients': estimate,
+            'error_bounds': {
+                'relative_std_error': round(error, 5),
+                'confidence_95': [int(round(estimate * (1 - 2 * error))), int(round(estimate * (1 + 2 * error)))]
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/analytics/percentiles', methods=['GET'])
+def get_percentiles():
+    """
+    Approximate percentiles (KLL) of length_of_stay, severity_score or bmi
+
+    Query params:
+    - field: one of length_of_stay, severity_score, bmi (default: all)
+    - q: comma-separated quantiles between 0 and 1 (default: 0.5,0.9,0.99)
+    """
+    try:
+        sketches = current_sketches()
+        field = request.args.get('field')
+        if field is not None and field not in sketches.quantiles:
+            return jsonify({
+                'success': False,
+                'message': f'Unknown field: {field}. Use one of: {", ".join(sketches.quantiles)}'
+            }), 400
+        try:
+            qs = [float(q) for q in request.args.get('q', '0.5,0.9,0.99').split(',')]
+            if not all(0 <= q <= 1 for q in qs):  # also rejects nan
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'q must be a comma-separated list of numbers between 0 and 1'
+            }), 400
+        
+        fields = [field] if field else list(sketches.quantiles)
+        percentiles = {}
+        for name in fields:
+            kll = sketches.quantiles[name]
+            percentiles[name] = {
+                'count': kll.count(),
+                'quantiles': {str(q): v for q, v in zip(qs, kll.quantiles(qs))},
+                'error_bounds': {'normalized_rank_error_99': round(kll.rank_error(), 5)}
+            }
+        
+        return jsonify({
+            'success': True,
+            'percentiles': percentiles
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/analytics/top-diagnoses', methods=['GET'])
+def get_top_diagnoses():
+    """
+    Approximate most frequent diagnoses (Space-Saving)
+
+    Query params:
+    - k: number of diagnoses to return (default: 10)
+    """
+    try:
+        try:
+            k = int(request.args.get('k', 10))
+            if k < 1:
+                raise ValueError
+        except ValueError:
+            return jsonify({'success': False, 'message': 'k must be a positive integer'}), 400
+        top_k = current_sketches().top_diagnoses
+        return jsonify({
+            'success': True,
+            'total_visits': top_k.n,
+            'top_diagnoses': top_k.top(k),
+            'error_bounds': {'max_overcount': top_k.max_overcount()}
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
 if __name__ == '__main__':
     print("🚀 Starting Healthcare Analytics Backend Server...")
     print(f"📊 MongoDB: {'✅ Connected' if db is not None else '❌ Not connected'}")
@@ -798,5 +1400,9 @@ if __name__ == '__main__':
     except Exception as e:
         print(f"🧠 ML Models: ⚠️  {e}")
     
+    if ML_WATCH_MODELS:
+        model_watcher.start()
+        print(f"🧠 ML Models: watching {ml_models.model_dir}/ for new bundles")
+    
     print("=" * 50)
     app.run(debug=False, host='0.0.0.0', port=5000)
@@ -0,0 +1,426 @@
+"""
+Bulk Offline Scoring
+Scores every processed visit with the three ML models and writes the results
+to the `predictions` collection (one document per visit), so dashboards read
+precomputed scores instead of calling the prediction API per patient.
+
+- Streams visits_processed in (patient_id, visit_date) order in chunks and
+  joins each chunk with its patients from patients_processed
+- Scores chunks in a process pool (compiled models are memory-mapped, so the
+  workers share one copy)
+- Writes with unordered bulk upserts
+- Checkpoints the last fully written patient_id, so a rerun resumes there
+- With --feature-store, scores the already encoded matrices of a feature
+  store version instead (see feature_store.py), resuming by row
+
+Usage:
+    python batch_scoring.py                          # resume (or start) the job
+    python batch_scoring.py --restart                # rescore everything
+    python batch_scoring.py --chunk-size 20000 --workers 8
+    python batch_scoring.py --explain                # also store feature contributions
+    python batch_scoring.py --feature-store          # score the latest materialized features
+"""
+
+import argparse
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import ASCENDING, MongoClient, UpdateOne
+
+from ml_models import BATCH_MODELS, MODEL_FEATURES, HealthcareMLModels
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB Configuration
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+MONGO_DB = os.getenv('MONGO_DB', 'healthcare_analytics')
+
+CHECKPOINT_ID = 'predictions'
+STORE_CHECKPOINT_ID = 'predictions_feature_store'
+
+PATIENT_FIELDS = ['patient_id', 'age', 'gender', 'bmi', 'smoker_status', 'alcohol_use']
+VISIT_FIELDS = [
+    'visit_id', 'patient_id', 'visit_date', 'severity_score', 'length_of_stay',
+    'previous_visit_gap_days', 'number_of_previous_visits'
+]
+
+
+def _clean(value):
+    """None for missing values (NaN from pandas-written documents)"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def build_records(visits, patients, last_severity=None):
+    """
+    Join a chunk of visits (sorted by patient_id, visit_date) with their
+    patients and add prev_severity from each patient's previous visit
+
+    Args:
+        visits: visit documents
+        patients: patient_id -> patient document
+        last_severity: (patient_id, severity) carried over from the previous chunk
+
+    Returns:
+        list of feature records, one per visit with a visit_id (a visit
+        without one has no key to store its predictions under, but is
+        still the previous visit of the next one)
+    """
+    records = []
+    prev_patient, prev_severity = last_severity or (None, None)
+    for visit in visits:
+        patient = patients.get(visit['patient_id'], {})
+        record = {field: _clean(patient.get(field)) for field in PATIENT_FIELDS}
+        record.update({field: _clean(visit.get(field)) for field in VISIT_FIELDS})
+        record['prev_severity'] = prev_severity if visit['patient_id'] == prev_patient else None
+        prev_patient, prev_severity = visit['patient_id'], record['severity_score']
+        if record['visit_id']:
+            records.append(record)
+    return records
+
+
+def read_chunks(db, chunk_size, after_patient=None):
+    """
+    Yield lists of visit documents in (patient_id, visit_date) order. A
+    chunk never splits a patient's visits, so each chunk ends on a patient
+    boundary that is safe to checkpoint.
+    """
+    query = {'patient_id': {'$gt': after_patient}} if after_patient is not None else {}
+    cursor = db.visits_processed.find(
+        query, {field: 1 for field in VISIT_FIELDS} | {'_id': 0}
+    ).sort([('patient_id', ASCENDING), ('visit_date', ASCENDING)]).batch_size(min(chunk_size, 10000))
+
+    chunk = []
+    for visit in cursor:
+        if len(chunk) >= chunk_size and visit['patient_id'] != chunk[-1]['patient_id']:
+            yield chunk
+            chunk = []
+        chunk.append(visit)
+    if chunk:
+        yield chunk
+
+
+def fetch_patients(db, patient_ids):
+    """patient_id -> patient document for one chunk"""
+    cursor = db.patients_processed.find(
+        {'patient_id': {'$in': patient_ids}}, {field: 1 for field in PATIENT_FIELDS} | {'_id': 0}
+    )
+    return {patient['patient_id']: patient for patient in cursor}
+
+
+# --- Worker processes ------------------------------------------------------
+
+_worker_models = None
+
+
+def _init_worker(model_dir):
+    global _worker_models
+    _worker_models = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    if not _worker_models.load_models():
+        raise RuntimeError(f"No trained models in {model_dir}")
+
+
+def prediction_document(record, result):
+    """
+    Stored form of one visit's predictions. severity_score and
+    number_of_previous_visits are kept so the next ingested visit of the
+    patient can derive its history features from this document.
+    """
+    # Progression is trained on follow-up visits only; a first visit has none
+    if record.get('prev_severity') is None:
+        result['disease_progression'] = None
+    return {
+        'visit_id': record['visit_id'],
+        'patient_id': record['patient_id'],
+        'visit_date': record.get('visit_date'),
+        'severity_score': record.get('severity_score'),
+        'number_of_previous_visits': record.get('number_of_previous_visits'),
+        **result
+    }
+
+
+def score_chunk(records, explain=False):
+    """Prediction documents for a list of feature records (runs in a worker)"""
+    results = _worker_models.predict_batch(records, BATCH_MODELS, explain)
+    return [prediction_document(record, result) for record, result in zip(records, results)]
+
+
+# --- Job -------------------------------------------------------------------
+
+def write_predictions(db, documents, job):
+    """Unordered bulk upsert of one chunk's predictions; returns rows written"""
+    if not documents:
+        return 0
+    now = datetime.now()
+    requests = [
+        UpdateOne({'_id': doc['visit_id']},
+                  {'$set': {**doc, 'model_versions': job['model_versions'], 'source': 'batch',
+                            'job_id': job['job_id'], 'scored_at': now}},
+                  upsert=True)
+        for doc in documents
+    ]
+    result = db.predictions.bulk_write(requests, ordered=False)
+    return result.upserted_count + result.matched_count
+
+
+def run(db, model_dir='ml_models_saved', chunk_size=10000, workers=None, restart=False, explain=False):
+    """Score all visits (resuming from the checkpoint) and return the job summary"""
+    models = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    if not models.load_models():
+        raise RuntimeError("No trained models found. Run train_models.py first.")
+    model_versions = models.model_versions
+
+    db.visits_processed.create_index([('patient_id', ASCENDING), ('visit_date', ASCENDING)])
+    db.patients_processed.create_index('patient_id')
+    db.predictions.create_index([('patient_id', ASCENDING), ('visit_date', ASCENDING)])
+
+    checkpoint = None if restart else db.scoring_checkpoints.find_one({'_id': CHECKPOINT_ID})
+    if checkpoint and checkpoint['model_versions'] != model_versions:
+        print("⚠️  Models changed since the checkpoint; rescoring from the start")
+        checkpoint = None
+    if checkpoint and checkpoint.get('completed_at'):
+        checkpoint = None
+
+    if checkpoint:
+        job = checkpoint
+        job.setdefault('rows_skipped', 0)  # checkpoints written before skipped rows were counted
+        print(f"↩️  Resuming job {job['job_id']} after patient {job['last_patient_id']} "
+              f"({job['rows_written']:,} rows already written)")
+    else:
+        job = {
+            '_id': CHECKPOINT_ID,
+            'job_id': datetime.now().strftime("%Y%m%d_%H%M%S"),
+            'model_versions': model_versions,
+            'last_patient_id': None,
+            'rows_written': 0,
+            'rows_skipped': 0,
+            'started_at': datetime.now(),
+            'completed_at': None
+        }
+        db.scoring_checkpoints.replace_one({'_id': CHECKPOINT_ID}, job, upsert=True)
+
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    rows_this_run = 0
+    carry = None  # (patient_id, severity) of the last visit read
+    in_flight = deque()
+
+    def drain_one():
+        nonlocal rows_this_run
+        future, last_patient, skipped = in_flight.popleft()
+        rows = write_predictions(db, future.result(), job)
+        rows_this_run += rows
+        job['rows_written'] += rows
+        job['rows_skipped'] += skipped
+        job['last_patient_id'] = last_patient
+        job['updated_at'] = datetime.now()
+        db.scoring_checkpoints.replace_one({'_id': CHECKPOINT_ID}, job, upsert=True)
+        elapsed = time.perf_counter() - start
+        print(f"   ✅ {job['rows_written']:,} rows ({rows_this_run / elapsed * 3600:,.0f} rows/hour)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_dir,)) as pool:
+        for visits in read_chunks(db, chunk_size, job['last_patient_id']):
+            patients = fetch_patients(db, list({visit['patient_id'] for visit in visits}))
+            records = build_records(visits, patients, carry)
+            last = visits[-1]
+            carry = (last['patient_id'], _clean(last.get('severity_score')))
+            in_flight.append((pool.submit(score_chunk, records, explain), last['patient_id'],
+                              len(visits) - len(records)))
+            # Bounded pipeline: chunks are written (and checkpointed) in read order
+            if len(in_flight) >= 2 * workers:
+                drain_one()
+        while in_flight:
+            drain_one()
+
+    elapsed = time.perf_counter() - start
+    job['completed_at'] = datetime.now()
+    db.scoring_checkpoints.replace_one({'_id': CHECKPOINT_ID}, job, upsert=True)
+    return {
+        'job_id': job['job_id'],
+        'rows_written': job['rows_written'],
+        'rows_skipped': job['rows_skipped'],
+        'rows_this_run': rows_this_run,
+        'seconds': elapsed,
+        'rows_per_hour': rows_this_run / elapsed * 3600 if elapsed else 0.0,
+        'model_versions': model_versions
+    }
+
+
+# --- Feature store job ------------------------------------------------------
+# feature_store (and with it pandas) is imported only here: ingest_scoring
+# shares this module on the serving path
+
+STORE_ARRAYS = ['visit_features', 'progression_features', 'progression_row', 'complete_readmission',
+                'complete_risk_score', 'complete_disease_progression', 'visit_id', 'patient_id', 'visit_date',
+                'severity_score', 'number_of_previous_visits']
+
+
+def _numbers(array):
+    """Python floats of an array slice, None for NaN"""
+    return [None if value != value else value for value in array.tolist()]
+
+
+def score_store_rows(models, arrays, start, stop, explain=False):
+    """Prediction documents for rows [start, stop) of a feature store version"""
+    from feature_store import MATRIX_COLUMNS, MODEL_ARRAYS
+
+    results = [{} for _ in range(stop - start)]
+    progression_row = np.asarray(arrays['progression_row'][start:stop])
+    for name in BATCH_MODELS:
+        matrix = MODEL_ARRAYS[name][0]
+        if matrix == 'visit_features':
+            rows = np.arange(stop - start)
+            X = arrays[matrix][start:stop]
+            complete = np.asarray(arrays[f'complete_{name}'][start:stop])
+        else:
+            rows = np.flatnonzero(progression_row >= 0)
+            X = arrays[matrix][progression_row[rows]]
+            complete = arrays[f'complete_{name}'][progression_row[rows]]
+        columns = [MATRIX_COLUMNS[matrix].index(col) for col in MODEL_FEATURES[name]]
+        for i in rows[~complete]:
+            results[i][name] = {"error": "Missing feature values"}
+        if complete.any():
+            outputs = models.predict_encoded(name, X[complete][:, columns], explain)
+            for i, output in zip(rows[complete], outputs):
+                results[i][name] = output
+
+    # Slices converted once: per-element memmap reads are slow
+    prev_severity = [None] * (stop - start)
+    has_previous = np.flatnonzero(progression_row >= 0)
+    for i, value in zip(has_previous, _numbers(arrays['progression_features'][progression_row[has_previous], 0])):
+        prev_severity[i] = value
+    columns = zip(
+        arrays['visit_id'][start:stop].tolist(),
+        arrays['patient_id'][start:stop].tolist(),
+        arrays['visit_date'][start:stop].astype('datetime64[us]').tolist(),
+        _numbers(arrays['severity_score'][start:stop]),
+        _numbers(arrays['number_of_previous_visits'][start:stop]),
+        prev_severity,
+        results
+    )
+    documents = []
+    for visit_id, patient_id, visit_date, severity, previous_visits, prev, result in columns:
+        if not visit_id:
+            continue  # no key to store it under
+        record = {
+            'visit_id': visit_id,
+            'patient_id': patient_id,
+            'visit_date': visit_date,
+            'severity_score': severity,
+            'number_of_previous_visits': previous_visits,
+            'prev_severity': prev
+        }
+        documents.append(prediction_document(record, result))
+    return documents
+
+
+def run_from_store(db, store_dir=None, version=None, model_dir='ml_models_saved', chunk_size=10000,
+                   restart=False, explain=False):
+    """
+    Score every visit of a feature store version (default: the latest)
+    without reading or encoding the collections; resumes by row
+    """
+    from feature_store import FEATURE_STORE_DIR, FeatureStore
+
+    models = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    if not models.load_models():
+        raise RuntimeError("No trained models found. Run train_models.py first.")
+    store = FeatureStore(store_dir or FEATURE_STORE_DIR)
+    version = version or store.latest()
+    if version is None:
+        raise RuntimeError("No materialized features. Run train_models.py or feature_store.py build first.")
+    # The matrices hold codes: they must be the ones the served models use
+    codes = store.category_codes(version)
+    served = models.category_codes
+    if any(served.get(col) != table for col, table in codes.items()):
+        raise RuntimeError(f"Feature store version {version} was encoded with other category codes than "
+                           f"the served models; materialize it again with them")
+    arrays = store.arrays(version, STORE_ARRAYS)
+    total = len(arrays['visit_id'])
+    model_versions = models.model_versions
+
+    db.predictions.create_index([('patient_id', ASCENDING), ('visit_date', ASCENDING)])
+    checkpoint = None if restart else db.scoring_checkpoints.find_one({'_id': STORE_CHECKPOINT_ID})
+    if checkpoint and (checkpoint['model_versions'] != model_versions or checkpoint['feature_version'] != version
+                       or checkpoint.get('completed_at')):
+        checkpoint = None
+    job = checkpoint or {
+        '_id': STORE_CHECKPOINT_ID,
+        'job_id': datetime.now().strftime("%Y%m%d_%H%M%S"),
+        'model_versions': model_versions,
+        'feature_version': version,
+        'last_row': 0,
+        'rows_written': 0,
+        'rows_skipped': 0,
+        'started_at': datetime.now(),
+        'completed_at': None
+    }
+    if checkpoint:
+        job.setdefault('rows_skipped', 0)
+        print(f"↩️  Resuming job {job['job_id']} at row {job['last_row']:,} of {total:,}")
+
+    start = time.perf_counter()
+    rows_this_run = 0
+    for row in range(job['last_row'], total, chunk_size):
+        stop = min(row + chunk_size, total)
+        documents = score_store_rows(models, arrays, row, stop, explain)
+        rows = write_predictions(db, documents, job)
+        rows_this_run += rows
+        job['rows_written'] += rows
+        job['rows_skipped'] += stop - row - len(documents)
+        job['last_row'] = stop
+        job['updated_at'] = datetime.now()
+        db.scoring_checkpoints.replace_one({'_id': STORE_CHECKPOINT_ID}, job, upsert=True)
+        elapsed = time.perf_counter() - start
+        print(f"   ✅ {job['rows_written']:,} rows ({rows_this_run / elapsed * 3600:,.0f} rows/hour)")
+
+    elapsed = time.perf_counter() - start
+    job['completed_at'] = datetime.now()
+    db.scoring_checkpoints.replace_one({'_id': STORE_CHECKPOINT_ID}, job, upsert=True)
+    return {
+        'job_id': job['job_id'],
+        'rows_written': job['rows_written'],
+        'rows_skipped': job['rows_skipped'],
+        'rows_this_run': rows_this_run,
+        'seconds': elapsed,
+        'rows_per_hour': rows_this_run / elapsed * 3600 if elapsed else 0.0,
+        'model_versions': model_versions,
+        'feature_version': version
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score all visits into the predictions collection")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--model-dir', default='ml_models_saved')
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and rescore everything")
+    parser.add_argument('--explain', action='store_true', help="store per-feature contributions with each prediction")
+    parser.add_argument('--feature-store', nargs='?', const='', default=None, metavar='DIR',
+                        help="score the encoded features materialized in this feature store "
+                             "(default: FEATURE_STORE_DIR)")
+    parser.add_argument('--feature-version', default=None, help="feature store version (default: the latest)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧮 BULK OFFLINE SCORING")
+    print("=" * 60)
+    client = MongoClient(MONGO_URI)
+    if args.feature_store is not None:
+        summary = run_from_store(client[MONGO_DB], args.feature_store, args.feature_version, args.model_dir,
+                                 args.chunk_size, args.restart, args.explain)
+    else:
+        summary = run(client[MONGO_DB], args.model_dir, args.chunk_size, args.workers, args.restart, args.explain)
+    client.close()
+    print(f"\n✅ Job {summary['job_id']}: {summary['rows_written']:,} predictions "
+          f"({summary['rows_this_run']:,} this run, {summary['rows_per_hour']:,.0f} rows/hour)")
+    if summary['rows_skipped']:
+        print(f"⚠️  {summary['rows_skipped']:,} visits without a visit_id were not scored")
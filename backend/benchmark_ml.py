@@ -0,0 +1,668 @@
+"""
+ML Inference Benchmarks
+Trains the three models on synthetic data (no MongoDB needed) and measures
+prediction throughput and latency.
+
+Usage:
+    python benchmark_ml.py                 # all benchmarks
+    python benchmark_ml.py batch           # vectorized batch scoring
+    python benchmark_ml.py latency         # single-row latency
+    python benchmark_ml.py engine          # compiled tree engine vs scikit-learn
+    python benchmark_ml.py microbatch      # concurrent requests with/without micro-batching
+    python benchmark_ml.py cache           # prediction cache hits vs misses
+    python benchmark_ml.py startup         # worker memory and time to first request per artifact format
+    python benchmark_ml.py explain         # per-prediction feature contributions vs scoring
+    python benchmark_ml.py onnx            # onnxruntime backend vs compiled vs scikit-learn
+    python benchmark_ml.py training        # sequential single-core vs parallel multi-core training
+    python benchmark_ml.py incremental     # full retraining vs an incremental update with new visits
+    python benchmark_ml.py risk_engine     # risk model engines: fit time, latency and R² by data size
+    python benchmark_ml.py synthetic       # synthetic data: per-row loop vs vectorized, sharded CSV writing
+    python benchmark_ml.py pipeline        # training preprocessing: fillna + LabelEncoder vs FeaturePipeline
+    python benchmark_ml.py rebalance       # readmission rebalancing strategies: time, peak memory, AUC by rows
+
+The prediction cache is disabled except in the cache benchmark, so repeated
+runs measure the models.
+"""
+
+import copy
+import io
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ml_models import (
+    HealthcareMLModels, BATCH_MODELS, CATEGORICAL_COLS, COMPILED_MODELS, PROGRESSION_FEATURES, READMISSION_FEATURES,
+    REBALANCE_STRATEGIES, RISK_ENGINES, RISK_FEATURES, available_cores, build_estimator, rebalance_classes
+)
+from micro_batching import MicroBatcher
+from prediction_cache import PredictionCache
+from synthetic_data import generate, generate_frames, generate_patients, generate_visits
+from tree_engine import CompiledEnsemble
+
+
+def synthetic_frames(n_patients=2000, seed=42):
+    """Patients and visits frames with the columns the models expect (see synthetic_data.py)"""
+    frames = generate_frames(n_patients, seed)
+    return frames['patients'], frames['visits']
+
+
+def train_synthetic_models(n_patients=2000, seed=42):
+    """HealthcareMLModels trained on synthetic data, plus the visits used"""
+    patients_df, visits_df = synthetic_frames(n_patients, seed)
+    ml = HealthcareMLModels(cache_size=0)
+    ml.train_readmission_model(*ml.prepare_readmission_data(patients_df, visits_df))
+    ml.train_risk_scoring_model(*ml.prepare_risk_score_data(patients_df, visits_df))
+    ml.train_disease_progression_model(*ml.prepare_disease_progression_data(visits_df))
+    return ml, patients_df, visits_df
+
+
+def sample_records(patients_df, visits_df, n, seed=0):
+    """Raw request-style records (unencoded) for scoring"""
+    rng = np.random.default_rng(seed)
+    merged = visits_df.merge(patients_df, on='patient_id', how='left')
+    rows = merged.iloc[rng.integers(0, len(merged), n)]
+    records = rows[READMISSION_FEATURES].to_dict('records')
+    for record, prev in zip(records, rng.integers(1, 11, n)):
+        record['prev_severity'] = int(prev)
+    return records
+
+
+def subset(record, feature_cols):
+    return {col: record[col] for col in feature_cols}
+
+
+def timed(fn, repeat=1):
+    """Best wall-clock time of `repeat` runs, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def latency_stats(fn, args, repeat=2000):
+    """(median, p99) latency of fn(arg) in microseconds, cycling through args"""
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        arg = args[i % len(args)]
+        start = time.perf_counter()
+        fn(arg)
+        samples[i] = time.perf_counter() - start
+    return np.median(samples) * 1e6, np.percentile(samples, 99) * 1e6
+
+
+def legacy_preprocess(ml, patient_data):
+    """The original per-call preprocessing: DataFrame + LabelEncoder + scaler"""
+    X = pd.DataFrame([patient_data])
+    for col in CATEGORICAL_COLS:
+        if col in X.columns and col in ml.label_encoders:
+            X[col] = ml.label_encoders[col].transform(X[col].astype(str))
+    return ml.scaler.transform(X)
+
+
+def bench_latency(ml, records):
+    print("\n" + "=" * 60)
+    print("⏱️  SINGLE-ROW LATENCY (median / p99, microseconds)")
+    print("=" * 60)
+
+    readmission_rows = [subset(r, READMISSION_FEATURES) for r in records[:500]]
+    risk_rows = [subset(r, RISK_FEATURES) for r in records[:500]]
+    progression_rows = [subset(r, PROGRESSION_FEATURES) for r in records[:500]]
+
+    rows = [
+        ("Legacy preprocessing (DataFrame)", lambda r: legacy_preprocess(ml, r), readmission_rows, 500),
+        ("Compiled preprocessing", lambda r: ml._encode_row('readmission', r), readmission_rows, 20000),
+        ("predict_readmission", ml.predict_readmission, readmission_rows, 500),
+        ("predict_risk_score", ml.predict_risk_score, risk_rows, 500),
+        ("predict_disease_progression", ml.predict_disease_progression, progression_rows, 500),
+    ]
+    for label, fn, args, repeat in rows:
+        median, p99 = latency_stats(fn, args, repeat)
+        print(f"   {label:<34} {median:>9,.1f} / {p99:>9,.1f}")
+
+
+def bench_batch(ml, records):
+    print("\n" + "=" * 60)
+    print("📦 VECTORIZED BATCH SCORING (3 models per row)")
+    print("=" * 60)
+
+    n_loop = 200
+    loop_time = timed(lambda: [
+        (ml.predict_readmission(subset(r, READMISSION_FEATURES)),
+         ml.predict_risk_score(subset(r, RISK_FEATURES)),
+         ml.predict_disease_progression(subset(r, PROGRESSION_FEATURES)))
+        for r in records[:n_loop]
+    ])
+    print(f"   Per-row predict_* loop: {n_loop / loop_time:>10,.0f} rows/s")
+
+    for size in [1000, 10000, len(records)]:
+        batch = records[:size]
+        batch_time = timed(lambda: ml.predict_batch(batch), repeat=3)
+        print(f"   predict_batch({size:>6,}):  {size / batch_time:>10,.0f} rows/s")
+
+
+def compiled_copy(ml):
+    """Copy of `ml` serving the compiled (NumPy) form of each model"""
+    compiled = copy.copy(ml)
+    compiled.prediction_cache = PredictionCache(ml.prediction_cache.max_entries, ml.prediction_cache.ttl)
+    for attr in COMPILED_MODELS:
+        setattr(compiled, attr, CompiledEnsemble.from_sklearn(getattr(ml, attr)))
+    compiled.compile_preprocessing()
+    return compiled
+
+
+def bench_engine(ml, records):
+    print("\n" + "=" * 60)
+    print("🌲 COMPILED TREE ENGINE vs SCIKIT-LEARN")
+    print("=" * 60)
+    compiled = compiled_copy(ml)
+
+    print("   Model size (pickle vs arrays):")
+    for attr in COMPILED_MODELS:
+        sklearn_bytes = len(pickle.dumps(getattr(ml, attr)))
+        print(f"      {attr:<28} {sklearn_bytes / 1024:>9,.0f} KB -> {getattr(compiled, attr).nbytes / 1024:>7,.0f} KB")
+
+    readmission_rows = [subset(r, READMISSION_FEATURES) for r in records[:500]]
+    print("   Single-row predict_readmission (median / p99 us):")
+    for label, models in [("scikit-learn", ml), ("compiled", compiled)]:
+        median, p99 = latency_stats(models.predict_readmission, readmission_rows, 500)
+        print(f"      {label:<28} {median:>9,.1f} / {p99:>9,.1f}")
+
+    print("   predict_batch (3 models, rows/s):")
+    for size in [100, 10000]:
+        batch = records[:size]
+        for label, models in [("scikit-learn", ml), ("compiled", compiled)]:
+            batch_time = timed(lambda: models.predict_batch(batch), repeat=3)
+            print(f"      {label + f' ({size:,})':<28} {size / batch_time:>10,.0f}")
+
+
+def bench_microbatch(ml, records, n_threads=16, n_requests=1600):
+    print("\n" + "=" * 60)
+    print(f"🧵 MICRO-BATCHING ({n_threads} concurrent callers, readmission)")
+    print("=" * 60)
+    rows = [subset(r, READMISSION_FEATURES) for r in records[:n_requests]]
+
+    for label, models in [("scikit-learn", ml), ("compiled", compiled_copy(ml))]:
+        batcher = MicroBatcher('readmission', lambda batch: models.predict_many('readmission', batch))
+        for mode, fn in [("direct", models.predict_readmission), ("micro-batched", batcher.submit)]:
+            def caller(k):
+                for row in rows[k::n_threads]:
+                    fn(row)
+            threads = [threading.Thread(target=caller, args=(k,)) for k in range(n_threads)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            print(f"   {label + ', ' + mode:<34} {len(rows) / elapsed:>10,.0f} req/s")
+
+
+def bench_cache(ml, records):
+    print("\n" + "=" * 60)
+    print("🗄️  PREDICTION CACHE (median / p99, microseconds)")
+    print("=" * 60)
+    cached = copy.copy(ml)
+    cached.prediction_cache = PredictionCache(max_entries=10000, ttl_seconds=300)
+
+    rows = [subset(r, READMISSION_FEATURES) for r in records[:500]]
+    for label, models in [("scikit-learn", cached), ("compiled", compiled_copy(cached))]:
+        models.prediction_cache.clear()
+        miss = latency_stats(models.predict_readmission, rows, 500)
+        hit = latency_stats(models.predict_readmission, rows, 5000)
+        print(f"   {label + ', miss':<34} {miss[0]:>9,.1f} / {miss[1]:>9,.1f}")
+        print(f"   {label + ', hit':<34} {hit[0]:>9,.1f} / {hit[1]:>9,.1f}")
+
+    # Half the batch repeats earlier rows
+    batch = records[:5000]
+    cached.prediction_cache.clear()
+    cold = timed(lambda: cached.predict_batch(batch))
+    cached.prediction_cache.clear()
+    cached.predict_batch(records[:2500])
+    warm = timed(lambda: cached.predict_batch(batch))
+    print(f"   predict_batch(5,000), cold cache: {len(batch) / cold:>10,.0f} rows/s")
+    print(f"   predict_batch(5,000), 50% cached: {len(batch) / warm:>10,.0f} rows/s")
+    print(f"   cache stats: {cached.prediction_cache.stats()['models']}")
+
+
+def bench_explain(ml, records, size=10000):
+    print("\n" + "=" * 60)
+    print(f"🔍 FEATURE ATTRIBUTIONS ({size:,} rows, compiled models)")
+    print("=" * 60)
+    compiled = compiled_copy(ml)
+    batch = records[:size]
+    bundle = compiled._bundle
+
+    for name in BATCH_MODELS:
+        model, _ = bundle.model(name)
+        pipeline = bundle.preprocessing[name]
+        X, _ = pipeline.encode_records(batch)
+        X = pipeline.scale_rows(X)
+        model.contributions(X[:1])  # path table is built once per model
+        score = timed(lambda: model.predict_proba(X) if name != 'risk_score' else model.predict(X), repeat=3)
+        explain = timed(lambda: model.contributions(X), repeat=3)
+        print(f"   {name:<22} score {score * 1000:>7,.1f} ms   contributions {explain * 1000:>7,.1f} ms"
+              f"   ({explain / score:.1f}x)")
+
+    plain = timed(lambda: compiled.predict_batch(batch), repeat=3)
+    explained = timed(lambda: compiled.predict_batch(batch, explain=True), repeat=3)
+    print(f"   predict_batch (3 models): {plain * 1000:,.0f} ms, with explain=True {explained * 1000:,.0f} ms")
+
+
+# Serve from the ONNX graphs in a fresh interpreter and report what got imported
+ONNX_IMPORTS_WORKER = r"""
+import json, sys
+from ml_models import HealthcareMLModels
+ml = HealthcareMLModels(model_dir=sys.argv[1], cache_size=0, backend='onnx', lazy_load=False)
+ml.load_models()
+ml.predict_batch([json.loads(sys.argv[2])])
+print(json.dumps({name: name in sys.modules for name in ['onnxruntime', 'sklearn', 'pandas']}))
+"""
+
+
+def bench_onnx(ml, records):
+    print("\n" + "=" * 60)
+    print("🧩 ONNX RUNTIME vs COMPILED vs SCIKIT-LEARN")
+    print("=" * 60)
+    model_dir = tempfile.mkdtemp()
+    try:
+        saver = copy.copy(ml)
+        saver.model_dir = model_dir
+        saver.save_models()
+        for attr in COMPILED_MODELS:
+            size = os.path.getsize(f"{model_dir}/{attr}_{saver.model_version}.onnx")
+            print(f"   {attr + '.onnx':<34} {size / 1024:>9,.0f} KB")
+
+        backends = [
+            ("scikit-learn", HealthcareMLModels(model_dir, cache_size=0, lazy_load=False, backend='sklearn')),
+            ("compiled", HealthcareMLModels(model_dir, cache_size=0, lazy_load=False, backend='compiled')),
+            ("onnx (1 thread)", HealthcareMLModels(model_dir, cache_size=0, lazy_load=False, backend='onnx',
+                                                   onnx_threads=1)),
+            ("onnx (all cores)", HealthcareMLModels(model_dir, cache_size=0, lazy_load=False, backend='onnx')),
+        ]
+        for _, models in backends:
+            models.load_models()
+
+        readmission_rows = [subset(r, READMISSION_FEATURES) for r in records[:500]]
+        print("   Single-row predict_readmission (median / p99 us):")
+        for label, models in backends:
+            median, p99 = latency_stats(models.predict_readmission, readmission_rows, 500)
+            print(f"      {label:<28} {median:>9,.1f} / {p99:>9,.1f}")
+
+        print("   predict_batch (3 models, rows/s):")
+        for size in [100, 10000]:
+            batch = records[:size]
+            for label, models in backends:
+                batch_time = timed(lambda: models.predict_batch(batch), repeat=3)
+                print(f"      {label + f' ({size:,})':<28} {size / batch_time:>10,.0f}")
+
+        record = json.dumps({k: (v.item() if hasattr(v, 'item') else v) for k, v in records[0].items()})
+        output = subprocess.run([sys.executable, '-c', ONNX_IMPORTS_WORKER, model_dir, record],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        print(f"   Modules imported by an ONNX serving process: {read_json_line(io.StringIO(output.stdout))}")
+    finally:
+        shutil.rmtree(model_dir)
+
+
+# Run in a fresh interpreter per worker: load the models, time the first
+# request, then report memory once every worker is up
+STARTUP_WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+from ml_models import HealthcareMLModels
+imported = time.perf_counter()
+
+def memory_kb():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+model_dir, mode, record = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+ml = HealthcareMLModels(model_dir=model_dir, lazy_load=(mode == 'lazy'), cache_size=0)
+ml.load_models()
+loaded = time.perf_counter()
+assert 'error' not in ml.predict_readmission(record)
+first = time.perf_counter()
+ml.predict_risk_score(record)
+ml.predict_disease_progression(record)
+print(json.dumps({'import': imported - start, 'load': loaded - imported, 'first': first - start}), flush=True)
+sys.stdin.readline()
+print(json.dumps(memory_kb()), flush=True)
+sys.stdin.readline()
+"""
+
+
+def read_json_line(stream):
+    """Next JSON line from a worker, skipping its log output"""
+    while True:
+        line = stream.readline()
+        if not line:
+            raise RuntimeError("Worker exited early")
+        if line.startswith('{'):
+            return json.loads(line)
+
+
+def run_workers(model_dir, mode, record, n_workers):
+    """Start n_workers at once; per-worker timings and memory (all alive when measured)"""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    workers = [
+        subprocess.Popen([sys.executable, '-c', STARTUP_WORKER, model_dir, mode, json.dumps(record)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(n_workers)
+    ]
+    timings = [read_json_line(w.stdout) for w in workers]
+    for w in workers:
+        w.stdin.write("\n")
+        w.stdin.flush()
+    memory = [read_json_line(w.stdout) for w in workers]
+    for w in workers:
+        w.communicate("\n")
+    return timings, memory
+
+
+def bench_startup(ml, records, n_workers=4):
+    print("\n" + "=" * 60)
+    print(f"🚀 WORKER STARTUP ({n_workers} worker processes, all three models served)")
+    print("=" * 60)
+    record = {k: (v.item() if hasattr(v, 'item') else v) for k, v in records[0].items()}
+
+    root = tempfile.mkdtemp()
+    try:
+        saver = copy.copy(ml)
+        saver.model_dir = os.path.join(root, 'saved')
+        os.makedirs(saver.model_dir)
+        saver.save_models()
+        timestamp = saver.model_version
+        files = os.listdir(saver.model_dir)
+
+        # One directory per artifact format, so load_models() picks that format
+        layouts = [
+            ("pickles, eager", 'eager', lambda f: f.endswith('.pkl')),
+            ("compiled .npz, eager", 'eager', lambda f: f.startswith('preprocessing_')),
+            ("compiled .joblib, mmap + lazy", 'lazy', lambda f: f.endswith('.joblib') or f.startswith('preprocessing_')),
+        ]
+        print(f"   {'':<30} {'import':>7} {'load':>7} {'1st req':>8} {'RSS':>8} {'PSS':>8} {'private':>8}")
+        for label, mode, keep in layouts:
+            layout_dir = os.path.join(root, mode + str(len(os.listdir(root))))
+            os.makedirs(layout_dir)
+            for f in files:
+                if keep(f):
+                    shutil.copy(os.path.join(saver.model_dir, f), layout_dir)
+            if label.startswith("compiled .npz"):
+                for attr in COMPILED_MODELS:
+                    CompiledEnsemble.from_sklearn(getattr(ml, attr)).save(f"{layout_dir}/{attr}_{timestamp}.npz")
+
+            timings, memory = run_workers(layout_dir, mode, record, n_workers)
+            mean = lambda rows, key: sum(row[key] for row in rows) / len(rows)
+            print(f"   {label:<30} {mean(timings, 'import') * 1000:>5,.0f}ms {mean(timings, 'load') * 1000:>5,.0f}ms"
+                  f" {mean(timings, 'first') * 1000:>6,.0f}ms"
+                  f" {mean(memory, 'rss') / 1024:>6,.1f}MB {mean(memory, 'pss') / 1024:>6,.1f}MB"
+                  f" {mean(memory, 'private') / 1024:>6,.1f}MB")
+        print("   (load = load_models(); 1st req from interpreter start; memory per worker,"
+              " PSS splits shared pages between workers)")
+    finally:
+        shutil.rmtree(root)
+
+
+def bench_training(ml, records, n_patients=20000):
+    print("\n" + "=" * 60)
+    print(f"🏋️  TRAINING WALL-CLOCK ({n_patients:,} synthetic patients, {available_cores()} cores)")
+    print("=" * 60)
+
+    patients_df, visits_df = synthetic_frames(n_patients, seed=7)
+    model_dir = tempfile.mkdtemp()
+    try:
+        trainer = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+        datasets = {
+            'readmission': trainer.prepare_readmission_data(patients_df, visits_df),
+            'risk_score': trainer.prepare_risk_score_data(patients_df, visits_df),
+            'disease_progression': trainer.prepare_disease_progression_data(visits_df)
+        }
+
+        runs = [("Sequential, 1 core", 1, 1)]
+        if available_cores() > 1:
+            runs += [(f"Sequential, {available_cores()} cores per forest", None, 1),
+                     (f"Parallel processes, {available_cores()} core budget", None, None)]
+        baseline = None
+        for label, n_jobs, processes in runs:
+            seconds = timed(lambda: trainer.train_all(datasets, n_jobs=n_jobs, processes=processes))
+            baseline = baseline or seconds
+            print(f"   {label:<42} {seconds:7.1f} s  ({baseline / seconds:.2f}x)")
+        if available_cores() == 1:
+            print("   ⚠️  One core available: nothing to parallelize, run on a multi-core machine")
+    finally:
+        shutil.rmtree(model_dir)
+
+
+def bench_incremental(ml, records, n_patients=20000, new_patients=400):
+    print("\n" + "=" * 60)
+    print(f"🔁 INCREMENTAL UPDATE ({n_patients:,} trained + {new_patients:,} new synthetic patients)")
+    print("=" * 60)
+
+    patients_df, visits_df = synthetic_frames(n_patients + new_patients, seed=7)
+    new_rows = visits_df['patient_id'].isin(patients_df['patient_id'].iloc[n_patients:]).to_numpy()
+    model_dir = tempfile.mkdtemp()
+    try:
+        def train(patients, visits):
+            trainer = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+            trainer.train_all({
+                'readmission': trainer.prepare_readmission_data(patients, visits),
+                'risk_score': trainer.prepare_risk_score_data(patients, visits),
+                'disease_progression': trainer.prepare_disease_progression_data(visits)
+            }, processes=1)
+            return trainer
+
+        trainer = train(patients_df.iloc[:n_patients], visits_df[~new_rows])
+        full = timed(lambda: train(patients_df, visits_df))
+        updates = {}
+
+        def update():
+            datasets = trainer.prepare_update_data(patients_df, visits_df, new_rows)
+            updates['result'] = trainer.update_models(datasets)
+        incremental = timed(update)
+        action, report = updates['result']
+        print(f"   Full retraining ({len(visits_df):,} visits)      {full:7.2f} s")
+        print(f"   Incremental update ({int(new_rows.sum()):,} new visits)  {incremental:7.2f} s  "
+              f"({full / incremental:.0f}x faster, {action})")
+        for name, checks in report.items():
+            print(f"   {name:<20} +{checks.get('trees_added', 0)} trees, max PSI {checks.get('psi', 0):.3f}")
+    finally:
+        shutil.rmtree(model_dir)
+
+
+def bench_risk_engines(ml, records, sizes=(5000, 25000, 100000)):
+    from sklearn.metrics import r2_score
+    from sklearn.model_selection import train_test_split
+
+    print("\n" + "=" * 60)
+    print(f"🌲 RISK MODEL ENGINES ({available_cores()} cores)")
+    print("=" * 60)
+    print(f"   {'Engine':<24} {'Rows':>8} {'Fit (s)':>8} {'1 row (us)':>10} {'Batch (us/row)':>14} {'R²':>7}")
+    model_dir = tempfile.mkdtemp()
+    try:
+        for n_patients in sizes:
+            patients_df, visits_df = synthetic_frames(n_patients, seed=7)
+            encoder = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+            X, y = encoder.prepare_risk_score_data(patients_df, visits_df)
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            X_test = X_test.to_numpy(np.float64)
+            for engine in RISK_ENGINES:
+                model = build_estimator('risk_score', risk_engine=engine)
+                fit = timed(lambda: model.fit(X_train, y_train))
+                compiled = CompiledEnsemble.from_sklearn(model)
+                row, _ = latency_stats(compiled.predict, [X_test[i:i + 1] for i in range(100)], repeat=500)
+                batch = timed(lambda: compiled.predict(X_test), repeat=3)
+                r2 = r2_score(y_test, compiled.predict(X_test))
+                print(f"   {engine:<24} {len(X_train):>8,} {fit:>8.2f} {row:>10.1f} "
+                      f"{batch / len(X_test) * 1e6:>14.2f} {r2:>7.4f}")
+    finally:
+        shutil.rmtree(model_dir)
+
+
+def _loop_visits(patients_df):
+    """Synthetic visits the way train_models.py made them before synthetic_data.py (one row at a time)"""
+    visits = []
+    np.random.seed(42)
+    for _, patient in patients_df.iterrows():
+        for i in range(np.random.randint(1, 4)):
+            visits.append({
+                'visit_id': f"{patient['patient_id']}_V{i+1}",
+                'patient_id': patient['patient_id'],
+                'visit_date': pd.Timestamp.now() - pd.Timedelta(days=np.random.randint(1, 365)),
+                'severity_score': np.random.randint(1, 11),
+                'length_of_stay': np.random.randint(1, 15),
+                'previous_visit_gap_days': np.random.randint(7, 180) if i > 0 else 0,
+                'number_of_previous_visits': i,
+                'readmitted_within_30_days': np.random.choice([0, 1], p=[0.7, 0.3])
+            })
+    return pd.DataFrame(visits)
+
+
+def bench_synthetic_data(ml, records, n_patients=20000, write_patients=500000):
+    print("\n" + "=" * 60)
+    print(f"🧪 SYNTHETIC DATA ({available_cores()} cores)")
+    print("=" * 60)
+    patients_df = synthetic_frames(n_patients)[0]
+    loop = timed(lambda: _loop_visits(patients_df))
+    vectorized = timed(lambda: generate_visits(patients_df, np.random.default_rng(42)), repeat=3)
+    print(f"   Visits of {n_patients:,} patients: per-row loop {loop:.2f}s, vectorized {vectorized * 1e3:.0f}ms "
+          f"({loop / vectorized:.0f}x)")
+
+    out_dir = tempfile.mkdtemp()
+    try:
+        for processes in sorted({1, available_cores()}):
+            summary = generate(f"{out_dir}/{processes}", write_patients, processes=processes)
+            rows = sum(summary['rows'].values())
+            print(f"   {write_patients:,} patients ({rows:,} rows, {summary['shards']} CSV shards), "
+                  f"{processes} process(es): {summary['seconds']:.1f}s ({rows / summary['seconds']:,.0f} rows/s)")
+    finally:
+        shutil.rmtree(out_dir)
+
+
+def _legacy_merge(patients_df, visits_df):
+    """merge_visits before FeaturePipeline: fillna and a LabelEncoder per column"""
+    from sklearn.preprocessing import LabelEncoder
+
+    merged = visits_df.merge(patients_df, on='patient_id', how='left')
+    for col in READMISSION_FEATURES:
+        column = merged[col]
+        if column.dtype.name == 'category':
+            if 'Unknown' not in column.cat.categories:
+                column = column.cat.add_categories('Unknown')
+            merged[col] = column.fillna('Unknown')
+        elif column.dtype == 'object':
+            merged[col] = column.fillna('Unknown')
+        else:
+            merged[col] = column.fillna(column.median())
+    for col in CATEGORICAL_COLS:
+        merged[col] = LabelEncoder().fit_transform(merged[col].astype(str))
+    return merged
+
+
+def bench_feature_pipeline(ml, records, n_patients=100000):
+    print("\n" + "=" * 60)
+    print(f"🧩 FEATURE PIPELINE ({n_patients:,} patients)")
+    print("=" * 60)
+    patients_df, visits_df = synthetic_frames(n_patients)
+    rng = np.random.default_rng(0)
+    for col in ['bmi', 'smoker_status']:
+        patients_df.loc[rng.random(len(patients_df)) < 0.05, col] = None
+    for dtype in ['object', 'category']:
+        frame = patients_df.astype({col: dtype for col in CATEGORICAL_COLS})
+        legacy = timed(lambda: _legacy_merge(frame, visits_df), repeat=3)
+        pipeline = timed(lambda: HealthcareMLModels(model_dir=ml.model_dir, cache_size=0)
+                         .merge_visits(frame, visits_df), repeat=3)
+        print(f"   merge + fill + encode ({len(visits_df):,} visits, {dtype} columns): "
+              f"fillna/LabelEncoder {legacy * 1e3:,.0f} ms, FeaturePipeline {pipeline * 1e3:,.0f} ms "
+              f"({legacy / pipeline:.1f}x)")
+
+
+def readmission_rows(ml, n_rows, seed=42, shard_patients=200000):
+    """Encoded readmission training rows (X, y) of n_rows synthetic visits, generated shard by shard"""
+    encoder = HealthcareMLModels(model_dir=ml.model_dir, cache_size=0)
+    parts, total, shard = [], 0, 0
+    while total < n_rows:
+        rng = np.random.default_rng([seed, shard])
+        patients_df = generate_patients(rng, shard * shard_patients, shard_patients, id_width=8)
+        X, y = encoder.prepare_readmission_data(patients_df, generate_visits(patients_df, rng))
+        parts.append((X.to_numpy(np.float64), y.to_numpy(np.int64)))
+        total, shard = total + len(X), shard + 1
+    return (np.concatenate([rows for rows, _ in parts])[:n_rows],
+            np.concatenate([labels for _, labels in parts])[:n_rows])
+
+
+def bench_rebalance(ml, records, sizes=(100000, 1000000, 10000000), trees=20):
+    from sklearn.metrics import roc_auc_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    print("\n" + "=" * 60)
+    print(f"⚖️  READMISSION CLASS REBALANCING ({available_cores()} cores, {trees} trees)")
+    print("=" * 60)
+    X, y = readmission_rows(ml, max(sizes))
+    print(f"   {'Strategy':<14} {'Rows':>11} {'Fit rows':>11} {'Rebalance (s)':>13} {'Total (s)':>9} "
+          f"{'Peak (MB)':>9} {'AUC':>6}")
+    for n in sizes:
+        X_train, X_test, y_train, y_test = train_test_split(X[:n], y[:n], test_size=0.2, random_state=42,
+                                                            stratify=y[:n])
+        scaler = StandardScaler().fit(X_train)
+        X_train, X_test = scaler.transform(X_train), scaler.transform(X_test)
+        for strategy in REBALANCE_STRATEGIES:
+            model = build_estimator('readmission', {'n_estimators': trees}, n_jobs=-1)
+            # Peak of the NumPy allocations made by the rebalancing and the fit
+            tracemalloc.start()
+            start = time.perf_counter()
+            X_fit, y_fit, _ = rebalance_classes(X_train, y_train, strategy)
+            rebalanced = time.perf_counter() - start
+            model.fit(X_fit, y_fit)
+            total = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            fit_rows = len(X_fit)
+            del X_fit, y_fit
+            auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+            print(f"   {strategy:<14} {len(X_train):>11,} {fit_rows:>11,} {rebalanced:>13.2f} {total:>9.1f} "
+                  f"{peak / 2 ** 20:>9,.0f} {auc:>6.4f}", flush=True)
+
+
+BENCHMARKS = {
+    'batch': bench_batch,
+    'latency': bench_latency,
+    'engine': bench_engine,
+    'microbatch': bench_microbatch,
+    'cache': bench_cache,
+    'startup': bench_startup,
+    'explain': bench_explain,
+    'onnx': bench_onnx,
+    'training': bench_training,
+    'incremental': bench_incremental,
+    'risk_engine': bench_risk_engines,
+    'synthetic': bench_synthetic_data,
+    'pipeline': bench_feature_pipeline,
+    'rebalance': bench_rebalance,
+}
+
+
+if __name__ == '__main__':
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    print("🧠 Training models on synthetic data...")
+    ml, patients_df, visits_df = train_synthetic_models()
+    records = sample_records(patients_df, visits_df, 50000)
+    for name in selected:
+        BENCHMARKS[name](ml, records)
@@ -0,0 +1,34 @@
+"""
+Shared pytest fixtures
+Models are trained on synthetic data once per session; each test gets its
+own copy, saving into its tmp_path, so retraining or saving never leaks
+into another test.
+"""
+
+import copy
+
+import pytest
+
+from benchmark_ml import train_synthetic_models
+from ml_models import HealthcareMLModels
+
+# Per-instance state that is not copied: locks, the cache and the served bundle
+_NOT_COPIED = {'model_dir', '_load_lock', 'prediction_cache', '_bundle'}
+
+
+@pytest.fixture(scope='session')
+def synthetic_models():
+    """HealthcareMLModels trained on 300 synthetic patients, plus the frames (read only)"""
+    return train_synthetic_models(n_patients=300)
+
+
+@pytest.fixture
+def trained_models(synthetic_models, tmp_path):
+    """A copy of the session's trained models with model_dir set to tmp_path, plus copies of the frames"""
+    ml, patients_df, visits_df = synthetic_models
+    trained = HealthcareMLModels(model_dir=str(tmp_path), cache_size=0)
+    for attr, value in vars(ml).items():
+        if attr not in _NOT_COPIED:
+            setattr(trained, attr, copy.deepcopy(value))
+    trained.compile_preprocessing(version=ml.model_version)
+    return trained, patients_df.copy(), visits_df.copy()
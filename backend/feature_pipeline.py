@@ -0,0 +1,227 @@
+"""
+Feature Pipelines
+One declarative preprocessing definition per model, shared by training,
+batch scoring and single-row serving:
+
+- columns: the feature order of the model's input matrix
+- fill: column -> value that replaces a missing value, learned at fit time
+  (the median of a number column, 'Unknown' for a categorical one)
+- category_codes: column -> {value string: code} of the categorical columns
+- scaling: per-column mean and scale (readmission only: the tree models of
+  the other two are trained on unscaled features)
+
+A pipeline compiles to a few NumPy operations: DataFrames (training, the
+feature store, update data) are encoded one column at a time, factorizing
+each categorical column and looking up each distinct value once; records
+and single rows are encoded from precomputed per-column lookup tables into
+float64 buffers, then scaled in place.
+
+Pipelines are immutable and serialize to JSON (to_dict / from_dict); every
+registered bundle stores the pipeline of each model in its manifest. Serving
+needs NumPy only (pandas is imported by the DataFrame methods).
+
+Requests are not imputed: a record without a feature value is an error, as
+the API has always answered. The fill values apply to training data.
+"""
+
+import numpy as np
+
+UNKNOWN = 'Unknown'
+
+
+class FeaturePipeline:
+    """Column order, fill values, category codes and scaling of one model"""
+
+    def __init__(self, columns, category_codes=None, fill=None, mean=None, scale=None):
+        self.columns = list(columns)
+        self.category_codes = {col: dict(codes) for col, codes in (category_codes or {}).items()
+                               if col in self.columns}
+        self.fill = dict(fill or {})
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        # Compiled single-row steps: (column, code table or None)
+        self.features = [(col, self.category_codes.get(col)) for col in self.columns]
+
+    @property
+    def scaled(self):
+        return self.mean is not None
+
+    @classmethod
+    def fit(cls, frame, columns, categorical=(), category_codes=None, fill=None):
+        """
+        Learn the fill values and code tables of `columns` from a training
+        frame; those given in `category_codes` / `fill` are kept as they are
+        """
+        codes, fill = dict(category_codes or {}), dict(fill or {})
+        for col in columns:
+            column = frame[col]
+            if col not in fill:
+                fill[col] = UNKNOWN if col in categorical else _median(column)
+            if col in categorical and col not in codes:
+                positions, distinct = _factorize(column)
+                values = np.unique(distinct[np.unique(positions[positions >= 0])])
+                if (positions < 0).any():
+                    values = np.union1d(values, [str(fill[col])])
+                codes[col] = {str(value): code for code, value in enumerate(values)}
+        return cls(columns, codes, fill)
+
+    def with_scaling(self, mean, scale):
+        """The same pipeline standardizing with mean / scale (e.g. a fitted StandardScaler's)"""
+        return FeaturePipeline(self.columns, self.category_codes, self.fill, mean, scale)
+
+    def encode_frame(self, frame):
+        """
+        Encoded (unscaled) float64 matrix of a DataFrame: missing values get
+        the fill values, categoricals their codes. Raises ValueError on
+        categories without a code.
+        """
+        X = np.empty((len(frame), len(self.columns)), dtype=np.float64)
+        for j, col in enumerate(self.columns):
+            column = frame[col]
+            codes = self.category_codes.get(col)
+            fill = self.fill.get(col)
+            if codes is None:
+                values = _numbers(column)
+                X[:, j] = values if fill is None else np.where(np.isnan(values), fill, values)
+                continue
+            # One lookup per distinct value present; missing values (-1) take the last slot
+            positions, distinct = _factorize(column)
+            missing = positions < 0
+            if missing.any() and fill is None:
+                raise ValueError(f"Missing value for {col}")
+            present = np.unique(positions[positions >= 0])
+            table = np.zeros(len(distinct) + 1, dtype=np.float64)
+            table[present] = self._lookup(col, distinct[present])
+            if missing.any():
+                table[-1] = self._lookup(col, [str(fill)])[0]
+            X[:, j] = table[positions]
+        return X
+
+    def _lookup(self, col, values):
+        """Codes of category strings (vectorized hash lookup); raises ValueError on unknown ones"""
+        import pandas as pd
+
+        codes = self.category_codes[col]
+        positions = pd.Index(list(codes)).get_indexer(values)
+        if (positions < 0).any():
+            raise ValueError(f"Unknown value for {col}: {values[int(np.argmax(positions < 0))]}")
+        return np.fromiter(codes.values(), dtype=np.float64, count=len(codes))[positions]
+
+    def scale_rows(self, X, out=None):
+        """Standardized rows (X itself when the pipeline does not scale and no `out` is given)"""
+        if self.mean is None:
+            if out is not None and out is not X:
+                out[...] = X
+                return out
+            return X
+        out = np.subtract(X, self.mean, out=out)
+        return np.divide(out, self.scale, out=out)
+
+    def transform(self, frame):
+        """Model input of a DataFrame: encode_frame, then scaling"""
+        return self.scale_rows(self.encode_frame(frame))
+
+    def encode_row(self, data, row):
+        """Encode one feature dict into the 1-D float64 buffer `row` (unscaled); raises ValueError"""
+        for j, (col, codes) in enumerate(self.features):
+            value = data.get(col)
+            if value is None:
+                raise ValueError(f"Missing required field: {col}")
+            if codes is not None:
+                code = codes.get(str(value))
+                if code is None:
+                    raise ValueError(f"Unknown value for {col}: {value}")
+                row[j] = code
+            else:
+                row[j] = _number(col, value)
+        return row
+
+    def encode_records(self, records):
+        """
+        Encode a list of feature dicts into one (unscaled) float64 matrix
+
+        Returns:
+            (X, errors) where errors maps row index -> message (the first
+            bad column); rows with errors are left as NaN and must not be scored
+        """
+        X = np.full((len(records), len(self.columns)), np.nan)
+        errors = {i: "Record must be a JSON object" for i, record in enumerate(records)
+                  if not isinstance(record, dict)}
+        for j, (col, codes) in enumerate(self.features):
+            column = X[:, j]
+            for i, record in enumerate(records):
+                if i in errors:
+                    continue
+                value = record.get(col)
+                if value is None:
+                    errors[i] = f"Missing required field: {col}"
+                elif codes is not None:
+                    code = codes.get(str(value))
+                    if code is None:
+                        errors[i] = f"Unknown value for {col}: {value}"
+                    else:
+                        column[i] = code
+                else:
+                    try:
+                        column[i] = _number(col, value)
+                    except ValueError as e:
+                        errors[i] = str(e)
+        return X, errors
+
+    def to_dict(self):
+        """JSON-serializable form (the 'preprocessing' of a registry manifest entry)"""
+        return {
+            'columns': self.columns,
+            'category_codes': self.category_codes,
+            'fill': self.fill,
+            'scaling': None if self.mean is None else {
+                'mean': [float(v) for v in self.mean],
+                'scale': [float(v) for v in self.scale]
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, spec, columns=None):
+        """
+        Pipeline of a to_dict() spec; specs saved before pipelines (only
+        'category_codes' and 'scaling') take `columns` and have no fill values
+        """
+        scaling = spec.get('scaling')
+        return cls(spec.get('columns', columns), spec.get('category_codes'), spec.get('fill'),
+                   scaling['mean'] if scaling else None, scaling['scale'] if scaling else None)
+
+
+def _number(col, value):
+    """Finite float of one request value; raises ValueError (nan / inf / overflow are rejected)"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        number = np.nan
+    if not np.isfinite(number):
+        raise ValueError(f"{col} must be a number")
+    return number
+
+
+def _numbers(column):
+    """float64 values of a number column (None / NA become NaN); raises ValueError on text"""
+    return column.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _median(column):
+    values = _numbers(column)
+    values = values[~np.isnan(values)]
+    return float(np.median(values)) if len(values) else 0.0
+
+
+def _factorize(column):
+    """
+    (positions, distinct): each value's index into the distinct values (as
+    strings), -1 for missing values; a categorical's own codes and categories
+    """
+    import pandas as pd
+
+    if column.dtype.name == 'category':
+        positions, distinct = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        positions, distinct = pd.factorize(column)
+    return positions, np.asarray([str(value) for value in distinct], dtype=object)
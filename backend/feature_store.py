@@ -0,0 +1,269 @@
+"""
+Feature Store
+Materializes the merged, filled and encoded model features once per data
+version, so training runs and bulk scoring reuse them instead of joining and
+encoding the raw collections again.
+
+- The data version is a hash of the source patient/visit frames and the
+  feature schema: the same data always maps to the same version
+- Each version is a directory of .npy files (memory-mapped when read) plus
+  manifest.json with the row counts, columns, label encoder classes and
+  the fill values of the missing feature values (see FeaturePipeline)
+- latest.json points at the most recently materialized version
+- Versions that are not the latest can be pruned
+
+Files of a version (one row per visit unless noted):
+    visit_features.npy          READMISSION_FEATURES (risk features are a subset), float64
+    readmission_target.npy, risk_score_target.npy
+    progression_features.npy    PROGRESSION_FEATURES, one row per follow-up visit
+    progression_target.npy      one row per follow-up visit
+    progression_row.npy         visit -> its progression row (-1 for first visits)
+    complete_<model>.npy        no missing raw feature values (others were imputed)
+    visit_id.npy, patient_id.npy, visit_date.npy, severity_score.npy,
+    number_of_previous_visits.npy  keys and raw fields for the prediction documents
+
+Usage:
+    python feature_store.py list
+    python feature_store.py build              # materialize the MongoDB data
+    python feature_store.py prune [--keep N]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ml_models import (
+    BATCH_MODELS, CATEGORICAL_COLS, MODEL_FEATURES, PROGRESSION_FEATURES, READMISSION_FEATURES, RISK_FEATURES,
+    readmission_target, risk_score_target
+)
+from model_registry import _write_json
+
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', 'feature_store')
+LATEST_FILE = 'latest.json'
+MANIFEST_FILE = 'manifest.json'
+
+# Part of every data version: changing the features or the file layout
+# invalidates the materialized versions
+SCHEMA = {
+    'format': 1,
+    'readmission': READMISSION_FEATURES,
+    'risk_score': RISK_FEATURES,
+    'disease_progression': PROGRESSION_FEATURES,
+    'categorical': CATEGORICAL_COLS
+}
+
+MATRIX_COLUMNS = {'visit_features': READMISSION_FEATURES, 'progression_features': PROGRESSION_FEATURES}
+
+# Model -> (feature matrix, target)
+MODEL_ARRAYS = {
+    'readmission': ('visit_features', 'readmission_target'),
+    'risk_score': ('visit_features', 'risk_score_target'),
+    'disease_progression': ('progression_features', 'progression_target')
+}
+
+
+def data_version(patients_df, visits_df):
+    """Content hash of the source frames and the feature schema"""
+    digest = hashlib.sha256(json.dumps(SCHEMA, sort_keys=True).encode())
+    for frame in (patients_df, visits_df):
+        digest.update(json.dumps([str(col) for col in frame.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _strings(column):
+    """Fixed-width text array (memory-mappable, unlike object arrays); '' for missing"""
+    return np.asarray(column.astype(object).where(column.notna(), '').astype(str), dtype=str)
+
+
+class FeatureStore:
+    def __init__(self, root=FEATURE_STORE_DIR):
+        self.root = root
+        self.latest_file = os.path.join(root, LATEST_FILE)
+
+    def path(self, version, name=MANIFEST_FILE):
+        return os.path.join(self.root, version, name)
+
+    def manifest(self, version):
+        """Manifest of a materialized version, or None"""
+        try:
+            with open(self.path(version)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def versions(self):
+        """Materialized versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        manifests = [self.manifest(v) for v in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, v))]
+        return [m['version'] for m in sorted(filter(None, manifests), key=lambda m: m['created_at'])]
+
+    def latest(self):
+        """Most recently materialized (or reused) version, or None"""
+        try:
+            with open(self.latest_file) as f:
+                return json.load(f)['version']
+        except FileNotFoundError:
+            return None
+
+    def materialize(self, ml, patients_df, visits_df):
+        """
+        Materialize the features of the source frames unless their version
+        already exists
+
+        Args:
+            ml: HealthcareMLModels whose merge_visits / prepare methods (and
+                label encoders, fitted here if it has none) build the features
+            patients_df, visits_df: source frames (see training_data.py)
+
+        Returns:
+            (version, built) where built is False if the version was reused
+        """
+        version = data_version(patients_df, visits_df)
+        built = self.manifest(version) is None
+        if built:
+            self._build(ml, patients_df, visits_df, version)
+        os.makedirs(self.root, exist_ok=True)
+        _write_json(self.latest_file, {'version': version, 'updated_at': datetime.now().isoformat()})
+        return version, built
+
+    def _build(self, ml, patients_df, visits_df, version):
+        merged, missing = ml.merge_visits(patients_df, visits_df, with_missing=True)
+        if len(merged) != len(visits_df):
+            raise ValueError("patients have duplicate patient_id values; visits cannot be keyed")
+        X_progression, y_progression = ml.prepare_disease_progression_data(visits_df)
+        rows = visits_df.index.get_indexer(X_progression.index)
+        progression_row = np.full(len(visits_df), -1, dtype=np.int64)
+        progression_row[rows] = np.arange(len(rows))
+        raw_progression = [col for col in PROGRESSION_FEATURES if col in visits_df.columns]
+
+        arrays = {
+            'visit_features': merged[READMISSION_FEATURES].to_numpy(np.float64),
+            'readmission_target': readmission_target(merged).to_numpy(np.int8),
+            'risk_score_target': np.asarray(risk_score_target(merged), dtype=np.float64),
+            'progression_features': X_progression.to_numpy(np.float64),
+            'progression_target': y_progression.to_numpy(np.int8),
+            'progression_row': progression_row,
+            'complete_readmission': ~missing[READMISSION_FEATURES].any(axis=1).to_numpy(),
+            'complete_risk_score': ~missing[RISK_FEATURES].any(axis=1).to_numpy(),
+            'complete_disease_progression': visits_df[raw_progression].iloc[rows].notna().all(axis=1).to_numpy(),
+            'patient_id': _strings(visits_df['patient_id']),
+            'visit_id': _strings(visits_df['visit_id']) if 'visit_id' in visits_df.columns
+            else np.full(len(visits_df), '', dtype=str),
+            'visit_date': pd.to_datetime(visits_df['visit_date'], errors='coerce').to_numpy('datetime64[ns]'),
+            'severity_score': visits_df['severity_score'].to_numpy(np.float64),
+            'number_of_previous_visits': visits_df['number_of_previous_visits'].to_numpy(np.float64)
+        }
+
+        # Written under a temporary name and renamed: a version directory is always complete
+        final = os.path.join(self.root, version)
+        staging = f"{final}.tmp{os.getpid()}"
+        os.makedirs(staging, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array)
+        _write_json(os.path.join(staging, MANIFEST_FILE), {
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'visits': len(visits_df),
+            'patients': len(patients_df),
+            'progression_rows': len(rows),
+            'schema': SCHEMA,
+            'label_classes': {col: [str(c) for c in encoder.classes_] for col, encoder in ml.label_encoders.items()},
+            'fill_values': ml.fill_values,
+            'arrays': sorted(arrays)
+        })
+        if os.path.isdir(final):
+            shutil.rmtree(staging)  # materialized concurrently
+        else:
+            os.replace(staging, final)
+
+    def arrays(self, version, names):
+        """name -> read-only memory-mapped array of a version"""
+        if self.manifest(version) is None:
+            raise ValueError(f"Unknown feature store version: {version}")
+        return {name: np.load(self.path(version, f"{name}.npy"), mmap_mode='r') for name in names}
+
+    def datasets(self, version, models=None):
+        """
+        BATCH_MODELS name -> (X, y) training data of a version, as DataFrames
+        over the memory-mapped matrices
+        """
+        result = {}
+        for name in models or BATCH_MODELS:
+            matrix, target = MODEL_ARRAYS[name]
+            arrays = self.arrays(version, [matrix, target])
+            X = pd.DataFrame(arrays[matrix], columns=MATRIX_COLUMNS[matrix], copy=False)
+            # Selecting a column subset copies it; the full matrix stays mapped
+            if MODEL_FEATURES[name] != MATRIX_COLUMNS[matrix]:
+                X = X[MODEL_FEATURES[name]]
+            result[name] = (X, pd.Series(arrays[target]))
+        return result
+
+    def label_encoders(self, version):
+        """Column -> LabelEncoder the version was encoded with"""
+        from sklearn.preprocessing import LabelEncoder
+
+        encoders = {}
+        for col, classes in self.manifest(version)['label_classes'].items():
+            encoders[col] = LabelEncoder()
+            encoders[col].classes_ = np.array(classes, dtype=object)
+        return encoders
+
+    def category_codes(self, version):
+        """Column -> value -> code, in the format of the served bundles"""
+        return {col: {c: code for code, c in enumerate(classes)}
+                for col, classes in self.manifest(version)['label_classes'].items()}
+
+    def fill_values(self, version):
+        """Model name -> column -> value missing values were filled with (none for older versions)"""
+        return self.manifest(version).get('fill_values', {})
+
+    def prune(self, keep=1):
+        """Remove all but the latest and the `keep` newest versions; returns the removed ones"""
+        versions = self.versions()
+        kept = set(versions[-keep:] if keep else []) | {self.latest()}
+        removed = [v for v in versions if v not in kept]
+        for version in removed:
+            shutil.rmtree(os.path.join(self.root, version))
+        return removed
+
+
+def main(argv):
+    store = FeatureStore()
+    command = argv[0] if argv else 'list'
+    if command == 'list':
+        latest = store.latest()
+        for version in store.versions():
+            manifest = store.manifest(version)
+            marker = '*' if version == latest else ' '
+            print(f"{marker} {version}  {manifest['created_at']}  {manifest['visits']:,} visits, "
+                  f"{manifest['patients']:,} patients")
+    elif command == 'build':
+        from pymongo import MongoClient
+        from ml_models import HealthcareMLModels
+        from training_data import MONGO_DB, MONGO_URI, load_training_frames
+
+        client = MongoClient(MONGO_URI)
+        patients_df, visits_df = load_training_frames(client[MONGO_DB])
+        client.close()
+        version, built = store.materialize(HealthcareMLModels(), patients_df, visits_df)
+        print(f"{'✅ Built' if built else '♻️  Reused'} feature store version {version}")
+    elif command == 'prune':
+        keep = int(argv[argv.index('--keep') + 1]) if '--keep' in argv else 1
+        for version in store.prune(keep):
+            print(f"🗑️  Removed {version}")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,254 @@
+"""
+Hyperparameter Search
+Successive halving over the hyperparameters of the three models: every
+candidate is scored on a small share of the training rows, the best third
+goes on with three times the rows, and so on until one remains (or the time
+budget runs out).
+
+- Fold splits are prepared once per model and cached as .npy files: the
+  readmission folds are scaled and rebalanced (SMOTE by default) like
+  train_readmission_model does, then shuffled, so the first n rows are a
+  random subsample
+- Trials run in a process pool and memory-map the cached folds: no trial
+  repeats the split, the scaling or the rebalancing, and the workers share the pages
+- Each trial fits with one core; the pool runs n_jobs of them at a time
+- With a time budget, a rung whose estimated cost (from the previous rung)
+  would overrun it is not started: the best of the last finished rung wins
+
+The candidates always include the default hyperparameters
+(ml_models.default_hyperparameters): the defaults compete on the same folds
+and rows as every other configuration.
+
+Usage (see train_models.py):
+    python train_models.py --search                     # search, then train with the best configuration
+    python train_models.py --search --search-budget 600 # stop starting rungs after ~10 minutes
+"""
+
+import itertools
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ml_models import (
+    DEFAULT_REBALANCE, DEFAULT_RISK_ENGINE, available_cores, build_estimator, default_hyperparameters, rebalance_classes
+)
+
+# Model -> hyperparameter -> values tried (the defaults are added)
+SEARCH_SPACES = {
+    'readmission': {
+        'n_estimators': [50, 100, 200, 400],
+        'max_depth': [6, 10, 14, None],
+        'min_samples_leaf': [1, 5, 20],
+        'max_features': ['sqrt', 0.5]
+    },
+    'risk_score': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [3, 5, 7],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'subsample': [1.0, 0.8]
+    },
+    'risk_score:hist_gradient_boosting': {
+        'max_iter': [100, 200, 400],
+        'max_depth': [3, 5, 8, None],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_leaf_nodes': [15, 31, 63]
+    },
+    'disease_progression': {
+        'n_estimators': [50, 100, 200, 400],
+        'max_depth': [6, 8, 12, None],
+        'min_samples_leaf': [1, 5, 20],
+        'max_features': ['sqrt', 0.5]
+    }
+}
+
+# Model -> validation metric (higher is better)
+SEARCH_METRICS = {'readmission': 'auc_roc', 'risk_score': 'r2', 'disease_progression': 'accuracy'}
+
+FOLD_PARTS = ['X_train', 'y_train', 'X_val', 'y_val']
+MIN_ROWS = 200
+
+
+def search_space(name, risk_engine=DEFAULT_RISK_ENGINE):
+    """SEARCH_SPACES entry of a model (of the risk model for an engine)"""
+    if name == 'risk_score' and risk_engine != DEFAULT_RISK_ENGINE:
+        return SEARCH_SPACES[f"{name}:{risk_engine}"]
+    return SEARCH_SPACES[name]
+
+
+def candidates(name, n_candidates, seed=42, risk_engine=DEFAULT_RISK_ENGINE):
+    """The default configuration plus up to n_candidates - 1 random others from the search space"""
+    space = search_space(name, risk_engine)
+    defaults = default_hyperparameters(name, risk_engine)
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    rng = np.random.default_rng(seed)
+    chosen = [dict(defaults)]
+    for i in rng.permutation(len(grid)):
+        if len(chosen) >= n_candidates:
+            break
+        params = grid[i]
+        if {**defaults, **params} != defaults:
+            chosen.append(params)
+    return chosen
+
+
+def cache_folds(name, X, y, cache_dir, folds=3, seed=42, rebalance=DEFAULT_REBALANCE):
+    """
+    Split, preprocess and shuffle the folds of a model once; writes
+    {cache_dir}/{name}/fold{i}_{part}.npy and returns the training rows per fold
+    (rebalance: REBALANCE_STRATEGIES entry the readmission folds are balanced with)
+    """
+    from sklearn.model_selection import KFold, StratifiedKFold
+    from sklearn.preprocessing import StandardScaler
+
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    splitter = KFold(folds, shuffle=True, random_state=seed) if name == 'risk_score' \
+        else StratifiedKFold(folds, shuffle=True, random_state=seed)
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(cache_dir, name), exist_ok=True)
+    rows = []
+    for fold, (train, val) in enumerate(splitter.split(X, y)):
+        X_train, y_train, X_val, y_val = X[train], y[train], X[val], y[val]
+        if name == 'readmission':
+            scaler = StandardScaler()
+            X_train, X_val = scaler.fit_transform(X_train), scaler.transform(X_val)
+            X_train, y_train, _ = rebalance_classes(X_train, y_train, rebalance, random_state=seed)
+        order = rng.permutation(len(X_train))
+        parts = {'X_train': X_train[order], 'y_train': y_train[order], 'X_val': X_val, 'y_val': y_val}
+        for part, array in parts.items():
+            np.save(os.path.join(cache_dir, name, f"fold{fold}_{part}.npy"), np.ascontiguousarray(array))
+        rows.append(len(X_train))
+    return rows
+
+
+def _score(name, model, X, y):
+    from sklearn.metrics import accuracy_score, r2_score, roc_auc_score
+
+    if name == 'readmission':
+        return float(roc_auc_score(y, model.predict_proba(X)[:, 1]))
+    if name == 'risk_score':
+        return float(r2_score(y, model.predict(X)))
+    return float(accuracy_score(y, model.predict(X)))
+
+
+def _run_trial(name, params, cache_dir, fold, rows, risk_engine=DEFAULT_RISK_ENGINE):
+    """Validation score of one candidate fitted on the first `rows` cached training rows of a fold"""
+    arrays = {part: np.load(os.path.join(cache_dir, name, f"fold{fold}_{part}.npy"), mmap_mode='r')
+              for part in FOLD_PARTS}
+    model = build_estimator(name, params, risk_engine=risk_engine)
+    try:
+        model.fit(arrays['X_train'][:rows], arrays['y_train'][:rows])
+        score = _score(name, model, arrays['X_val'], arrays['y_val'])
+    except ValueError:
+        score = float('nan')  # e.g. a subsample with a single class
+    return score
+
+
+def _rung_rows(total_rows, n_candidates, factor):
+    """Training rows of each rung: total_rows at the last, 1/factor of the next before it"""
+    rungs = max(1, math.floor(math.log(max(1, n_candidates), factor)) + 1)
+    rows = [max(min(MIN_ROWS, total_rows), int(total_rows / factor ** (rungs - 1 - i))) for i in range(rungs)]
+    return rows
+
+
+def search(name, X, y, n_jobs=None, n_candidates=27, factor=3, folds=3, time_budget=None,
+           cache_dir=None, seed=42, pool=None, risk_engine=DEFAULT_RISK_ENGINE, rebalance=DEFAULT_REBALANCE):
+    """
+    Successive-halving search of one model's hyperparameters
+
+    Args:
+        name: BATCH_MODELS name; X, y: its training data (prepare_* / feature store)
+        n_jobs: trials run at the same time (default: available_cores())
+        n_candidates: configurations in the first rung; factor: the share
+            kept (1/factor) and the growth of the rows per rung
+        folds: cross-validation folds each candidate is scored on (mean)
+        time_budget: seconds; no rung is started that is estimated to end later
+        cache_dir: where the folds are cached (default: a temporary directory, removed after)
+        pool: a ProcessPoolExecutor to run the trials in (default: one of n_jobs processes)
+        risk_engine: estimator searched for the risk model (RISK_ENGINES)
+        rebalance: how the readmission folds are balanced (REBALANCE_STRATEGIES)
+
+    Returns:
+        {'best': hyperparameters, 'metric', 'score' (mean validation score of
+        the best in the last rung), 'rungs': [{'rows', 'candidates',
+        'best_score', 'default_score', 'seconds'}], 'trials', 'seconds', 'stopped_early'}
+    """
+    start = time.perf_counter()
+    root = cache_dir or tempfile.mkdtemp(prefix='search_')
+    own_pool = pool is None
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=n_jobs or available_cores())
+    try:
+        fold_rows = cache_folds(name, X, y, root, folds, seed, rebalance)
+        configs = candidates(name, n_candidates, seed, risk_engine)
+        defaults = default_hyperparameters(name, risk_engine)
+        rungs, scores, stopped_early = [], {}, False
+        for rows in _rung_rows(min(fold_rows), len(configs), factor):
+            if time_budget is not None and rungs:
+                last = rungs[-1]
+                # Fit time grows about linearly with the rows
+                estimate = last['seconds'] * len(configs) / last['candidates'] * rows / last['rows']
+                if time.perf_counter() - start + estimate > time_budget:
+                    stopped_early = True
+                    break
+            default = next((i for i, params in enumerate(configs) if params == defaults), None)
+            rung_start = time.perf_counter()
+            futures = {
+                (i, fold): pool.submit(_run_trial, name, params, root, fold, rows, risk_engine)
+                for i, params in enumerate(configs) for fold in range(folds)
+            }
+            results = {key: future.result() for key, future in futures.items()}
+            scores = {i: float(np.mean([results[i, fold] for fold in range(folds)]))
+                      for i in range(len(configs))}
+            # Failed trials (nan) rank last
+            ranked = sorted(scores, key=lambda i: -np.inf if np.isnan(scores[i]) else scores[i], reverse=True)
+            rungs.append({
+                'rows': rows,
+                'candidates': len(configs),
+                'best_score': scores[ranked[0]],
+                # None once the defaults are eliminated
+                'default_score': None if default is None else scores[default],
+                'seconds': time.perf_counter() - rung_start
+            })
+            configs = [configs[i] for i in ranked[:max(1, len(configs) // factor)]]
+            if len(ranked) == 1:
+                break
+        return {
+            'best': {**defaults, **configs[0]},
+            'metric': SEARCH_METRICS[name],
+            'score': rungs[-1]['best_score'],
+            'rungs': rungs,
+            'trials': sum(rung['candidates'] for rung in rungs) * folds,
+            'seconds': time.perf_counter() - start,
+            'stopped_early': stopped_early
+        }
+    finally:
+        if own_pool:
+            pool.shutdown()
+        if cache_dir is None:
+            shutil.rmtree(root)
+
+
+def search_all(datasets, n_jobs=None, time_budget=None, **kwargs):
+    """
+    Search every model of `datasets` (name -> (X, y)) in one process pool,
+    one model after another. The time left is split evenly between the
+    models not searched yet (the first rung of each always runs).
+
+    Returns:
+        name -> search() result
+    """
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=n_jobs or available_cores()) as pool:
+        for i, (name, (X, y)) in enumerate(datasets.items()):
+            budget = None
+            if time_budget is not None:
+                budget = max(0.0, time_budget - (time.perf_counter() - start)) / (len(datasets) - i)
+            results[name] = search(name, X, y, time_budget=budget, pool=pool, **kwargs)
+    return results
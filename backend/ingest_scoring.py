@@ -0,0 +1,306 @@
+"""
+Score-on-Ingest
+- Visits written through the API are queued and scored on a background
+  thread, so the write request never waits for the models
+- Each visit is joined with its patient's features (LRU/TTL cache in front
+  of patients_processed / patients) and with its history features, derived
+  from the patient's latest stored prediction before the visit (backfilled
+  visits do not take their history from later ones)
+- Predictions are upserted into the `predictions` collection (same document
+  shape as batch_scoring.py), so "current risk for patient X" is one indexed
+  read instead of a model invocation
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from batch_scoring import PATIENT_FIELDS, _clean, prediction_document
+from metrics import REGISTRY, SIZE_BUCKETS
+from ml_models import BATCH_MODELS
+
+
+def _number(value):
+    """float, or None for missing/non-numeric values"""
+    try:
+        value = float(_clean(value))
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def precedes(last, visit):
+    """Whether a stored visit can be the previous visit of `visit` (not itself, not later)"""
+    if last.get('visit_id') == visit.get('visit_id'):
+        return False
+    current, previous = _parse_date(visit.get('visit_date')), _parse_date(last.get('visit_date'))
+    return current is None or previous is None or previous <= current
+
+
+def with_history(visit, last):
+    """
+    Fill the history features a visit does not carry itself from the
+    patient's previous scored visit (None for a first visit; a stored visit
+    that does not precede this one is not used)
+    """
+    record = dict(visit)
+    if last is None or not precedes(last, visit):
+        record.setdefault('number_of_previous_visits', 0)
+        record.setdefault('previous_visit_gap_days', 0)
+        record.setdefault('prev_severity', None)
+        return record
+    record.setdefault('prev_severity', _number(last.get('severity_score')))
+    if 'number_of_previous_visits' not in record:
+        record['number_of_previous_visits'] = (_number(last.get('number_of_previous_visits')) or 0) + 1
+    if 'previous_visit_gap_days' not in record:
+        current, previous = _parse_date(record.get('visit_date')), _parse_date(last.get('visit_date'))
+        if current is not None and previous is not None:
+            record['previous_visit_gap_days'] = (current - previous).days
+    return record
+
+
+class PatientFeatureCache:
+    """LRU/TTL cache of patient_id -> patient features"""
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, patient_id):
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            if entry is None:
+                return None
+            features, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[patient_id]
+                return None
+            self._entries.move_to_end(patient_id)
+            return features
+
+    def put(self, patient_id, features):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[patient_id] = (features, time.monotonic() + self.ttl)
+            self._entries.move_to_end(patient_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class IngestScorer:
+    """Scores ingested visits in the background and stores their predictions"""
+
+    def __init__(self, ml_models, db=None, memory_store=None, max_batch_size=256,
+                 patient_cache_size=10000, patient_ttl_seconds=300.0):
+        """
+        Args:
+            ml_models: HealthcareMLModels instance used for scoring
+            db: MongoDB database, or None to keep predictions in memory_store
+            memory_store: in-memory fallback ({'patients': [...], 'predictions': [...]})
+            max_batch_size: most queued visits scored in one call
+        """
+        self.ml_models = ml_models
+        self.db = db
+        self.memory_store = memory_store if memory_store is not None else {}
+        self.memory_store.setdefault('predictions', [])
+        self.max_batch_size = max_batch_size
+        self.patients = PatientFeatureCache(patient_cache_size, patient_ttl_seconds)
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._indexed = False
+
+        self._queue_depth = REGISTRY.gauge('ml_ingest_queue_depth', help_text='Visits waiting to be scored')
+        self._batch_size = REGISTRY.histogram('ml_ingest_batch_rows', buckets=SIZE_BUCKETS,
+                                              help_text='Visits scored per ingest batch')
+        self._lag = REGISTRY.histogram('ml_ingest_lag_seconds',
+                                       help_text='Time from ingest until the prediction is stored')
+
+    # --- Public API --------------------------------------------------------
+
+    def submit(self, visits):
+        """Queue visits for scoring; returns a Future of their prediction documents"""
+        future = Future()
+        if not visits:
+            future.set_result([])
+            return future
+        self._ensure_worker()
+        self._queue.put((list(visits), future, time.perf_counter()))
+        self._queue_depth.set(self._queue.qsize())
+        return future
+
+    def update_patient(self, patient):
+        """Refresh the cached features of a patient that was just written"""
+        self.patients.put(patient['patient_id'], {f: _clean(patient.get(f)) for f in PATIENT_FIELDS})
+
+    def current(self, patient_id, before=None):
+        """
+        Latest stored prediction of a patient, or None; with `before` (a
+        visit), the latest of another visit not later than that one
+        """
+        query = {'patient_id': patient_id}
+        if before is not None:
+            query['visit_id'] = {'$ne': before.get('visit_id')}
+            if before.get('visit_date') is not None:
+                query['visit_date'] = {'$lte': before['visit_date']}
+        if self.db is not None:
+            self._ensure_indexes()
+            return self.db.predictions.find_one(query, {'_id': 0}, sort=[('visit_date', DESCENDING)])
+        docs = [d for d in self.memory_store['predictions']
+                if d['patient_id'] == patient_id and (before is None or precedes(d, before))]
+        return max(docs, key=lambda d: str(d['visit_date'])) if docs else None
+
+    def score(self, visits):
+        """Score and store visits synchronously; returns their prediction documents"""
+        if not any(self.ml_models.model_versions.values()):
+            REGISTRY.counter('ml_ingest_visits_total', {'result': 'skipped'},
+                             'Ingested visits by scoring outcome').inc(len(visits))
+            return []
+        visits = sorted(visits, key=lambda v: (str(v['patient_id']), str(v.get('visit_date'))))
+        patient_ids = {v['patient_id'] for v in visits}
+        patients = self._patient_features(patient_ids)
+        last = self._latest_predictions(patient_ids)
+
+        records = []
+        for visit in visits:
+            previous = last.get(visit['patient_id'])
+            if previous is not None and not precedes(previous, visit):
+                # Backfilled (or re-sent) visit: its history is the stored visit before it
+                previous = self.current(visit['patient_id'], before=visit)
+            record = {**patients.get(visit['patient_id'], {}), **with_history(visit, previous)}
+            if previous is last.get(visit['patient_id']):
+                last[visit['patient_id']] = record  # later visits of the patient in this batch
+            records.append(record)
+
+        results = self.ml_models.predict_batch(records, BATCH_MODELS)
+        documents = [prediction_document(record, result) for record, result in zip(records, results)]
+        self._store(documents)
+        REGISTRY.counter('ml_ingest_visits_total', {'result': 'scored'},
+                         'Ingested visits by scoring outcome').inc(len(documents))
+        return documents
+
+    # --- Internals ---------------------------------------------------------
+
+    def _ensure_indexes(self):
+        if not self._indexed:
+            self.db.predictions.create_index([('patient_id', ASCENDING), ('visit_date', ASCENDING)])
+            self._indexed = True
+
+    def _latest_predictions(self, patient_ids):
+        """patient_id -> latest stored prediction, in one query"""
+        if self.db is not None:
+            self._ensure_indexes()
+            return {group['_id']: group['last'] for group in self.db.predictions.aggregate([
+                {'$match': {'patient_id': {'$in': list(patient_ids)}}},
+                {'$sort': {'patient_id': ASCENDING, 'visit_date': DESCENDING}},
+                {'$group': {'_id': '$patient_id', 'last': {'$first': '$$ROOT'}}},
+                {'$project': {'last._id': 0}}
+            ])}
+        latest = {}
+        for doc in self.memory_store['predictions']:
+            pid = doc['patient_id']
+            if pid in patient_ids and (pid not in latest or str(doc['visit_date']) > str(latest[pid]['visit_date'])):
+                latest[pid] = doc
+        return latest
+
+    def _patient_features(self, patient_ids):
+        """patient_id -> features, from the cache or one query per collection for misses"""
+        found, missing = {}, []
+        for pid in patient_ids:
+            features = self.patients.get(pid)
+            if features is None:
+                missing.append(pid)
+            else:
+                found[pid] = features
+
+        if missing and self.db is not None:
+            projection = {f: 1 for f in PATIENT_FIELDS} | {'_id': 0}
+            # Processed patients first; patients created through the API are not processed yet
+            for collection in (self.db.patients_processed, self.db.patients):
+                for patient in collection.find({'patient_id': {'$in': missing}}, projection):
+                    if patient['patient_id'] not in found:
+                        self.update_patient(patient)
+                        found[patient['patient_id']] = self.patients.get(patient['patient_id'])
+                missing = [pid for pid in missing if pid not in found]
+                if not missing:
+                    break
+        elif missing:
+            for patient in self.memory_store.get('patients', []):
+                if patient.get('patient_id') in missing:
+                    self.update_patient(patient)
+                    found[patient['patient_id']] = self.patients.get(patient['patient_id'])
+        return found
+
+    def _store(self, documents):
+        now = datetime.now()
+        stored = [{**doc, 'model_versions': self.ml_models.model_versions, 'source': 'ingest', 'scored_at': now}
+                  for doc in documents]
+        if self.db is not None:
+            self._ensure_indexes()
+            self.db.predictions.bulk_write(
+                [UpdateOne({'_id': doc['visit_id']}, {'$set': doc}, upsert=True) for doc in stored],
+                ordered=False
+            )
+        else:
+            ids = {doc['visit_id'] for doc in stored}
+            predictions = self.memory_store['predictions']
+            predictions[:] = [d for d in predictions if d['visit_id'] not in ids] + stored
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                worker = threading.Thread(target=self._run, name='ingest-scoring', daemon=True)
+                worker.start()
+                self._worker = worker
+
+    def _collect(self):
+        """Block for the first submission, then take whatever else is already queued"""
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        while rows < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._queue_depth.set(self._queue.qsize())
+            visits = [visit for item_visits, _, _ in batch for visit in item_visits]
+            self._batch_size.observe(len(visits))
+            try:
+                documents = {doc['visit_id']: doc for doc in self.score(visits)}
+                done = time.perf_counter()
+                for item_visits, future, submitted in batch:
+                    self._lag.observe(done - submitted)
+                    future.set_result([documents[v['visit_id']] for v in item_visits if v['visit_id'] in documents])
+            except Exception as e:
+                print(f"⚠️  Ingest scoring failed: {e}")
+                REGISTRY.counter('ml_ingest_visits_total', {'result': 'failed'},
+                                 'Ingested visits by scoring outcome').inc(len(visits))
+                for _, future, _ in batch:
+                    future.set_exception(e)
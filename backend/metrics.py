@@ -0,0 +1,246 @@
+"""
+In-process Metrics
+- Counters, gauges and fixed-bucket histograms with labels
+- Exported as JSON or Prometheus text by the /api/metrics endpoint
+- StageTimer splits one prediction into timed stages (parse, encode, scale,
+  model, ...) feeding per-model, per-version latency histograms
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds (50us .. 10s)
+LATENCY_BUCKETS = [
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0
+]
+
+# Batch-size buckets (rows)
+SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384]
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {'value': self.value}
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return {'value': self.value}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class MetricsRegistry:
+    """Named metrics, one instance per distinct label set"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, labels, factory, help_text):
+        key = (name, _label_key(labels))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = factory()
+                    self._help.setdefault(name, (kind, help_text))
+        return metric
+
+    def counter(self, name, labels=None, help_text=''):
+        return self._get('counter', name, labels, Counter, help_text)
+
+    def gauge(self, name, labels=None, help_text=''):
+        return self._get('gauge', name, labels, Gauge, help_text)
+
+    def histogram(self, name, labels=None, buckets=LATENCY_BUCKETS, help_text=''):
+        return self._get('histogram', name, labels, lambda: Histogram(buckets), help_text)
+
+    def _items(self):
+        """Snapshot of the (name, labels) -> metric pairs, safe while requests add label sets"""
+        with self._lock:
+            return list(self._metrics.items())
+
+    def to_json(self):
+        out = {}
+        for (name, labels), metric in sorted(self._items(), key=lambda kv: kv[0]):
+            out.setdefault(name, []).append({'labels': dict(labels), **metric.snapshot()})
+        return out
+
+    def to_prometheus(self):
+        lines = []
+        by_name = {}
+        for (name, labels), metric in self._items():
+            by_name.setdefault(name, []).append((labels, metric))
+        for name in sorted(by_name):
+            kind, help_text = self._help[name]
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in by_name[name]:
+                if kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + ['+Inf'], metric.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+# Process-wide registry used by the API and the ML layer
+REGISTRY = MetricsRegistry()
+
+
+# Per-stage prediction latency: ml_prediction_stage_seconds{model, version, stage}
+STAGE_METRIC = 'ml_prediction_stage_seconds'
+_stage_histograms = {}
+_stage_lock = threading.Lock()
+_trace = threading.local()
+
+
+def _stage_histogram(model, version, stage):
+    key = (model, version, stage)
+    histogram = _stage_histograms.get(key)
+    if histogram is None:
+        with _stage_lock:
+            histogram = _stage_histograms.get(key)
+            if histogram is None:
+                histogram = _stage_histograms[key] = REGISTRY.histogram(
+                    STAGE_METRIC, {'model': model, 'version': version, 'stage': stage},
+                    help_text='Prediction latency by stage')
+    return histogram
+
+
+class StageTimer:
+    """
+    Times consecutive stages of one prediction: each lap(stage) records the
+    time since the previous lap (or since the timer was created)
+    """
+
+    def __init__(self, model, version):
+        self.model = model
+        self.version = str(version) if version else 'none'
+        self.stages = []
+        self._last = time.perf_counter()
+        # Laps also go to the request trace of this thread, if one is open
+        self._trace = getattr(_trace, 'stages', None)
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        _stage_histogram(self.model, self.version, stage).observe(elapsed)
+        self.stages.append((stage, elapsed))
+        if self._trace is not None:
+            self._trace.append((f"{self.model}.{stage}", elapsed))
+        return elapsed
+
+    def finish(self):
+        """Record the sum of all laps as the 'total' stage and return it"""
+        total = sum(seconds for _, seconds in self.stages)
+        _stage_histogram(self.model, self.version, 'total').observe(total)
+        if self._trace is not None:
+            self._trace.append((f"{self.model}.total", total))
+        return total
+
+
+@contextmanager
+def trace_stages():
+    """
+    Collect the (stage, seconds) laps of every StageTimer created on this
+    thread inside the block, e.g. for one request's debug breakdown
+    """
+    previous = getattr(_trace, 'stages', None)
+    stages = _trace.stages = []
+    try:
+        yield stages
+    finally:
+        _trace.stages = previous
+
+
+def stage_summary():
+    """model -> version -> stage -> count/mean/p50/p90/p99 of the stage histograms"""
+    summary = {}
+    with _stage_lock:
+        histograms = sorted(_stage_histograms.items())
+    for labels, histogram in histograms:
+        model, version, stage = labels
+        snapshot = histogram.snapshot()
+        summary.setdefault(model, {}).setdefault(version, {})[stage] = {
+            key: snapshot[key] for key in ('count', 'mean', 'p50', 'p90', 'p99')
+        }
+    return summary
+
+
+def server_timing(stages):
+    """Format stage laps as a Server-Timing header value (durations in ms)"""
+    return ', '.join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in stages)
@@ -0,0 +1,149 @@
+"""
+Adaptive Micro-Batching for Prediction Requests
+- Concurrent single-row requests for a model are queued and scored together
+- A batch closes after `max_wait_ms` or `max_batch_size` rows
+- The wait window adapts to the observed arrival rate: under light load
+  requests are scored immediately, under heavy load the window only lasts
+  as long as it takes to fill a batch
+- A batch whose scoring fails is scored again row by row, so one bad record
+  only fails its own request
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from metrics import REGISTRY, SIZE_BUCKETS
+
+
+class MicroBatcher:
+    """Queues single-row requests for one model and scores them in batches"""
+
+    def __init__(self, name, score_fn, max_batch_size=64, max_wait_ms=2.0, ewma_alpha=0.2):
+        """
+        Args:
+            name: model name (used as the metrics label)
+            score_fn: callable(list of records) -> list of results, same order
+            max_batch_size: most rows scored in one call
+            max_wait_ms: longest a request waits for others to join its batch
+        """
+        self.name = name
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.ewma_alpha = ewma_alpha
+
+        self._queue = queue.Queue()
+        self._arrival_rate = 0.0  # requests per second (EWMA)
+        self._last_batch_start = None
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        labels = {'model': name}
+        self._queue_depth = REGISTRY.gauge('ml_batch_queue_depth', labels, 'Requests waiting for a batch')
+        self._window = REGISTRY.gauge('ml_batch_window_seconds', labels, 'Current adaptive batch window')
+        self._batch_size = REGISTRY.histogram('ml_batch_size_rows', labels, SIZE_BUCKETS, 'Rows per scored batch')
+        self._queue_wait = REGISTRY.histogram('ml_batch_queue_wait_seconds', labels,
+                                              help_text='Time from submit until scoring starts')
+
+    def submit(self, record, timeout=10.0):
+        """Score one record; blocks until its batch has been scored"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((record, future, time.perf_counter()))
+        self._queue_depth.set(self._queue.qsize())
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # Nobody waits for it any more: the worker skips it if still queued
+            future.cancel()
+            raise
+
+    def current_window(self):
+        """Seconds the next batch waits for more requests"""
+        expected_arrivals = self._arrival_rate * self.max_wait
+        if expected_arrivals < 1.0:
+            # Light load: nobody is likely to join, waiting only adds latency
+            return 0.0
+        return min(self.max_wait, (self.max_batch_size - 1) / self._arrival_rate)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                worker = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+                worker.start()
+                self._worker = worker
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        window = self.current_window()
+        self._window.set(window)
+        deadline = time.perf_counter() + window
+        while len(batch) < self.max_batch_size:
+            try:
+                # Anything already queued joins without waiting
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _update_rate(self, batch_size, now):
+        if self._last_batch_start is not None:
+            elapsed = max(now - self._last_batch_start, 1e-6)
+            rate = batch_size / elapsed
+            self._arrival_rate += self.ewma_alpha * (rate - self._arrival_rate)
+        self._last_batch_start = now
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                start = time.perf_counter()
+                self._update_rate(len(batch), start)
+                self._queue_depth.set(self._queue.qsize())
+                # Requests that timed out are not scored
+                batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                self._batch_size.observe(len(batch))
+                for _, _, submitted in batch:
+                    self._queue_wait.observe(start - submitted)
+                self._score(batch)
+            except Exception as e:
+                # Never let the worker die: later requests would all time out
+                print(f"⚠️  Micro-batcher {self.name} error: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, batch):
+        """Score a batch in one call; if that fails, each row on its own"""
+        try:
+            results = self.score_fn([record for record, _, _ in batch])
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+        for record, future, _ in batch:
+            if future.done():
+                continue
+            try:
+                future.set_result(self.score_fn([record])[0])
+            except Exception as e:
+                future.set_exception(e)
@@ -5,80 +5,591 @@ Machine Learning Models for Healthcare Analytics
 - Disease Progression Prediction
 """
 
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import accuracy_score, roc_auc_score, mean_squared_error, r2_score
-from imblearn.over_sampling import SMOTE
 import joblib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from tree_engine import CompiledEnsemble
+from feature_pipeline import FeaturePipeline
+import onnx_backend
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry
+from metrics import REGISTRY, StageTimer
+
+# pandas / scikit-learn / imbalanced-learn are imported inside the training
+# methods: serving compiled models (see tree_engine.py) never imports them.
+
+CATEGORICAL_COLS = ['gender', 'smoker_status', 'alcohol_use']
+
+READMISSION_FEATURES = [
+    'age', 'gender', 'bmi', 'smoker_status', 'alcohol_use',
+    'severity_score', 'length_of_stay', 'previous_visit_gap_days',
+    'number_of_previous_visits'
+]
+
+RISK_FEATURES = [
+    'age', 'gender', 'bmi', 'smoker_status', 'alcohol_use',
+    'severity_score', 'length_of_stay', 'number_of_previous_visits'
+]
+
+PROGRESSION_FEATURES = [
+    'prev_severity', 'length_of_stay', 'previous_visit_gap_days',
+    'number_of_previous_visits'
+]
+
+BATCH_MODELS = ['readmission', 'risk_score', 'disease_progression']
+
+# Model attributes exported as compiled ensembles ({attr}_{timestamp}.joblib,
+# memory-mapped on load; older bundles used .npz)
+COMPILED_MODELS = ['readmission_model', 'risk_model', 'disease_progression_model']
+COMPILED_SUFFIXES = ['.joblib', '.npz']
+
+# Inference backend -> registry artifact kinds to serve from, in order of
+# preference (scikit-learn pickles are the fallback)
+BACKENDS = {
+    'compiled': ['compiled', 'pickle'],
+    'onnx': ['onnx', 'pickle'],
+    'sklearn': ['pickle']
+}
+
+# Model tiers: 'full' is the trained model, 'fast' (optional, see
+# HealthcareMLModels(fast_tier=True)) a compact student distilled from it for
+# high-volume callers that trade a little accuracy for ~10x cheaper scoring
+TIERS = ['full', 'fast']
+FAST_TIER_PARAMS = {
+    'readmission': {'n_estimators': 10, 'max_depth': 6},
+    'risk_score': {'n_estimators': 10, 'max_depth': 4, 'learning_rate': 0.4},
+    'disease_progression': {'n_estimators': 10, 'max_depth': 6}
+}
+
+# Training: BATCH_MODELS name -> HealthcareMLModels method. Forests train
+# their trees on n_jobs cores; gradient boosting fits trees one after
+# another, so the risk model always uses one core.
+TRAINERS = {
+    'readmission': 'train_readmission_model',
+    'risk_score': 'train_risk_scoring_model',
+    'disease_progression': 'train_disease_progression_model'
+}
+MULTICORE_MODELS = ['readmission', 'disease_progression']
+
+# Default hyperparameters of each model. HealthcareMLModels.hyperparameters
+# overrides them (set from a search, see hyperparameter_search.py, or from
+# the active bundle by load_hyperparameters); the bundle records those used.
+HYPERPARAMETERS = {
+    'readmission': {'n_estimators': 100, 'max_depth': 10},
+    'risk_score': {'n_estimators': 100, 'max_depth': 5, 'learning_rate': 0.1},
+    'disease_progression': {'n_estimators': 100, 'max_depth': 8}
+}
+
+# Risk model engines -> scikit-learn estimator (HealthcareMLModels(risk_engine=...)).
+# 'hist_gradient_boosting' bins the features into histograms (multi-threaded,
+# fast past a few hundred thousand rows) and splits the categorical columns
+# on sets of their codes instead of treating the codes as ordered numbers.
+RISK_ENGINES = {
+    'gradient_boosting': 'GradientBoostingRegressor',
+    'hist_gradient_boosting': 'HistGradientBoostingRegressor'
+}
+DEFAULT_RISK_ENGINE = 'gradient_boosting'
+HIST_HYPERPARAMETERS = {'max_iter': 100, 'max_depth': 5, 'learning_rate': 0.1, 'early_stopping': False}
+# Class rebalancing of the readmission training rows (HealthcareMLModels(rebalance=...)):
+# 'smote' oversamples the minority class with SMOTE over the whole training
+# set; its neighbour search and the rows it adds grow with the data.
+# 'chunked_smote' runs SMOTE on random chunks of REBALANCE_CHUNK_ROWS rows
+# (neighbours are searched within a chunk: approximate, bounded memory).
+# 'undersample' drops random majority rows; 'class_weight' fits on the rows
+# as they are (the forest weights the classes 'balanced' either way).
+REBALANCE_STRATEGIES = ['smote', 'chunked_smote', 'undersample', 'class_weight']
+DEFAULT_REBALANCE = 'smote'
+REBALANCE_CHUNK_ROWS = 100000
+# Estimator parameter holding the number of trees (for incremental updates)
+TREE_COUNT_PARAMS = {'HistGradientBoostingRegressor': 'max_iter'}
+
+# Incremental updates (see HealthcareMLModels.update_models): trees fitted on
+# the new rows only are added to the loaded ensembles. A full retrain is
+# needed instead when any feature of the new rows drifts from the training
+# data (population stability index above UPDATE_PSI_LIMIT), the current
+# model scores more than UPDATE_METRIC_DROP below its training metric on
+# them, or an ensemble would grow past UPDATE_MAX_TREES_FACTOR times its
+# trained size. Fewer than UPDATE_MIN_ROWS new rows per model: wait for more.
+UPDATE_MIN_ROWS = 200
+UPDATE_PSI_LIMIT = 0.2
+UPDATE_METRIC_DROP = 0.05
+UPDATE_MAX_TREES_FACTOR = 2
+UPDATE_METRICS = {'readmission': 'accuracy', 'risk_score': 'r2', 'disease_progression': 'accuracy'}
+PROFILE_BINS = 10
+
+# BATCH_MODELS name -> model attribute / feature columns
+MODEL_ATTRS = dict(zip(BATCH_MODELS, COMPILED_MODELS))
+MODEL_FEATURES = {
+    'readmission': READMISSION_FEATURES,
+    'risk_score': RISK_FEATURES,
+    'disease_progression': PROGRESSION_FEATURES
+}
+
+PROGRESSION_LABELS = {
+    0: "Improving",
+    1: "Stable",
+    2: "Worsening"
+}
+
+
+def tier_name(name, tier):
+    """
+    Name of a model, model attribute or artifact kind in a tier: unchanged
+    for 'full', prefixed otherwise (fast_readmission_model, fast_compiled)
+    """
+    return name if tier == 'full' else f"{tier}_{name}"
+
+
+def distill(teacher, X, params, random_state=42, n_jobs=None):
+    """
+    Fit a compact student of the same kind to a teacher's outputs on X
+    
+    A forest classifier student is fit to the teacher's class probabilities:
+    every row is repeated once per class, weighted by the teacher's
+    probability of that class, so each leaf's class fractions are the
+    average teacher probabilities of its rows. A boosting regressor student
+    is fit to the teacher's predictions.
+    """
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+    
+    X = np.asarray(X, dtype=np.float64)
+    if not hasattr(teacher, 'classes_'):
+        student = GradientBoostingRegressor(random_state=random_state, **params)
+        return student.fit(X, teacher.predict(X))
+    
+    probabilities = teacher.predict_proba(X)
+    n_rows, n_classes = probabilities.shape
+    weights = probabilities.T.ravel()
+    keep = weights > 0
+    X_soft = np.tile(X, (n_classes, 1))[keep]
+    y_soft = np.repeat(teacher.classes_, n_rows)[keep]
+    student = RandomForestClassifier(random_state=random_state, n_jobs=n_jobs, **params)
+    student.fit(X_soft, y_soft, sample_weight=weights[keep])
+    # Served one row (or one batch) at a time: no thread pool per call
+    return student.set_params(n_jobs=None)
+
+
+def tier_report(model, X_test, y_test, teacher=None, repeat=200):
+    """
+    Size, compiled latency and held-out quality of one model tier; with a
+    teacher, also how closely the model follows it
+    """
+    from sklearn.metrics import accuracy_score, mean_squared_error, r2_score, roc_auc_score
+    
+    compiled = CompiledEnsemble.from_sklearn(model)
+    X_test = np.asarray(X_test, dtype=np.float64)
+    y_test = np.asarray(y_test)
+    classifier = compiled.classes_ is not None
+    score = compiled.predict_proba if classifier else compiled.predict
+    
+    row = X_test[:1]
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        score(row)
+        samples[i] = time.perf_counter() - start
+    start = time.perf_counter()
+    outputs = score(X_test)
+    batch_seconds = time.perf_counter() - start
+    
+    if classifier:
+        predictions = compiled.classes_[np.argmax(outputs, axis=1)]
+        metrics = {'accuracy': float(accuracy_score(y_test, predictions))}
+        if outputs.shape[1] == 2 and len(np.unique(y_test)) == 2:
+            metrics['auc_roc'] = float(roc_auc_score(y_test, outputs[:, 1]))
+        if teacher is not None:
+            metrics['agreement'] = float(np.mean(predictions == teacher.predict(X_test)))
+    else:
+        metrics = {'r2': float(r2_score(y_test, outputs)), 'mse': float(mean_squared_error(y_test, outputs))}
+        if teacher is not None:
+            metrics['r2_vs_full'] = float(r2_score(teacher.predict(X_test), outputs))
+    
+    return {
+        'n_trees': compiled.n_trees,
+        'max_depth': compiled.max_depth,
+        'memory_bytes': int(compiled.nbytes),
+        'latency_us': float(np.median(samples) * 1e6),
+        'batch_us_per_row': float(batch_seconds / len(X_test) * 1e6),
+        'metrics': metrics
+    }
+
+
+def readmission_target(merged):
+    """Readmission labels of merged visits (see HealthcareMLModels.merge_visits)"""
+    if 'readmitted_within_30_days' in merged.columns:
+        y = merged['readmitted_within_30_days'].map({'Yes': 1, 'No': 0, 'yes': 1, 'no': 0, True: 1, False: 0})
+        return y.fillna(0).astype(int)
+    # If not available, create synthetic target based on severity and length of stay
+    return ((merged['severity_score'] > 7) & (merged['length_of_stay'] > 5)).astype(int)
+
+
+def risk_score_target(merged):
+    """
+    Composite 0-100 risk score of merged visits (see HealthcareMLModels.merge_visits)
+    Risk = weighted combination of severity, age, lifestyle
+    """
+    age_risk = np.clip((merged['age'] - 30) / 50 * 30, 0, 30)  # Max 30 points
+    severity_risk = merged['severity_score'] * 5  # Max 50 points (severity 0-10)
+    
+    # Lifestyle risk
+    lifestyle_risk = (merged['smoker_status'].map({1: 10, 0: 0}).fillna(0) +
+                      merged['alcohol_use'].map({1: 5, 0: 0}).fillna(0))
+    
+    # Previous visits risk (more visits = higher risk)
+    visit_risk = np.clip(merged['number_of_previous_visits'] * 2, 0, 15)
+    
+    return np.clip(age_risk + severity_risk + lifestyle_risk + visit_risk, 0, 100)
+
+
+def available_cores():
+    """Cores this process may run on (respects CPU affinity, unlike os.cpu_count)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_hyperparameters(name, risk_engine=DEFAULT_RISK_ENGINE):
+    """Default hyperparameters of a model (of the risk model for an engine)"""
+    if name == 'risk_score' and risk_engine == 'hist_gradient_boosting':
+        return HIST_HYPERPARAMETERS
+    return HYPERPARAMETERS[name]
+
+
+def estimator_name(name, risk_engine=DEFAULT_RISK_ENGINE):
+    """scikit-learn estimator class a model is trained as"""
+    return RISK_ENGINES[risk_engine] if name == 'risk_score' else 'RandomForestClassifier'
+
+
+def build_estimator(name, hyperparameters=None, n_jobs=None, risk_engine=DEFAULT_RISK_ENGINE):
+    """Unfitted estimator of a model: default_hyperparameters() updated with `hyperparameters`"""
+    from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestClassifier
+    
+    if risk_engine not in RISK_ENGINES:
+        raise ValueError(f"Unknown risk engine: {risk_engine} (expected one of {', '.join(RISK_ENGINES)})")
+    params = {**default_hyperparameters(name, risk_engine), **(hyperparameters or {})}
+    if name == 'risk_score' and risk_engine == 'hist_gradient_boosting':
+        # The label-encoded columns are split as categories, not thresholds
+        categorical = [col in CATEGORICAL_COLS for col in RISK_FEATURES]
+        return HistGradientBoostingRegressor(**params, categorical_features=categorical, random_state=42)
+    if name == 'risk_score':
+        return GradientBoostingRegressor(**params, random_state=42)
+    return RandomForestClassifier(**params, random_state=42, class_weight='balanced', n_jobs=n_jobs)
+
+
+def rebalance_classes(X, y, strategy=DEFAULT_REBALANCE, random_state=42, chunk_rows=REBALANCE_CHUNK_ROWS):
+    """
+    Readmission training rows rebalanced by `strategy` (REBALANCE_STRATEGIES)
+    
+    Returns:
+        (X, y, applied): applied is 'class_weight' instead of SMOTE when the
+        minority class has too few rows to oversample (chunks that have too
+        few are kept as they are)
+    """
+    from imblearn.over_sampling import SMOTE
+    from imblearn.under_sampling import RandomUnderSampler
+    
+    if strategy not in REBALANCE_STRATEGIES:
+        raise ValueError(f"Unknown rebalance strategy: {strategy} "
+                         f"(expected one of {', '.join(REBALANCE_STRATEGIES)})")
+    X, y = np.asarray(X, dtype=np.float64), np.asarray(y)
+    if strategy == 'class_weight':
+        return X, y, strategy
+    if strategy == 'undersample':
+        return (*RandomUnderSampler(random_state=random_state).fit_resample(X, y), strategy)
+    if strategy == 'smote' or len(X) <= chunk_rows:
+        try:
+            return (*SMOTE(random_state=random_state).fit_resample(X, y), strategy)
+        except ValueError as e:
+            print(f"⚠️  SMOTE skipped ({e}); the class weights balance the classes")
+            return X, y, 'class_weight'
+    
+    order = np.random.default_rng(random_state).permutation(len(X))
+    parts = []
+    for i, chunk in enumerate(np.array_split(order, -(-len(X) // chunk_rows))):
+        try:
+            parts.append(SMOTE(random_state=random_state + i).fit_resample(X[chunk], y[chunk]))
+        except ValueError:
+            parts.append((X[chunk], y[chunk]))
+    return np.concatenate([rows for rows, _ in parts]), np.concatenate([labels for _, labels in parts]), strategy
+
+
+def feature_profile(X, bins=PROFILE_BINS):
+    """
+    Reference distribution of each feature, for drift checks: quantile bin
+    edges and the share of rows in each bin (column -> {'edges', 'shares'})
+    """
+    profile = {}
+    for col in X.columns:
+        values = np.asarray(X[col], dtype=np.float64)
+        values = values[~np.isnan(values)]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])) if len(values) else np.empty(0)
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        profile[col] = {'edges': edges.tolist(), 'shares': (counts / max(1, counts.sum())).tolist()}
+    return profile
+
+
+def population_stability(profile, X):
+    """Population stability index of each feature of X against a feature_profile"""
+    psi = {}
+    for col, reference in profile.items():
+        values = np.asarray(X[col], dtype=np.float64)
+        values = values[~np.isnan(values)]
+        counts = np.bincount(np.searchsorted(reference['edges'], values, side='right'),
+                             minlength=len(reference['shares']))
+        # Empty bins would make the log infinite
+        actual = np.clip(counts / max(1, counts.sum()), 1e-4, None)
+        expected = np.clip(np.asarray(reference['shares']), 1e-4, None)
+        psi[col] = float(np.sum((actual - expected) * np.log(actual / expected)))
+    return psi
+
+
+def _tree_count_param(model):
+    return TREE_COUNT_PARAMS.get(type(model).__name__, 'n_estimators')
+
+
+def _train_one(name, X, y, model_dir, n_jobs, fast_tier, hyperparameters=None, risk_engine=DEFAULT_RISK_ENGINE,
+               rebalance=DEFAULT_REBALANCE):
+    """
+    Train one model in a fresh HealthcareMLModels (run in a worker process
+    by HealthcareMLModels.train_all) and return what the parent merges
+    """
+    start = time.perf_counter()
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0, n_jobs=n_jobs, fast_tier=fast_tier,
+                            risk_engine=risk_engine, rebalance=rebalance)
+    if hyperparameters:
+        ml.hyperparameters[name] = hyperparameters
+    score = getattr(ml, TRAINERS[name])(X, y)
+    attr = MODEL_ATTRS[name]
+    return {
+        'score': score,
+        'model': getattr(ml, attr),
+        'scaler': ml.scaler,
+        'metrics': ml.training_metrics.get(name, {}),
+        'training_state': ml.training_state.get(name),
+        'fast_model': ml.fast_models.get(attr),
+        'tier_report': ml.tier_reports.get(name),
+        'seconds': time.perf_counter() - start
+    }
+
+
+class ModelBundle:
+    """
+    One consistent set of served models and their preprocessing. A bundle is
+    never modified after it is built: training and loading build a new one
+    and swap it in with a single reference assignment, so a prediction that
+    picked up a bundle never mixes models or encoders from two versions.
+    """
+    
+    def __init__(self, version, models, category_codes, preprocessing, loaders=None, model_versions=None):
+        """
+        Args:
+            models: COMPILED_MODELS attr (tier_name(attr, tier) for the
+                fast tier) -> fitted model (or None)
+            loaders: attr -> zero-argument callable; the model is loaded on
+                first use, so an endpoint only pays for the models it serves
+            model_versions: BATCH_MODELS name -> version of that model
+                (default: `version` for all)
+        """
+        self.version = version
+        self.model_versions = model_versions or {name: version for name in BATCH_MODELS}
+        self.category_codes = category_codes
+        self.preprocessing = preprocessing
+        self._models = dict(models)
+        self._loaders = dict(loaders or {})
+        self._compiled = {}
+        self._load_lock = threading.Lock()
+        # Per-thread (1, n) encode buffers, private to this bundle
+        self.buffers = threading.local()
+    
+    def _get(self, attr):
+        model = self._models.get(attr)
+        if model is None and attr in self._loaders:
+            with self._load_lock:
+                model = self._models.get(attr)
+                if model is None:
+                    start = time.perf_counter()
+                    model = self._models[attr] = self._loaders[attr]()
+                    REGISTRY.gauge('ml_model_load_seconds', {'model': attr},
+                                   'Time to load a model on first use').set(time.perf_counter() - start)
+        return model
+    
+    @property
+    def readmission_model(self):
+        return self._get('readmission_model')
+    
+    @property
+    def risk_model(self):
+        return self._get('risk_model')
+    
+    @property
+    def disease_progression_model(self):
+        return self._get('disease_progression_model')
+    
+    @property
+    def loaded(self):
+        """Names of the models loaded so far"""
+        return [tier_name(attr, tier) for tier in TIERS for attr in COMPILED_MODELS
+                if self._models.get(tier_name(attr, tier)) is not None]
+    
+    def model(self, name, tier='full'):
+        """Served model and feature columns for a BATCH_MODELS name"""
+        if name not in MODEL_ATTRS:
+            raise ValueError(f"Unknown model: {name}")
+        return self._get(tier_name(MODEL_ATTRS[name], tier)), MODEL_FEATURES[name]
+    
+    def serving_tier(self, name, tier='full'):
+        """The tier that serves a request for `tier`: the full model when the bundle has no such tier"""
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier: {tier} (expected one of {', '.join(TIERS)})")
+        attr = tier_name(MODEL_ATTRS[name], tier)
+        if self._models.get(attr) is None and attr not in self._loaders:
+            return 'full'
+        return tier
+    
+    def compiled(self, name, tier='full'):
+        """Served model as a CompiledEnsemble (scikit-learn models are compiled on first use)"""
+        model, _ = self.model(name, tier)
+        if model is None or isinstance(model, CompiledEnsemble):
+            return model
+        if getattr(model, 'takes_records', False):
+            return None  # ONNX graphs have no tree arrays to walk
+        key = tier_name(name, tier)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = CompiledEnsemble.from_sklearn(model)
+        return compiled
+
 
 class HealthcareMLModels:
-    def __init__(self):
+    def __init__(self, model_dir='ml_models_saved', cache_size=10000, cache_ttl=300.0, lazy_load=True,
+                 backend='compiled', onnx_threads=0, fast_tier=False, n_jobs=None,
+                 risk_engine=DEFAULT_RISK_ENGINE, rebalance=DEFAULT_REBALANCE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
+        if risk_engine not in RISK_ENGINES:
+            raise ValueError(f"Unknown risk engine: {risk_engine} (expected one of {', '.join(RISK_ENGINES)})")
+        if rebalance not in REBALANCE_STRATEGIES:
+            raise ValueError(f"Unknown rebalance strategy: {rebalance} "
+                             f"(expected one of {', '.join(REBALANCE_STRATEGIES)})")
         self.readmission_model = None
         self.risk_model = None
         self.disease_progression_model = None
-        self.label_encoders = {}
-        self.scaler = StandardScaler()
-        self.model_dir = 'ml_models_saved'
+        self._label_encoders = {}
+        self._scaler = None
+        # FeaturePipelines of a loaded bundle not yet turned into the working
+        # encoders and scaler (see label_encoders / scaler)
+        self._loaded_pipelines = None
+        # Model name -> column -> fill value of missing training values,
+        # learned on first use like the label encoders (see FeaturePipeline)
+        self.fill_values = {}
+        self.model_dir = model_dir
+        self.lazy_load = lazy_load
+        self.backend = backend
+        self.onnx_threads = onnx_threads
+        self._load_lock = threading.Lock()
+        # Evaluation metrics of models trained in this process (saved in the manifest)
+        self.training_metrics = {}
+        # With fast_tier, training also distills a compact student of each
+        # model (COMPILED_MODELS attr -> model); tier_reports compares them
+        self.fast_tier = fast_tier
+        self.fast_models = {}
+        self.tier_reports = {}
+        # Cores each forest trains on (None: one, -1: all); see train_all
+        self.n_jobs = n_jobs
+        # Estimator the risk model is trained as (RISK_ENGINES)
+        self.risk_engine = risk_engine
+        # How the readmission classes are balanced (REBALANCE_STRATEGIES)
+        self.rebalance = rebalance
+        # Drift reference and size of each model since its last full
+        # training (see update_models), and the watermark of the newest
+        # training data: an opaque JSON value set by the caller
+        # (train_models.py uses the last visit's _id). Both go in the manifest.
+        self.training_state = {}
+        self.watermark = None
+        # Model name -> hyperparameter overrides of HYPERPARAMETERS, and the
+        # hyperparameter search report that chose them (saved in the manifest)
+        self.hyperparameters = {}
+        self.search_reports = {}
+        
+        # Results keyed by (model, model_version, encoded row); 0 disables
+        self.prediction_cache = PredictionCache(cache_size, cache_ttl)
+        
+        # The attributes above are the working set used by training and
+        # save_models(); predictions only ever read the published bundle
+        self._bundle = self._build_bundle({}, None)
         
         # Create directory for saving models
         if not os.path.exists(self.model_dir):
             os.makedirs(self.model_dir)
     
-    def prepare_readmission_data(self, patients_df, visits_df):
+    def merge_visits(self, patients_df, visits_df, with_missing=False):
         """
-        Prepare data for 30-day readmission prediction
-        Target: readmitted_within_30_days (from visits)
+        Join visits with their patients, fill missing feature values and
+        label-encode the categoricals with the readmission FeaturePipeline
+        (fitting the fill values and codes on first use). Shared by the
+        readmission and risk score data and the feature store.
+        
+        Returns:
+            the merged frame, or (merged, missing) with with_missing, where
+            missing marks the feature values that were filled
         """
         # Merge patients and visits data
         merged = visits_df.merge(patients_df, on='patient_id', how='left')
-        
-        # Select relevant features from available fields
-        feature_cols = [
-            'age', 'gender', 'bmi', 'smoker_status', 'alcohol_use',
-            'severity_score', 'length_of_stay', 'previous_visit_gap_days',
-            'number_of_previous_visits'
-        ]
-        
-        # Handle missing values
-        for col in feature_cols:
+        missing = merged.reindex(columns=READMISSION_FEATURES).isna() if with_missing else None
+        
+        # Fill and encode in one pass (the risk features are a subset)
+        columns = [col for col in READMISSION_FEATURES if col in merged.columns]
+        pipeline = self._fit_pipeline('readmission', merged, columns)
+        self.fill_values.setdefault('risk_score', {}).update(
+            {col: value for col, value in pipeline.fill.items() if col in RISK_FEATURES})
+        merged[columns] = pipeline.encode_frame(merged)
+        for col in CATEGORICAL_COLS:
             if col in merged.columns:
-                if merged[col].dtype == 'object':
-                    merged[col].fillna('Unknown', inplace=True)
-                else:
-                    merged[col].fillna(merged[col].median(), inplace=True)
-        
-        # Encode categorical variables
-        categorical_cols = ['gender', 'smoker_status', 'alcohol_use']
-        for col in categorical_cols:
-            if col in merged.columns and col not in self.label_encoders:
+                merged[col] = merged[col].astype(np.int64)
+        
+        return (merged, missing) if with_missing else merged
+    
+    def _fit_pipeline(self, name, frame, columns):
+        """
+        FeaturePipeline of `columns` of a training frame: fill values and
+        category codes already learned (fill_values / label_encoders) are
+        kept, the others are learned from the frame and recorded
+        """
+        from sklearn.preprocessing import LabelEncoder
+        
+        known = {col: {str(value): code for code, value in enumerate(le.classes_)}
+                 for col, le in self.label_encoders.items()}
+        pipeline = FeaturePipeline.fit(frame, columns, CATEGORICAL_COLS, known, self.fill_values.get(name))
+        self.fill_values.setdefault(name, {}).update(pipeline.fill)
+        for col, codes in pipeline.category_codes.items():
+            if col not in self.label_encoders:
                 le = LabelEncoder()
-                merged[col] = le.fit_transform(merged[col].astype(str))
+                le.classes_ = np.array(list(codes), dtype=object)
                 self.label_encoders[col] = le
-            elif col in merged.columns:
-                merged[col] = self.label_encoders[col].transform(merged[col].astype(str))
-        
-        # Extract features and target
-        X = merged[feature_cols].copy()
-        
-        # Target variable - readmission within 30 days
-        if 'readmitted_within_30_days' in merged.columns:
-            y = merged['readmitted_within_30_days'].map({'Yes': 1, 'No': 0, 'yes': 1, 'no': 0, True: 1, False: 0})
-            y = y.fillna(0).astype(int)
-        else:
-            # If not available, create synthetic target based on severity and length of stay
-            y = ((merged['severity_score'] > 7) & (merged['length_of_stay'] > 5)).astype(int)
-        
-        return X, y
+        return pipeline
+    
+    def prepare_readmission_data(self, patients_df, visits_df):
+        """
+        Prepare data for 30-day readmission prediction
+        Target: readmitted_within_30_days (from visits)
+        """
+        merged = self.merge_visits(patients_df, visits_df)
+        return merged[READMISSION_FEATURES].copy(), readmission_target(merged)
     
     def train_readmission_model(self, X, y):
         """
         Train Random Forest Classifier for 30-day readmission prediction
         """
+        import pandas as pd
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.metrics import accuracy_score, roc_auc_score
+        
         print("🧠 Training Readmission Prediction Model...")
         
         # Split data
@@ -86,24 +597,17 @@ class HealthcareMLModels:
             X, y, test_size=0.2, random_state=42, stratify=y
         )
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        # Scale features: the fitted scaler becomes the pipeline's scaling
+        self.scaler = StandardScaler().fit(X_train)
+        pipeline = self.feature_pipelines()['readmission']
+        X_train_scaled = pipeline.scale_rows(np.asarray(X_train, dtype=np.float64))
+        X_test_scaled = pipeline.scale_rows(np.asarray(X_test, dtype=np.float64))
         
-        # Handle imbalanced data with SMOTE
-        try:
-            smote = SMOTE(random_state=42)
-            X_train_balanced, y_train_balanced = smote.fit_resample(X_train_scaled, y_train)
-        except:
-            X_train_balanced, y_train_balanced = X_train_scaled, y_train
+        # Handle imbalanced data (SMOTE by default, see REBALANCE_STRATEGIES)
+        X_train_balanced, y_train_balanced, rebalance = rebalance_classes(X_train_scaled, y_train, self.rebalance)
         
         # Train model
-        self.readmission_model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42,
-            class_weight='balanced'
-        )
+        self.readmission_model = build_estimator('readmission', self.hyperparameters.get('readmission'), self.n_jobs)
         self.readmission_model.fit(X_train_balanced, y_train_balanced)
         
         # Evaluate
@@ -111,11 +615,17 @@ class HealthcareMLModels:
         y_pred_proba = self.readmission_model.predict_proba(X_test_scaled)[:, 1]
         
         accuracy = accuracy_score(y_test, y_pred)
+        self.training_metrics['readmission'] = {'accuracy': float(accuracy), 'n_train': len(X_train),
+                                                'rebalance': rebalance, 'n_fit': len(X_train_balanced)}
         try:
             auc = roc_auc_score(y_test, y_pred_proba)
+            self.training_metrics['readmission']['auc_roc'] = float(auc)
             print(f"✅ Readmission Model - Accuracy: {accuracy:.2%}, AUC-ROC: {auc:.3f}")
-        except:
+        except ValueError:  # a single class in the test rows
             print(f"✅ Readmission Model - Accuracy: {accuracy:.2%}")
+        self._train_fast_tier('readmission', X_train_balanced, X_test_scaled, y_test)
+        # Updates rebalance their new rows instead of reusing class weights
+        self._record_training_state('readmission', X_train)
         
         # Feature importance
         feature_importance = pd.DataFrame({
@@ -126,6 +636,9 @@ class HealthcareMLModels:
         print("📊 Top 5 Features for Readmission:")
         print(feature_importance.head().to_string(index=False))
         
+        # Served one row (or one batch) at a time: no thread pool per call
+        self.readmission_model.set_params(n_jobs=None)
+        self.compile_preprocessing()
         return accuracy
     
     def prepare_risk_score_data(self, patients_df, visits_df):
@@ -133,58 +646,17 @@ class HealthcareMLModels:
         Prepare data for health risk scoring (0-100 scale)
         Target: Composite risk score based on severity, chronic conditions, vitals
         """
-        # Merge data
-        merged = visits_df.merge(patients_df, on='patient_id', how='left')
-        
-        # Feature engineering - use available fields
-        feature_cols = [
-            'age', 'gender', 'bmi', 'smoker_status', 'alcohol_use',
-            'severity_score', 'length_of_stay', 'number_of_previous_visits'
-        ]
-        
-        # Handle missing values
-        for col in feature_cols:
-            if col in merged.columns:
-                if merged[col].dtype == 'object':
-                    merged[col].fillna('Unknown', inplace=True)
-                else:
-                    merged[col].fillna(merged[col].median(), inplace=True)
-        
-        # Encode categorical
-        categorical_cols = ['gender', 'smoker_status', 'alcohol_use']
-        for col in categorical_cols:
-            if col in merged.columns and col not in self.label_encoders:
-                le = LabelEncoder()
-                merged[col] = le.fit_transform(merged[col].astype(str))
-                self.label_encoders[col] = le
-            elif col in merged.columns:
-                merged[col] = self.label_encoders[col].transform(merged[col].astype(str))
-        
-        X = merged[feature_cols].copy()
-        
-        # Create composite risk score (target variable)
-        # Risk = weighted combination of severity, age, lifestyle
-        age_risk = np.clip((merged['age'] - 30) / 50 * 30, 0, 30)  # Max 30 points
-        severity_risk = merged['severity_score'] * 5  # Max 50 points (severity 0-10)
-        
-        # Lifestyle risk
-        lifestyle_risk = (merged['smoker_status'].map({1: 10, 0: 0}).fillna(0) +
-                         merged['alcohol_use'].map({1: 5, 0: 0}).fillna(0))
-        
-        # Previous visits risk (more visits = higher risk)
-        visit_risk = np.clip(merged['number_of_previous_visits'] * 2, 0, 15)
-        
-        y = np.clip(
-            age_risk + severity_risk + lifestyle_risk + visit_risk,
-            0, 100
-        )
-        
-        return X, y
+        merged = self.merge_visits(patients_df, visits_df)
+        return merged[RISK_FEATURES].copy(), risk_score_target(merged)
     
     def train_risk_scoring_model(self, X, y):
         """
-        Train Gradient Boosting Regressor for health risk scoring
+        Train the gradient boosting regressor (risk_engine) for health risk scoring
         """
+        import pandas as pd
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_squared_error, r2_score
+        
         print("\n🧠 Training Risk Scoring Model...")
         
         # Split data
@@ -193,30 +665,32 @@ class HealthcareMLModels:
         )
         
         # Train model
-        self.risk_model = GradientBoostingRegressor(
-            n_estimators=100,
-            max_depth=5,
-            learning_rate=0.1,
-            random_state=42
-        )
-        self.risk_model.fit(X_train, y_train)
+        self.risk_model = build_estimator('risk_score', self.hyperparameters.get('risk_score'),
+                                          risk_engine=self.risk_engine)
+        # Fitted and scored on plain matrices, as on the prediction paths
+        self.risk_model.fit(X_train.to_numpy(dtype=np.float64), y_train)
         
         # Evaluate
-        y_pred = self.risk_model.predict(X_test)
+        y_pred = self.risk_model.predict(X_test.to_numpy(dtype=np.float64))
         mse = mean_squared_error(y_test, y_pred)
         r2 = r2_score(y_test, y_pred)
+        self.training_metrics['risk_score'] = {'mse': float(mse), 'r2': float(r2), 'n_train': len(X_train)}
         
         print(f"✅ Risk Scoring Model - MSE: {mse:.2f}, R²: {r2:.3f}")
+        self._train_fast_tier('risk_score', X_train, X_test, y_test)
+        self._record_training_state('risk_score', X_train)
+        
+        # Feature importance (histogram boosting has no impurity importances)
+        if hasattr(self.risk_model, 'feature_importances_'):
+            feature_importance = pd.DataFrame({
+                'feature': X.columns,
+                'importance': self.risk_model.feature_importances_
+            }).sort_values('importance', ascending=False)
+            
+            print("📊 Top 5 Features for Risk Scoring:")
+            print(feature_importance.head().to_string(index=False))
         
-        # Feature importance
-        feature_importance = pd.DataFrame({
-            'feature': X.columns,
-            'importance': self.risk_model.feature_importances_
-        }).sort_values('importance', ascending=False)
-        
-        print("📊 Top 5 Features for Risk Scoring:")
-        print(feature_importance.head().to_string(index=False))
-        
+        self.compile_preprocessing()
         return r2
     
     def prepare_disease_progression_data(self, visits_df):
@@ -224,28 +698,22 @@ class HealthcareMLModels:
         Prepare data for disease progression prediction
         Predict severity trend (improving/stable/worsening)
         """
+        import pandas as pd
+        
         # Sort by patient and visit date
         visits_sorted = visits_df.sort_values(['patient_id', 'visit_date'])
         
         # Calculate severity change from previous visit
-        visits_sorted['prev_severity'] = visits_sorted.groupby('patient_id')['severity_score'].shift(1)
+        visits_sorted['prev_severity'] = visits_sorted.groupby('patient_id', observed=True)['severity_score'].shift(1)
         visits_sorted['severity_change'] = visits_sorted['severity_score'] - visits_sorted['prev_severity']
         
         # Remove first visits (no previous data)
         visits_sorted = visits_sorted.dropna(subset=['prev_severity'])
         
-        # Features - use available fields
-        feature_cols = [
-            'prev_severity', 'length_of_stay', 'previous_visit_gap_days',
-            'number_of_previous_visits'
-        ]
-        
-        # Handle missing values
-        for col in feature_cols:
-            if col in visits_sorted.columns:
-                visits_sorted[col].fillna(visits_sorted[col].median(), inplace=True)
-        
-        X = visits_sorted[feature_cols].copy()
+        # Features, missing values filled (the medians are learned once)
+        pipeline = self._fit_pipeline('disease_progression', visits_sorted, PROGRESSION_FEATURES)
+        X = pd.DataFrame(pipeline.encode_frame(visits_sorted), index=visits_sorted.index,
+                         columns=PROGRESSION_FEATURES)
         
         # Target: Progression category (0=Improving, 1=Stable, 2=Worsening)
         y = pd.cut(
@@ -260,6 +728,10 @@ class HealthcareMLModels:
         """
         Train Random Forest for disease progression prediction
         """
+        import pandas as pd
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score
+        
         print("\n🧠 Training Disease Progression Model...")
         
         # Split data
@@ -268,19 +740,18 @@ class HealthcareMLModels:
         )
         
         # Train model
-        self.disease_progression_model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=8,
-            random_state=42,
-            class_weight='balanced'
-        )
-        self.disease_progression_model.fit(X_train, y_train)
+        self.disease_progression_model = build_estimator(
+            'disease_progression', self.hyperparameters.get('disease_progression'), self.n_jobs)
+        self.disease_progression_model.fit(X_train.to_numpy(dtype=np.float64), y_train)
         
         # Evaluate
-        y_pred = self.disease_progression_model.predict(X_test)
+        y_pred = self.disease_progression_model.predict(X_test.to_numpy(dtype=np.float64))
         accuracy = accuracy_score(y_test, y_pred)
+        self.training_metrics['disease_progression'] = {'accuracy': float(accuracy), 'n_train': len(X_train)}
         
         print(f"✅ Disease Progression Model - Accuracy: {accuracy:.2%}")
+        self._train_fast_tier('disease_progression', X_train, X_test, y_test)
+        self._record_training_state('disease_progression', X_train, y_train)
         
         # Feature importance
         feature_importance = pd.DataFrame({
@@ -291,11 +762,274 @@ class HealthcareMLModels:
         print("📊 Top 5 Features for Disease Progression:")
         print(feature_importance.head().to_string(index=False))
         
+        self.disease_progression_model.set_params(n_jobs=None)
+        self.compile_preprocessing()
         return accuracy
     
-    def save_models(self):
-        """Save all trained models"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    def train_all(self, datasets, n_jobs=None, processes=None):
+        """
+        Train several models at once, each in its own process, and merge
+        them into this instance (saved together by save_models)
+        
+        Args:
+            datasets: BATCH_MODELS name -> (X, y) from the prepare_* methods
+                (run them here first: the label encoders are fitted there)
+            n_jobs: total core budget (default: available_cores()). The risk model
+                gets one core and the forests split the rest.
+            processes: models trained at the same time (default: one per
+                model, at most n_jobs); 1 trains them one after another in
+                this process with the whole budget per forest
+        
+        Returns:
+            name -> what the train_* method returned, or the exception it raised
+        """
+        budget = n_jobs or available_cores()
+        names = list(datasets)
+        processes = max(1, min(processes or len(names), len(names), budget))
+        if processes == 1:
+            forest_jobs = budget
+        else:
+            forests = [name for name in names if name in MULTICORE_MODELS]
+            serial = len(names) - len(forests)
+            forest_jobs = max(1, (budget - serial) // max(1, len(forests)))
+        
+        start = time.perf_counter()
+        outcomes = {}
+        if processes == 1:
+            for name in names:
+                try:
+                    outcomes[name] = _train_one(name, *datasets[name], self.model_dir, forest_jobs, self.fast_tier,
+                                                self.hyperparameters.get(name), self.risk_engine, self.rebalance)
+                except Exception as e:
+                    outcomes[name] = e
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = {
+                    name: pool.submit(_train_one, name, *datasets[name], self.model_dir,
+                                      forest_jobs if name in MULTICORE_MODELS else None, self.fast_tier,
+                                      self.hyperparameters.get(name), self.risk_engine, self.rebalance)
+                    for name in names
+                }
+                for name, future in futures.items():
+                    try:
+                        outcomes[name] = future.result()
+                    except Exception as e:
+                        outcomes[name] = e
+        
+        results = {}
+        for name, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                results[name] = outcome
+                continue
+            attr = MODEL_ATTRS[name]
+            setattr(self, attr, outcome['model'])
+            if name == 'readmission':
+                self.scaler = outcome['scaler']
+            self.training_metrics[name] = outcome['metrics']
+            self.training_state[name] = outcome['training_state']
+            self.fast_models.pop(attr, None)
+            self.tier_reports.pop(name, None)
+            if outcome['fast_model'] is not None:
+                self.fast_models[attr] = outcome['fast_model']
+                self.tier_reports[name] = outcome['tier_report']
+            results[name] = outcome['score']
+            print(f"⏱️  {name} trained in {outcome['seconds']:.1f}s")
+        print(f"⏱️  Trained {len(names)} models in {time.perf_counter() - start:.1f}s "
+              f"({processes} process(es), {forest_jobs} core(s) per forest)")
+        
+        self.compile_preprocessing()
+        return results
+    
+    def _record_training_state(self, name, X_train, y_fit=None):
+        """
+        Start the training state of a fully trained model (see update_models);
+        with `y_fit`, also the 'balanced' class weights of the data it was
+        fitted on, which the trees added later reuse
+        """
+        from sklearn.utils.class_weight import compute_class_weight
+        
+        model = getattr(self, MODEL_ATTRS[name])
+        trees = model.get_params()[_tree_count_param(model)]
+        self.training_state[name] = {
+            'rows': len(X_train),
+            'base_trees': trees,
+            'updates': 0,
+            'updated_rows': 0,
+            'reference': feature_profile(X_train)
+        }
+        if y_fit is not None:
+            classes = np.unique(y_fit)
+            weights = compute_class_weight('balanced', classes=classes, y=y_fit)
+            self.training_state[name]['class_weight'] = {str(c): float(w) for c, w in zip(classes, weights)}
+    
+    def prepare_update_data(self, patients_df, visits_df, new_visits):
+        """
+        Training data of new visits for update_models
+        
+        Args:
+            patients_df, visits_df: the patients with new visits and all of
+                their visits (progression features need the earlier visits)
+            new_visits: boolean mask of the new rows of visits_df
+        
+        Returns:
+            BATCH_MODELS name -> (X, y) of the new visits. Raises ValueError
+            on categories the label encoders have not seen.
+        """
+        new_visits = np.asarray(new_visits, dtype=bool)
+        X_progression, y_progression = self.prepare_disease_progression_data(visits_df)
+        new_progression = new_visits[visits_df.index.get_indexer(X_progression.index)]
+        return {
+            'readmission': self.prepare_readmission_data(patients_df, visits_df[new_visits]),
+            'risk_score': self.prepare_risk_score_data(patients_df, visits_df[new_visits]),
+            'disease_progression': (X_progression[new_progression], y_progression[new_progression])
+        }
+    
+    def update_models(self, datasets):
+        """
+        Incremental update of the loaded models (see load_for_update) from
+        new rows only: each ensemble gets extra trees fitted on them (warm
+        start), in proportion to their share of the rows it was trained on.
+        All models are updated or none is. Fast-tier students are dropped
+        (the full tier serves until the next full training distills new ones).
+        
+        Args:
+            datasets: BATCH_MODELS name -> (X, y) of the new rows (prepare_update_data)
+        
+        Returns:
+            (action, report): action is 'updated', 'skipped' (too few new
+            rows: wait for more) or 'retrain' (drift, a metric drop or an
+            ensemble grown too large: train fully); report is name -> the
+            checks, with a 'reason' for models that blocked the update
+        """
+        from sklearn.metrics import accuracy_score, r2_score
+        from sklearn.utils.class_weight import compute_class_weight
+        
+        # Scaled like at training time (readmission; the others pass through)
+        pipelines = self.feature_pipelines()
+        inputs = {name: pipelines[name].scale_rows(np.asarray(X, dtype=np.float64))
+                  for name, (X, _) in datasets.items()}
+        report, actions = {}, set()
+        for name in BATCH_MODELS:
+            X, y = datasets[name]
+            model = getattr(self, MODEL_ATTRS[name])
+            state = self.training_state.get(name)
+            checks = report[name] = {'rows': len(X)}
+            if model is None or state is None:
+                checks['reason'] = "no training state"
+                actions.add('retrain')
+                continue
+            if len(X) < UPDATE_MIN_ROWS:
+                checks['reason'] = f"{len(X)} new rows (minimum {UPDATE_MIN_ROWS})"
+                actions.add('skipped')
+                continue
+            if hasattr(model, 'classes_') and set(np.unique(y).tolist()) != set(model.classes_.tolist()):
+                checks['reason'] = "new rows lack some classes"
+                actions.add('skipped')
+                continue
+            
+            psi = population_stability(state['reference'], X)
+            checks['psi'] = max(psi.values())
+            metric = UPDATE_METRICS[name]
+            predicted = model.predict(inputs[name])
+            checks[metric] = float((accuracy_score if metric == 'accuracy' else r2_score)(y, predicted))
+            checks['trees_added'] = max(1, round(state['base_trees'] * len(X) / state['rows']))
+            trees = model.get_params()[_tree_count_param(model)]
+            trained = self.training_metrics.get(name, {}).get(metric)
+            if checks['psi'] > UPDATE_PSI_LIMIT:
+                drifted = max(psi, key=psi.get)
+                checks['reason'] = f"{drifted} drifted (PSI {psi[drifted]:.2f} > {UPDATE_PSI_LIMIT})"
+            elif trained is not None and trained - checks[metric] > UPDATE_METRIC_DROP:
+                checks['reason'] = f"{metric} dropped from {trained:.3f} to {checks[metric]:.3f}"
+            elif trees + checks['trees_added'] > UPDATE_MAX_TREES_FACTOR * state['base_trees']:
+                checks['reason'] = f"{trees + checks['trees_added']} trees " \
+                                   f"(maximum {UPDATE_MAX_TREES_FACTOR * state['base_trees']})"
+            actions.add('retrain' if 'reason' in checks else 'updated')
+        
+        action = 'retrain' if 'retrain' in actions else 'skipped' if 'skipped' in actions else 'updated'
+        if action != 'updated':
+            return action, report
+        
+        for name in BATCH_MODELS:
+            X, y = datasets[name]
+            attr = MODEL_ATTRS[name]
+            model = getattr(self, attr)
+            state = self.training_state[name]
+            restore = {'warm_start': False}
+            trees = _tree_count_param(model)
+            params = {'warm_start': True, trees: model.get_params()[trees] + report[name]['trees_added']}
+            if name in MULTICORE_MODELS:
+                params['n_jobs'], restore['n_jobs'] = self.n_jobs, None
+            X_fit, y_fit = inputs[name], y
+            if name == 'readmission':
+                # Rebalanced like the training rows, then weighted like them:
+                # 'balanced' weights of the rows the added trees are fitted on
+                X_fit, y_fit, _ = rebalance_classes(X_fit, y, self.rebalance)
+                classes = np.unique(y_fit)
+                weights = compute_class_weight('balanced', classes=classes, y=y_fit)
+                params['class_weight'] = {int(c): float(w) for c, w in zip(classes, weights)}
+                restore['class_weight'] = model.class_weight
+            elif 'class_weight' in state:
+                # 'balanced' weights computed from the new rows alone would skew
+                # the added trees: use those of the full training data
+                params['class_weight'] = {int(c): w for c, w in state['class_weight'].items()}
+                restore['class_weight'] = model.class_weight
+            model.set_params(**params)
+            model.fit(X_fit, y_fit)
+            model.set_params(**restore)
+            
+            state['updates'] += 1
+            state['updated_rows'] += len(X)
+            self.fast_models.pop(attr, None)
+            self.tier_reports.pop(name, None)
+            print(f"✅ {name}: +{report[name]['trees_added']} trees from {len(X):,} new rows "
+                  f"({model.get_params()[trees]} trees)")
+        
+        self.compile_preprocessing()
+        return action, report
+    
+    def _train_fast_tier(self, name, X_train, X_test, y_test):
+        """
+        Distill the compact fast-tier student of a just-trained model (when
+        fast_tier is on) and record the tier report of both. Without
+        fast_tier, a student of the previous model is dropped.
+        """
+        attr = MODEL_ATTRS[name]
+        self.fast_models.pop(attr, None)
+        self.tier_reports.pop(name, None)
+        if not self.fast_tier:
+            return
+        teacher = getattr(self, attr)
+        student = distill(teacher, X_train, FAST_TIER_PARAMS[name], n_jobs=self.n_jobs)
+        self.fast_models[attr] = student
+        self.tier_reports[name] = {
+            'full': tier_report(teacher, X_test, y_test),
+            'fast': tier_report(student, X_test, y_test, teacher)
+        }
+        fast = self.tier_reports[name]['fast']
+        print(f"⚡ Fast tier: {fast['n_trees']} trees, depth {fast['max_depth']}, "
+              f"{fast['batch_us_per_row']:.2f} us/row "
+              f"(full: {self.tier_reports[name]['full']['batch_us_per_row']:.2f} us/row)")
+    
+    def print_tier_report(self):
+        """Latency, memory and accuracy of each model tier trained in this process"""
+        if not self.tier_reports:
+            return
+        print(f"{'Model':<20} {'Tier':<5} {'Trees':>5} {'Depth':>5} {'Memory':>10} "
+              f"{'1 row (us)':>10} {'Batch (us/row)':>14}  Quality")
+        for name, tiers in self.tier_reports.items():
+            for tier, report in tiers.items():
+                quality = ", ".join(f"{k}={v:.3f}" for k, v in report['metrics'].items())
+                print(f"{name:<20} {tier:<5} {report['n_trees']:>5} {report['max_depth']:>5} "
+                      f"{report['memory_bytes'] / 1024:>8.0f}KB {report['latency_us']:>10.1f} "
+                      f"{report['batch_us_per_row']:>14.2f}  {quality}")
+    
+    def save_models(self, timestamp=None, activate=True):
+        """
+        Save all trained models and register them as one bundle; with
+        `activate`, the saved models become the active (served) versions.
+        Models that are not trained are left at their current version.
+        """
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
         
         if self.readmission_model is not None:
             try:
@@ -327,6 +1061,15 @@ class HealthcareMLModels:
             except:
                 pass
         
+        # Fast-tier students of the models saved above
+        for attr, model in self._fast_models().items():
+            try:
+                joblib.dump(model, f"{self.model_dir}/{tier_name(attr, 'fast')}_{timestamp}.pkl")
+            except Exception as e:
+                print(f"⚠️  Could not save fast tier of {attr}: {e}")
+        if self._fast_models():
+            print(f"✅ Saved fast-tier models")
+        
         # Save encoders and scaler
         try:
             joblib.dump(self.label_encoders, f"{self.model_dir}/label_encoders_{timestamp}.pkl")
@@ -334,157 +1077,834 @@ class HealthcareMLModels:
             print(f"✅ Saved encoders and scaler")
         except:
             pass
+        
+        self.export_compiled(timestamp)
+        self.export_onnx(timestamp)
+        self.register_bundle(timestamp, activate)
+        # The served bundle is now the saved one
+        self.compile_preprocessing(version=timestamp)
     
-    def load_models(self, timestamp=None):
-        """Load saved models"""
-        if timestamp is None:
-            # Find latest models
-            files = os.listdir(self.model_dir)
-            # Extract full timestamp from filenames like "readmission_model_20260119_054913.pkl"
-            timestamps = []
-            for f in files:
-                if 'readmission_model_' in f and f.endswith('.pkl'):
-                    # Extract timestamp part after "readmission_model_"
-                    ts = f.replace('readmission_model_', '').replace('.pkl', '')
-                    timestamps.append(ts)
-            
-            if timestamps:
-                timestamp = sorted(timestamps)[-1]
+    def _fast_models(self):
+        """Fast-tier students whose full model is in the working set (attr -> model)"""
+        return {attr: model for attr, model in self.fast_models.items() if getattr(self, attr) is not None}
+    
+    def _tier_models(self):
+        """(tier, attr, model) of every model in the working set"""
+        models = [('full', attr, getattr(self, attr)) for attr in COMPILED_MODELS if getattr(self, attr) is not None]
+        return models + [('fast', attr, model) for attr, model in self._fast_models().items()]
+    
+    def register_bundle(self, timestamp, activate=True):
+        """
+        Write the registry manifest for the artifacts saved under `timestamp`;
+        fast-tier artifacts are listed under tier_name(kind, 'fast') kinds
+        """
+        spec = self.preprocessing_spec()
+        models = {}
+        for name, attr in MODEL_ATTRS.items():
+            if getattr(self, attr) is None:
+                continue
+            artifacts = {
+                tier_name(kind, tier): f"{tier_name(attr, tier)}_{timestamp}{suffix}"
+                for tier in TIERS
+                for kind, suffix in [('compiled', '.joblib'), ('onnx', '.onnx'), ('pickle', '.pkl')]
+                if os.path.exists(f"{self.model_dir}/{tier_name(attr, tier)}_{timestamp}{suffix}")
+            }
+            if not artifacts:
+                continue
+            models[name] = {
+                'artifacts': artifacts,
+                'features': MODEL_FEATURES[name],
+                'preprocessing': self._pipeline(spec, name).to_dict(),
+                'metrics': self.training_metrics.get(name, {})
+            }
+            if name in self.tier_reports and attr in self.fast_models:
+                models[name]['tiers'] = self.tier_reports[name]
+            if name in self.training_state:
+                models[name]['training'] = {**self.training_state[name], 'watermark': self.watermark}
+            models[name]['estimator'] = type(getattr(self, attr)).__name__
+            models[name]['hyperparameters'] = {**default_hyperparameters(name, self.risk_engine),
+                                               **self.hyperparameters.get(name, {})}
+            if name in self.search_reports:
+                models[name]['search'] = self.search_reports[name]
+        if not models:
+            return None
+        
+        shared = [f for f in [f"label_encoders_{timestamp}.pkl", f"scaler_{timestamp}.pkl",
+                              f"preprocessing_{timestamp}.json"]
+                  if os.path.exists(f"{self.model_dir}/{f}")]
+        manifest = self.registry.register(timestamp, models, shared)
+        if activate:
+            self.registry.activate(timestamp)
+        print(f"✅ Registered bundle {timestamp} ({', '.join(models)})")
+        return manifest
+    
+    def export_compiled(self, timestamp):
+        """
+        Export the serving form of the bundle: each ensemble flattened to
+        NumPy arrays (.joblib, memory-mappable) plus the preprocessing spec (.json)
+        """
+        for tier, attr, model in self._tier_models():
+            try:
+                CompiledEnsemble.from_sklearn(model).save(f"{self.model_dir}/{tier_name(attr, tier)}_{timestamp}.joblib")
+            except Exception as e:
+                print(f"⚠️  Could not compile {tier_name(attr, tier)}: {e}")
+                return False
         
-        if timestamp:
+        # Written last and renamed into place: its presence marks a complete bundle
+        spec_file = f"{self.model_dir}/preprocessing_{timestamp}.json"
+        with open(spec_file + '.tmp', 'w') as f:
+            json.dump(self.preprocessing_spec(), f)
+        os.replace(spec_file + '.tmp', spec_file)
+        print(f"✅ Saved compiled models and preprocessing spec")
+        return True
+    
+    def export_onnx(self, timestamp):
+        """
+        Export each model with its encoding and scaling as one ONNX graph
+        ({attr}_{timestamp}.onnx); skipped when skl2onnx is not installed
+        """
+        spec = self.preprocessing_spec()
+        names = {attr: name for name, attr in MODEL_ATTRS.items()}
+        exported = True
+        for tier, attr, model in self._tier_models():
+            name = names[attr]
+            pipeline = self._pipeline(spec, name)
+            scaling = {'mean': pipeline.mean, 'scale': pipeline.scale} if pipeline.scaled else None
             try:
-                self.readmission_model = joblib.load(
-                    f"{self.model_dir}/readmission_model_{timestamp}.pkl"
-                )
-                self.risk_model = joblib.load(
-                    f"{self.model_dir}/risk_model_{timestamp}.pkl"
-                )
-                self.disease_progression_model = joblib.load(
-                    f"{self.model_dir}/disease_progression_model_{timestamp}.pkl"
-                )
-                self.label_encoders = joblib.load(
-                    f"{self.model_dir}/label_encoders_{timestamp}.pkl"
-                )
-                self.scaler = joblib.load(
-                    f"{self.model_dir}/scaler_{timestamp}.pkl"
-                )
-                print(f"✅ Loaded models from {timestamp}")
-                return True
+                onnx_backend.export_onnx(model, MODEL_FEATURES[name], pipeline.category_codes, scaling,
+                                         f"{self.model_dir}/{tier_name(attr, tier)}_{timestamp}.onnx")
+            except ImportError:
+                print("⚠️  skl2onnx not installed, skipping ONNX export")
+                return False
+            except Exception as e:
+                # Served from its other artifacts (e.g. categorical splits skl2onnx cannot convert)
+                print(f"⚠️  Could not export {tier_name(attr, tier)} to ONNX: {str(e).splitlines()[0][:200]}")
+                exported = False
+        if exported:
+            print(f"✅ Saved ONNX models")
+        return exported
+    
+    def saved_timestamps(self):
+        """Timestamps of the saved bundles in model_dir, oldest first"""
+        timestamps = set()
+        for f in os.listdir(self.model_dir):
+            # Extract full timestamp from filenames like "readmission_model_20260119_054913.pkl"
+            if f.startswith('readmission_model_') and f.endswith(('.pkl', *COMPILED_SUFFIXES)):
+                timestamps.add(f.replace('readmission_model_', '').rsplit('.', 1)[0])
+        return sorted(timestamps)
+    
+    def load_models(self, timestamp=None):
+        """
+        Load saved models: the active version of each model from the
+        registry, every model of bundle `timestamp` when given, or (for
+        bundles saved before the registry) the latest timestamped files.
+        Compiled arrays are used when available, else pickles.
+        Everything is read into a new bundle first and then swapped in, so
+        predictions keep using the previous bundle until the load completes.
+        With lazy_load, only the preprocessing is read here; each model is
+        loaded when its endpoint is first used (compiled arrays are
+        memory-mapped, so that is cheap and the pages are shared by every
+        worker process).
+        """
+        with self._load_lock:
+            try:
+                resolved = self.registry.resolve(timestamp)
+                if resolved:
+                    return self._load_registered(resolved)
             except Exception as e:
                 print(f"❌ Error loading models: {e}")
                 return False
-        return False
+            return self._load_unregistered(timestamp)
+    
+    def _load_registered(self, resolved):
+        """Load models from registry manifest entries: name -> (bundle id, entry)"""
+        loaders, specs, versions = {}, {}, {}
+        kinds = [k for k in BACKENDS[self.backend] if k != 'onnx' or onnx_backend.available()]
+        for name, (bundle_id, entry) in resolved.items():
+            for tier in TIERS:
+                kind = next((k for k in kinds if tier_name(k, tier) in entry['artifacts']), None)
+                if kind is None:
+                    if tier != 'full':
+                        continue  # bundle trained without this tier
+                    raise FileNotFoundError(f"No {self.backend} artifact for {name} in bundle {bundle_id}")
+                filename = entry['artifacts'][tier_name(kind, tier)]
+                if not os.path.exists(f"{self.model_dir}/{filename}"):
+                    raise FileNotFoundError(f"Missing model file: {filename}")
+                loaders[tier_name(MODEL_ATTRS[name], tier)] = self._artifact_loader(entry, kind, tier)
+            specs[name] = FeaturePipeline.from_dict(entry['preprocessing'], MODEL_FEATURES[name])
+            versions[name] = bundle_id
+        
+        # Lazily loaded models stay out of the working set (used for
+        # training/saving); they live in the bundle once first used
+        models = {attr: loaders[attr]() if attr in loaders and not self.lazy_load else None
+                  for attr in (tier_name(a, tier) for tier in TIERS for a in COMPILED_MODELS)}
+        for attr in COMPILED_MODELS:
+            setattr(self, attr, models[attr])
+        self.fast_models = {attr: models[tier_name(attr, 'fast')] for attr in COMPILED_MODELS
+                            if models[tier_name(attr, 'fast')] is not None}
+        if not self.lazy_load:
+            loaders = None
+        
+        ids = sorted(set(versions.values()))
+        version = ids[0] if len(ids) == 1 else ",".join(f"{name}={v}" for name, v in versions.items())
+        self._publish(specs, version, loaders, versions)
+        self._adopt_pipelines(specs)
+        print(f"✅ Loaded models {version}" + (" (lazily)" if self.lazy_load else ""))
+        return True
+    
+    def load_hyperparameters(self):
+        """
+        Train with the hyperparameters the active models were trained with
+        (e.g. chosen by an earlier search), unless they were trained as a
+        different estimator (risk_engine); returns name -> hyperparameters
+        """
+        for name, (_, entry) in self.registry.resolve().items():
+            same_estimator = entry.get('estimator', estimator_name(name)) == estimator_name(name, self.risk_engine)
+            if entry.get('hyperparameters') and same_estimator:
+                self.hyperparameters[name] = entry['hyperparameters']
+        return dict(self.hyperparameters)
+    
+    def load_for_update(self):
+        """
+        Load the active models as scikit-learn estimators, with the encoders,
+        fill values, scaler, training state and watermark of their bundle, for update_models
+        
+        Returns:
+            None when loaded, else why the models cannot be updated (they
+            need a full training)
+        """
+        resolved = self.registry.resolve()
+        missing = [name for name in BATCH_MODELS if name not in resolved]
+        if missing:
+            return f"no active {', '.join(missing)} model"
+        bundle_ids = {bundle_id for bundle_id, _ in resolved.values()}
+        if len(bundle_ids) > 1:
+            return f"the active models come from different bundles ({', '.join(sorted(bundle_ids))})"
+        bundle_id = bundle_ids.pop()
+        shared = [f"{self.model_dir}/label_encoders_{bundle_id}.pkl", f"{self.model_dir}/scaler_{bundle_id}.pkl"]
+        for name, (_, entry) in resolved.items():
+            if 'training' not in entry or 'pickle' not in entry['artifacts']:
+                return f"bundle {bundle_id} has no training state or pickle for {name}"
+        if not all(os.path.exists(path) for path in shared):
+            return f"bundle {bundle_id} has no saved encoders and scaler"
+        watermark = resolved[BATCH_MODELS[0]][1]['training']['watermark']
+        if watermark is None:
+            return f"bundle {bundle_id} has no watermark"
+        
+        with self._load_lock:
+            self.label_encoders, self.scaler = (joblib.load(path) for path in shared)
+            # Update data is filled with the values learned at training time
+            self.fill_values = {name: dict(entry['preprocessing'].get('fill') or {})
+                                for name, (_, entry) in resolved.items()}
+            for name, (_, entry) in resolved.items():
+                setattr(self, MODEL_ATTRS[name], joblib.load(self.registry.artifact_path(entry, 'pickle')))
+                self.training_metrics[name] = entry['metrics']
+                self.training_state[name] = {k: v for k, v in entry['training'].items() if k != 'watermark'}
+                self.hyperparameters[name] = entry.get('hyperparameters', {})
+            self.watermark = watermark
+            # New readmission rows are rebalanced like the training rows were
+            self.rebalance = resolved['readmission'][1]['metrics'].get('rebalance', self.rebalance)
+            # Saved with the hyperparameters of the engine the risk model was trained as
+            estimator = resolved['risk_score'][1].get('estimator', RISK_ENGINES[DEFAULT_RISK_ENGINE])
+            self.risk_engine = next(e for e, cls in RISK_ENGINES.items() if cls == estimator)
+            self.fast_models, self.tier_reports = {}, {}
+            self.compile_preprocessing(version=bundle_id)
+        print(f"✅ Loaded models {bundle_id} for an incremental update")
+        return None
+    
+    def _artifact_loader(self, entry, kind, tier='full'):
+        """Zero-argument loader of a registered artifact (checksum-verified when called)"""
+        artifact = tier_name(kind, tier)
+        if kind == 'compiled':
+            return lambda: CompiledEnsemble.load(self.registry.artifact_path(entry, artifact))
+        if kind == 'onnx':
+            return lambda: onnx_backend.OnnxModel.load(self.registry.artifact_path(entry, artifact), self.onnx_threads)
+        return lambda: joblib.load(self.registry.artifact_path(entry, artifact))
+    
+    def _load_unregistered(self, timestamp):
+        """Load a bundle saved before the registry (timestamped files only)"""
+        if timestamp is None:
+            # Find latest models
+            timestamps = self.saved_timestamps()
+            if timestamps:
+                timestamp = timestamps[-1]
+        
+        if not timestamp:
+            return False
+        
+        try:
+            spec_file = f"{self.model_dir}/preprocessing_{timestamp}.json"
+            compiled_files = None
+            # Bundles from before the registry have no ONNX files
+            for suffix in COMPILED_SUFFIXES if self.backend == 'compiled' else []:
+                paths = [f"{self.model_dir}/{attr}_{timestamp}{suffix}" for attr in COMPILED_MODELS]
+                if all(os.path.exists(p) for p in paths + [spec_file]):
+                    compiled_files = paths
+                    break
+            
+            if compiled_files:
+                # Serving path: NumPy arrays + JSON, no scikit-learn
+                loaders = {attr: (lambda path=path: CompiledEnsemble.load(path))
+                           for attr, path in zip(COMPILED_MODELS, compiled_files)}
+                with open(spec_file) as f:
+                    spec = json.load(f)
+                source = "compiled models"
+            else:
+                paths = [f"{self.model_dir}/{attr}_{timestamp}.pkl" for attr in COMPILED_MODELS]
+                missing = [p for p in paths if not os.path.exists(p)]
+                if missing:
+                    raise FileNotFoundError(f"Missing model files: {', '.join(missing)}")
+                loaders = {attr: (lambda path=path: joblib.load(path))
+                           for attr, path in zip(COMPILED_MODELS, paths)}
+                label_encoders = joblib.load(f"{self.model_dir}/label_encoders_{timestamp}.pkl")
+                scaler = joblib.load(f"{self.model_dir}/scaler_{timestamp}.pkl")
+                spec = None
+                source = "models"
+            
+            models = {attr: None if self.lazy_load else load() for attr, load in loaders.items()}
+        except Exception as e:
+            print(f"❌ Error loading models: {e}")
+            return False
+        
+        for attr, model in models.items():
+            setattr(self, attr, model)
+        self.fast_models = {}  # bundles from before the registry have no fast tier
+        if not self.lazy_load:
+            loaders = None
+        if spec is None:
+            self.label_encoders, self.scaler = label_encoders, scaler
+            self.compile_preprocessing(version=timestamp, loaders=loaders)
+        else:
+            self.compile_preprocessing(spec, version=timestamp, loaders=loaders)
+            self._adopt_pipelines(self._bundle.preprocessing)
+        print(f"✅ Loaded {source} from {timestamp}" + (" (lazily)" if self.lazy_load else ""))
+        return True
     
-    def predict_readmission(self, patient_data):
+    def preprocessing_spec(self):
+        """
+        JSON-serializable preprocessing: categorical code tables, the fill
+        values of each model and the readmission scaler's mean/scale
+        """
+        spec = {
+            'category_codes': {
+                col: {str(c): code for code, c in enumerate(encoder.classes_)}
+                for col, encoder in self.label_encoders.items()
+            },
+            'fill': self.fill_values,
+            'scaling': {}
+        }
+        if self.scaler is not None and hasattr(self.scaler, 'mean_'):
+            spec['scaling']['readmission'] = {
+                'mean': [float(v) for v in self.scaler.mean_],
+                'scale': [float(v) for v in self.scaler.scale_]
+            }
+        return spec
+    
+    @property
+    def label_encoders(self):
+        """Working LabelEncoder of each categorical column (training and saving)"""
+        self._restore_working_set()
+        return self._label_encoders
+    
+    @label_encoders.setter
+    def label_encoders(self, encoders):
+        self._restore_working_set()
+        self._label_encoders = encoders
+    
+    @property
+    def scaler(self):
+        """Working StandardScaler of the readmission features (training and saving)"""
+        self._restore_working_set()
+        return self._scaler
+    
+    @scaler.setter
+    def scaler(self, scaler):
+        self._restore_working_set()
+        self._scaler = scaler
+    
+    def _adopt_pipelines(self, pipelines):
+        """
+        Make loaded FeaturePipelines the working preprocessing, so models
+        trained, compiled or saved later keep the loaded codes, fill values
+        and scaling. The encoders and scaler are only rebuilt when used:
+        serving compiled models never imports scikit-learn.
+        """
+        self.fill_values = {name: dict(pipeline.fill) for name, pipeline in pipelines.items() if pipeline.fill}
+        self._loaded_pipelines = dict(pipelines)
+    
+    def _restore_working_set(self):
+        pipelines, self._loaded_pipelines = self._loaded_pipelines, None
+        if pipelines is None:
+            return
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+        
+        encoders = {}
+        for pipeline in pipelines.values():
+            for col, codes in pipeline.category_codes.items():
+                encoders[col] = LabelEncoder()
+                encoders[col].classes_ = np.array(sorted(codes, key=codes.get), dtype=object)
+        self._label_encoders = encoders
+        
+        readmission = pipelines.get('readmission')
+        if readmission is not None and readmission.scaled:
+            scaler = StandardScaler()
+            scaler.mean_ = np.array(readmission.mean, dtype=np.float64)
+            scaler.scale_ = np.array(readmission.scale, dtype=np.float64)
+            scaler.var_ = scaler.scale_ ** 2
+            scaler.n_features_in_ = len(readmission.columns)
+            scaler.feature_names_in_ = np.array(readmission.columns, dtype=object)
+            self._scaler = scaler
+        else:
+            self._scaler = None
+    
+    def feature_pipelines(self):
+        """FeaturePipeline of each model from the working encoders, fill values and scaler"""
+        spec = self.preprocessing_spec()
+        return {name: self._pipeline(spec, name) for name in BATCH_MODELS}
+    
+    def compile_preprocessing(self, spec=None, version=None, loaders=None):
+        """
+        Publish the working models as the served bundle, with the
+        FeaturePipeline of each model: a fixed feature order, dict lookup
+        tables for the categorical codes and the scaler folded into constant
+        mean/scale arrays.
+        Called whenever models are trained, saved or loaded; the bundle gets
+        the saved timestamp as its version (or an "unsaved_" one).
+        """
+        if spec is None:
+            spec = self.preprocessing_spec()
+        pipelines = {name: self._pipeline(spec, name) for name in BATCH_MODELS}
+        self._publish(pipelines, version or datetime.now().strftime("unsaved_%Y%m%d_%H%M%S_%f"), loaders)
+    
+    def _pipeline(self, spec, name):
+        """One model's FeaturePipeline of a preprocessing spec (specs saved before fill values have none)"""
+        return FeaturePipeline(
+            MODEL_FEATURES[name], spec['category_codes'], spec.get('fill', {}).get(name),
+            *((spec['scaling'][name]['mean'], spec['scaling'][name]['scale']) if name in spec['scaling'] else ())
+        )
+    
+    def _publish(self, pipelines, version, loaders=None, model_versions=None):
+        """Build a bundle from the FeaturePipeline of each model and swap it in"""
+        bundle = self._build_bundle(pipelines, version, loaders, model_versions)
+        
+        # Swap in one assignment; cached results belong to the old version
+        self._bundle = bundle
+        self.prediction_cache.clear()
+    
+    def _build_bundle(self, pipelines, version, loaders=None, model_versions=None):
+        category_codes, preprocessing = {}, {}
+        for name, feature_cols in MODEL_FEATURES.items():
+            pipeline = pipelines.get(name) or FeaturePipeline(feature_cols)
+            category_codes.update(pipeline.category_codes)
+            preprocessing[name] = pipeline
+        models = {attr: getattr(self, attr) for attr in COMPILED_MODELS}
+        models.update({tier_name(attr, 'fast'): model for attr, model in self._fast_models().items()})
+        return ModelBundle(version, models, category_codes, preprocessing, loaders, model_versions)
+    
+    @property
+    def registry(self):
+        """Manifests and active pointers of the bundles in model_dir"""
+        return ModelRegistry(self.model_dir)
+    
+    @property
+    def model_version(self):
+        """Version of the served bundle (None before any model is trained or loaded)"""
+        return self._bundle.version
+    
+    @property
+    def model_versions(self):
+        """Served version of each model"""
+        return dict(self._bundle.model_versions)
+    
+    @property
+    def category_codes(self):
+        """Served categorical code tables (column -> value -> code)"""
+        return self._bundle.category_codes
+    
+    def _encode_row(self, name, data, bundle=None, timer=None):
+        """
+        Encode one feature dict into this thread's preallocated (1, n) float64
+        buffer and scale it in place. Raises ValueError on bad input.
+        """
+        bundle = bundle or self._bundle
+        pipeline = bundle.preprocessing[name]
+        
+        buffers = bundle.buffers.__dict__
+        buffer = buffers.get(name)
+        if buffer is None:
+            buffer = buffers[name] = np.empty((1, len(pipeline.columns)), dtype=np.float64)
+        pipeline.encode_row(data, buffer[0])
+        
+        if timer:
+            timer.lap('encode')
+        if pipeline.scaled:
+            pipeline.scale_rows(buffer, out=buffer)
+            if timer:
+                timer.lap('scale')
+        return buffer
+    
+    def predict_readmission(self, patient_data, explain=False, tier='full'):
         """
         Predict 30-day readmission probability
         
         Args:
             patient_data: dict with keys matching feature columns
+            explain: add per-feature contributions (see explain_rows)
+            tier: 'full' or 'fast' (falls back to full if the bundle has no fast tier)
         
         Returns:
             dict with prediction and probability
         """
-        if not self.readmission_model:
+        bundle = self._bundle
+        tier = bundle.serving_tier('readmission', tier)
+        model, _ = bundle.model('readmission', tier)
+        if not model:
             return {"error": "Model not trained yet"}
         
-        # Prepare input
-        X = pd.DataFrame([patient_data])
-        
-        # Encode categorical
-        categorical_cols = ['gender', 'smoker_status', 'alcohol_use']
-        for col in categorical_cols:
-            if col in X.columns and col in self.label_encoders:
-                X[col] = self.label_encoders[col].transform(X[col].astype(str))
-        
-        # Scale
-        X_scaled = self.scaler.transform(X)
-        
-        # Predict
-        prediction = self.readmission_model.predict(X_scaled)[0]
-        probability = self.readmission_model.predict_proba(X_scaled)[0]
-        
-        return {
-            "readmission_risk": "High" if prediction == 1 else "Low",
-            "probability": float(probability[1]),
-            "recommendation": "Close monitoring required" if prediction == 1 else "Standard care protocol"
-        }
+        # Predict (one predict_proba call; the label is its argmax)
+        return self._predict_row(
+            bundle, 'readmission', patient_data,
+            lambda X_scaled: model.predict_proba(self._model_input(model, X_scaled, [patient_data])),
+            lambda probabilities: self._format_readmission(model, probabilities)[0],
+            explain, tier
+        )
     
-    def predict_risk_score(self, patient_data):
+    def predict_risk_score(self, patient_data, explain=False, tier='full'):
         """
         Predict overall health risk score (0-100)
         
         Args:
             patient_data: dict with keys matching feature columns
+            explain: add per-feature contributions (see explain_rows)
+            tier: 'full' or 'fast' (falls back to full if the bundle has no fast tier)
         
         Returns:
             dict with risk score and category
         """
-        if not self.risk_model:
+        bundle = self._bundle
+        tier = bundle.serving_tier('risk_score', tier)
+        model, _ = bundle.model('risk_score', tier)
+        if not model:
             return {"error": "Model not trained yet"}
         
-        # Prepare input
-        X = pd.DataFrame([patient_data])
-        
-        # Encode categorical
-        categorical_cols = ['gender', 'smoker_status', 'alcohol_use']
-        for col in categorical_cols:
-            if col in X.columns and col in self.label_encoders:
-                X[col] = self.label_encoders[col].transform(X[col].astype(str))
-        
         # Predict
-        risk_score = self.risk_model.predict(X)[0]
-        risk_score = np.clip(risk_score, 0, 100)
-        
-        # Categorize risk
-        if risk_score < 30:
-            category = "Low Risk"
-            color = "green"
-        elif risk_score < 60:
-            category = "Moderate Risk"
-            color = "yellow"
-        else:
-            category = "High Risk"
-            color = "red"
-        
-        return {
-            "risk_score": float(risk_score),
-            "category": category,
-            "color": color
-        }
+        return self._predict_row(
+            bundle, 'risk_score', patient_data,
+            lambda X: model.predict(self._model_input(model, X, [patient_data])),
+            lambda risk_scores: self._format_risk_score(risk_scores)[0],
+            explain, tier
+        )
     
-    def predict_disease_progression(self, visit_data):
+    def predict_disease_progression(self, visit_data, explain=False, tier='full'):
         """
         Predict disease progression trend
         
         Args:
             visit_data: dict with current visit metrics
+            explain: add per-feature contributions (see explain_rows)
+            tier: 'full' or 'fast' (falls back to full if the bundle has no fast tier)
         
         Returns:
             dict with progression prediction
         """
-        if not self.disease_progression_model:
+        bundle = self._bundle
+        tier = bundle.serving_tier('disease_progression', tier)
+        model, _ = bundle.model('disease_progression', tier)
+        if not model:
             return {"error": "Model not trained yet"}
         
-        # Prepare input
-        X = pd.DataFrame([visit_data])
+        # Predict (one predict_proba call; the label is its argmax)
+        return self._predict_row(
+            bundle, 'disease_progression', visit_data,
+            lambda X: model.predict_proba(self._model_input(model, X, [visit_data])),
+            lambda probabilities: self._format_disease_progression(model, probabilities)[0],
+            explain, tier
+        )
+    
+    def _model_input(self, model, X, records):
+        """
+        What a model scores: the encoded matrix, or the raw records for
+        models whose graph does the encoding itself (ONNX)
+        """
+        return records if getattr(model, 'takes_records', False) else X
+    
+    def _predict_row(self, bundle, name, data, predict, format_output, explain=False, tier='full'):
+        """
+        Encode one record and return format_output(predict(X)), served from
+        the prediction cache when the same encoded row was scored by this
+        bundle's version of the tier (explanations are computed per call and
+        never cached). Each stage is timed into ml_prediction_stage_seconds.
+        """
+        version = bundle.model_versions[name]
+        timer = StageTimer(tier_name(name, tier), version)
+        try:
+            X = self._encode_row(name, data, bundle, timer)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        key = (tier_name(name, tier), version, X.tobytes())
+        result = self.prediction_cache.get(key)
+        timer.lap('cache')
+        if result is None:
+            output = predict(X)
+            timer.lap('model')
+            result = format_output(output)
+            result['model_version'] = version
+            result['tier'] = tier
+            timer.lap('format')
+            self.prediction_cache.put(key, result)
+        # Callers may add fields to the response; keep the cached copy intact
+        result = dict(result)
+        if explain:
+            result['explanation'] = self.explain_rows(name, X, bundle, tier)[0]
+            timer.lap('explain')
+        return result
+    
+    def explain_rows(self, name, X, bundle=None, tier='full'):
+        """
+        Per-prediction feature contributions of one model for encoded
+        (and scaled) rows, walking each row's decision paths
+        (CompiledEnsemble.contributions)
         
-        # Predict
-        prediction = self.disease_progression_model.predict(X)[0]
-        probability = self.disease_progression_model.predict_proba(X)[0]
+        Returns:
+            list of {'output', 'base_value', 'contributions': {feature: value}},
+            features ordered by absolute contribution; base_value plus the
+            contributions equals the model output: the readmission
+            probability, the probability of the predicted progression
+            class, or the risk score before clipping to 0-100
+        """
+        bundle = bundle or self._bundle
+        model = bundle.compiled(name, tier)
+        if model is None:
+            message = f"Explanations are not available for the {self.backend} backend"
+            return [{'error': message} for _ in range(len(X))]
+        feature_cols = MODEL_FEATURES[name]
+        bias, contributions = model.contributions(X)
+        rows = np.arange(len(contributions))
+        
+        if name == 'readmission':
+            k = int(np.flatnonzero(model.classes_ == 1)[0])
+            output, bias, contributions = 'probability', bias[k], contributions[:, :, k]
+        elif name == 'disease_progression':
+            predicted = np.argmax(bias + contributions.sum(axis=1), axis=1)
+            output, bias, contributions = 'confidence', bias[predicted], contributions[rows, :, predicted]
+        else:
+            output = 'risk_score'
+        bias = np.broadcast_to(bias, (len(rows),))
+        
+        order = np.argsort(-np.abs(contributions), axis=1, kind='stable')
+        return [
+            {
+                'output': output,
+                'base_value': float(bias[i]),
+                'contributions': {feature_cols[j]: float(contributions[i, j]) for j in order[i]}
+            }
+            for i in rows
+        ]
+    
+    def _format_readmission(self, model, probabilities):
+        """Turn readmission predict_proba output into response dicts"""
+        predictions = model.classes_[np.argmax(probabilities, axis=1)]
+        return [
+            {
+                "readmission_risk": "High" if prediction == 1 else "Low",
+                "probability": float(probability[1]),
+                "recommendation": "Close monitoring required" if prediction == 1 else "Standard care protocol"
+            }
+            for prediction, probability in zip(predictions, probabilities)
+        ]
+    
+    def _format_risk_score(self, risk_scores):
+        """Turn risk model output into response dicts"""
+        results = []
+        for risk_score in np.clip(risk_scores, 0, 100):
+            # Categorize risk
+            if risk_score < 30:
+                category = "Low Risk"
+                color = "green"
+            elif risk_score < 60:
+                category = "Moderate Risk"
+                color = "yellow"
+            else:
+                category = "High Risk"
+                color = "red"
+            
+            results.append({
+                "risk_score": float(risk_score),
+                "category": category,
+                "color": color
+            })
+        return results
+    
+    def _format_disease_progression(self, model, probabilities):
+        """Turn disease progression predict_proba output into response dicts"""
+        predictions = model.classes_[np.argmax(probabilities, axis=1)]
+        return [
+            {
+                "progression": PROGRESSION_LABELS[prediction],
+                "confidence": float(max(probability)),
+                "probabilities": {
+                    "improving": float(probability[0]),
+                    "stable": float(probability[1]),
+                    "worsening": float(probability[2])
+                }
+            }
+            for prediction, probability in zip(predictions, probabilities)
+        ]
+    
+    def encode_records(self, records, feature_cols, category_codes=None):
+        """
+        Encode a list of feature dicts into one float64 matrix
         
-        progression_map = {
-            0: "Improving",
-            1: "Stable",
-            2: "Worsening"
-        }
+        Args:
+            records: list of dicts (one per patient/visit)
+            feature_cols: column order of the matrix
+            category_codes: column -> code table (default: the served ones)
         
-        return {
-            "progression": progression_map[prediction],
-            "confidence": float(max(probability)),
-            "probabilities": {
-                "improving": float(probability[0]),
-                "stable": float(probability[1]),
-                "worsening": float(probability[2])
-            }
-        }
+        Returns:
+            (X, errors) where errors maps row index -> message; rows with
+            errors are left as NaN and must not be scored
+        """
+        if category_codes is None:
+            category_codes = self._bundle.category_codes
+        return FeaturePipeline(feature_cols, category_codes).encode_records(records)
+    
+    def predict_many(self, name, records, explain=False, tier='full'):
+        """
+        Results of one model for a list of records (used by the micro-batcher);
+        a single record takes the precompiled single-row path
+        """
+        if len(records) == 1:
+            if name == 'readmission':
+                return [self.predict_readmission(records[0], explain, tier)]
+            if name == 'risk_score':
+                return [self.predict_risk_score(records[0], explain, tier)]
+            if name == 'disease_progression':
+                return [self.predict_disease_progression(records[0], explain, tier)]
+        return [result[name] for result in self.predict_batch(records, [name], explain, tier)]
+    
+    def _score(self, name, model, X, version, served_tier, timer):
+        """Formatted outputs of one model for a model input (matrix, or records for ONNX)"""
+        if name == 'risk_score':
+            predicted = model.predict(X)
+        else:
+            predicted = model.predict_proba(X)
+        timer.lap('model')
+        if name == 'readmission':
+            scored = self._format_readmission(model, predicted)
+        elif name == 'risk_score':
+            scored = self._format_risk_score(predicted)
+        else:
+            scored = self._format_disease_progression(model, predicted)
+        for output in scored:
+            output['model_version'] = version
+            output['tier'] = served_tier
+        return scored
+    
+    def predict_encoded(self, name, X, explain=False, tier='full'):
+        """
+        Results of one model for rows that are already encoded, such as a
+        feature store matrix (bypasses the prediction cache)
+        
+        Args:
+            name: BATCH_MODELS name
+            X: unscaled rows in MODEL_FEATURES[name] order, categoricals as
+                the served category codes
+            explain: add per-feature contributions to every row
+            tier: 'full' or 'fast'
+        
+        Returns:
+            list of result dicts, one per row
+        """
+        bundle = self._bundle
+        served_tier = bundle.serving_tier(name, tier)
+        model, _ = bundle.model(name, served_tier)
+        if not model:
+            return [{"error": "Model not trained yet"} for _ in range(len(X))]
+        if getattr(model, 'takes_records', False):
+            raise ValueError(f"The {self.backend} backend scores records, not encoded rows")
+        timer = StageTimer(tier_name(name, served_tier), bundle.model_versions.get(name))
+        
+        pipeline = bundle.preprocessing[name]
+        X = np.asarray(X, dtype=np.float64)
+        if pipeline.scaled:
+            X = pipeline.scale_rows(X)
+            timer.lap('scale')
+        outputs = self._score(name, model, X, bundle.model_versions[name], served_tier, timer)
+        timer.lap('format')
+        if explain:
+            for output, explanation in zip(outputs, self.explain_rows(name, X, bundle, served_tier)):
+                output['explanation'] = explanation
+            timer.lap('explain')
+        return outputs
+    
+    def predict_batch(self, records, models=None, explain=False, tier='full'):
+        """
+        Score many patient/visit records with one model call per model
+        
+        Args:
+            records: list of dicts, each holding the fields of every model used
+            models: subset of BATCH_MODELS to run (default: all)
+            explain: add per-feature contributions to every scored row
+            tier: 'full' or 'fast' (per model, falls back to full if the
+                bundle has no fast tier)
+        
+        Returns:
+            list of dicts in input order, keyed by model name; a row that
+            cannot be scored by a model gets {"error": ...} for that model
+        """
+        models = models or BATCH_MODELS
+        results = [{} for _ in records]
+        # Every model in the call is scored from the same bundle
+        bundle = self._bundle
+        
+        for name in models:
+            served_tier = bundle.serving_tier(name, tier)
+            model, _ = bundle.model(name, served_tier)
+            timer = StageTimer(tier_name(name, served_tier), bundle.model_versions.get(name))
+            
+            if not model:
+                for result in results:
+                    result[name] = {"error": "Model not trained yet"}
+                continue
+            
+            pipeline = bundle.preprocessing[name]
+            X, errors = pipeline.encode_records(records)
+            timer.lap('encode')
+            for i, message in errors.items():
+                results[i][name] = {"error": message}
+            
+            valid = np.array([i not in errors for i in range(len(records))], dtype=bool)
+            if not valid.any():
+                continue
+            X = X[valid]
+            
+            if pipeline.scaled:
+                X = pipeline.scale_rows(X)
+                timer.lap('scale')
+            
+            # Rows seen before (same encoded bytes as the single-row path)
+            # come from the cache; only the rest reach the model
+            rows = np.flatnonzero(valid)
+            version = bundle.model_versions[name]
+            keys = [(tier_name(name, served_tier), version, x.tobytes()) for x in X]
+            outputs = self.prediction_cache.get_many(keys)
+            misses = [k for k, output in enumerate(outputs) if output is None]
+            timer.lap('cache')
+            
+            if misses:
+                X_miss = self._model_input(model, X[misses], [records[rows[k]] for k in misses])
+                scored = self._score(name, model, X_miss, version, served_tier, timer)
+                for k, output in zip(misses, scored):
+                    outputs[k] = output
+                self.prediction_cache.put_many([(keys[k], outputs[k]) for k in misses])
+            
+            for i, output in zip(rows, outputs):
+                results[i][name] = dict(output)
+            timer.lap('format')
+            if explain:
+                for i, explanation in zip(rows, self.explain_rows(name, X, bundle, served_tier)):
+                    results[i][name]['explanation'] = explanation
+                timer.lap('explain')
+        
+        return results
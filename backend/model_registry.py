@@ -0,0 +1,224 @@
+"""
+Local Model Registry
+- One manifest per saved bundle (manifests/<bundle_id>.json) listing each
+  model's artifacts with SHA-256 checksums, its feature schema and
+  preprocessing, and its training metrics
+- active.json points each model at the bundle it is served from, so models
+  can be retrained and rolled out (or rolled back) independently
+- Loading reads active.json plus one manifest per model, no directory scans
+- Bundles that no active pointer references can be pruned
+
+Usage:
+    python model_registry.py list
+    python model_registry.py activate <bundle_id> [model ...]
+    python model_registry.py prune [--keep N]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+MANIFEST_DIR = 'manifests'
+ACTIVE_FILE = 'active.json'
+
+
+def file_checksum(path):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# path -> (mtime_ns, size, SHA-256) of artifacts already hashed by this process
+_checksums = {}
+_checksums_lock = threading.Lock()
+
+
+def cached_checksum(path):
+    """
+    file_checksum of a file, hashed once per process while its modification
+    time and size stay the same (reloads of a bundle do not read it again)
+    """
+    stat = os.stat(path)
+    with _checksums_lock:
+        cached = _checksums.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    digest = file_checksum(path)
+    with _checksums_lock:
+        _checksums[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def _write_json(path, data):
+    """Write JSON to a temp file and rename it into place (atomic for readers)"""
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class ModelRegistry:
+    def __init__(self, model_dir='ml_models_saved'):
+        self.model_dir = model_dir
+        self.manifest_dir = os.path.join(model_dir, MANIFEST_DIR)
+        self.active_file = os.path.join(model_dir, ACTIVE_FILE)
+
+    def manifest_path(self, bundle_id):
+        return os.path.join(self.manifest_dir, f"{bundle_id}.json")
+
+    def register(self, bundle_id, models, shared_artifacts=None):
+        """
+        Write the manifest of a saved bundle
+
+        Args:
+            bundle_id: bundle version (the save timestamp)
+            models: model name -> {'artifacts': {kind: filename}, 'features': [...],
+                'preprocessing': {...}, 'metrics': {...}}; files are relative to model_dir
+            shared_artifacts: other files of the bundle (removed with it on prune)
+        """
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        manifest = {
+            'bundle_id': bundle_id,
+            'created_at': datetime.now().isoformat(),
+            'models': {},
+            'shared_artifacts': list(shared_artifacts or [])
+        }
+        for name, entry in models.items():
+            manifest['models'][name] = {
+                **entry,
+                'checksums': {
+                    filename: file_checksum(os.path.join(self.model_dir, filename))
+                    for filename in entry['artifacts'].values()
+                }
+            }
+        _write_json(self.manifest_path(bundle_id), manifest)
+        return manifest
+
+    def manifest(self, bundle_id):
+        """Manifest of a bundle, or None if it is not registered"""
+        try:
+            with open(self.manifest_path(bundle_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def bundle_ids(self):
+        """Registered bundles, oldest first"""
+        if not os.path.isdir(self.manifest_dir):
+            return []
+        return sorted(f[:-len('.json')] for f in os.listdir(self.manifest_dir) if f.endswith('.json'))
+
+    def active(self):
+        """Model name -> bundle id it is served from ({} before anything is activated)"""
+        try:
+            with open(self.active_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def activate(self, bundle_id, names=None):
+        """
+        Point models (default: every model in the bundle) at a registered
+        bundle, in one write
+        """
+        manifest = self.manifest(bundle_id)
+        if manifest is None:
+            raise ValueError(f"Unknown bundle: {bundle_id}")
+        names = list(manifest['models']) if names is None else names
+        for name in names:
+            if name not in manifest['models']:
+                raise ValueError(f"Bundle {bundle_id} has no {name} model")
+        active = self.active()
+        active.update({name: bundle_id for name in names})
+        _write_json(self.active_file, active)
+        return active
+
+    def resolve(self, bundle_id=None):
+        """
+        Model name -> (bundle id, manifest entry) for the active models, or
+        for every model of `bundle_id` when given
+        """
+        if bundle_id is not None:
+            manifest = self.manifest(bundle_id)
+            if manifest is None:
+                return {}
+            return {name: (bundle_id, entry) for name, entry in manifest['models'].items()}
+
+        resolved, manifests = {}, {}
+        for name, active_id in self.active().items():
+            if active_id not in manifests:
+                manifests[active_id] = self.manifest(active_id)
+            manifest = manifests[active_id]
+            if manifest is None or name not in manifest['models']:
+                raise ValueError(f"Active {name} model points at missing bundle {active_id}")
+            resolved[name] = (active_id, manifest['models'][name])
+        return resolved
+
+    def artifact_path(self, entry, kind):
+        """
+        Path of an artifact after checking it against its manifest checksum;
+        None if the entry has no artifact of that kind
+        """
+        filename = entry['artifacts'].get(kind)
+        if filename is None:
+            return None
+        path = os.path.join(self.model_dir, filename)
+        if cached_checksum(path) != entry['checksums'][filename]:
+            raise ValueError(f"Checksum mismatch for {filename}")
+        return path
+
+    def prune(self, keep=5):
+        """
+        Delete all but the newest `keep` bundles, never one an active pointer
+        references. Returns the removed bundle ids.
+        """
+        bundle_ids = self.bundle_ids()
+        protected = set(bundle_ids[-keep:] if keep > 0 else []) | set(self.active().values())
+        removed = []
+        for bundle_id in bundle_ids:
+            if bundle_id in protected:
+                continue
+            manifest = self.manifest(bundle_id)
+            files = list(manifest['shared_artifacts'])
+            for entry in manifest['models'].values():
+                files.extend(entry['artifacts'].values())
+            for filename in files:
+                try:
+                    os.remove(os.path.join(self.model_dir, filename))
+                except FileNotFoundError:
+                    pass
+            os.remove(self.manifest_path(bundle_id))
+            removed.append(bundle_id)
+        return removed
+
+
+if __name__ == '__main__':
+    registry = ModelRegistry('ml_models_saved')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    if command == 'list':
+        active = registry.active()
+        for bundle_id in registry.bundle_ids():
+            manifest = registry.manifest(bundle_id)
+            print(f"📦 {bundle_id}  ({manifest['created_at']})")
+            for name, entry in manifest['models'].items():
+                marker = "✅ active" if active.get(name) == bundle_id else ""
+                metrics = ", ".join(f"{k}={v:.3f}" for k, v in entry['metrics'].items()
+                                    if isinstance(v, float))
+                print(f"   {name:<20} {metrics:<40} {marker}")
+    elif command == 'activate' and len(sys.argv) >= 3:
+        active = registry.activate(sys.argv[2], sys.argv[3:] or None)
+        for name, bundle_id in active.items():
+            print(f"✅ {name} -> {bundle_id}")
+    elif command == 'prune':
+        keep = int(sys.argv[sys.argv.index('--keep') + 1]) if '--keep' in sys.argv else 5
+        removed = registry.prune(keep)
+        print(f"🗑️  Removed {len(removed)} bundle(s): {', '.join(removed) or '-'}")
+    else:
+        print(__doc__)
+        sys.exit(1)
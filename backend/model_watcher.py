@@ -0,0 +1,143 @@
+"""
+Model Hot Reload
+- Saved bundles are loaded on a background thread and swapped in atomically
+  (HealthcareMLModels.load_models), so predictions never wait for a load
+- A polling watcher on the model directory reloads when the registry's
+  active pointers change (or, for bundles saved before the registry, when
+  a newer complete bundle appears)
+- Pointers whose load failed are retried with a growing delay
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY
+
+PICKLE_ARTIFACTS = ['readmission_model', 'risk_model', 'disease_progression_model', 'label_encoders', 'scaler']
+
+
+class ModelWatcher:
+    def __init__(self, ml_models, interval_seconds=5.0, settle_seconds=2.0, max_retry_seconds=300.0):
+        """
+        Args:
+            ml_models: HealthcareMLModels instance to reload
+            interval_seconds: how often the model directory is polled
+            settle_seconds: how long pickle-only bundles must be unchanged
+                before they count as completely written
+            max_retry_seconds: longest delay between retries of active
+                pointers that failed to load
+        """
+        self.ml_models = ml_models
+        self.interval = interval_seconds
+        self.settle = settle_seconds
+        # One loader thread: reloads run in order and never overlap
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-reload')
+        self._seen = set()
+        self._failed = set()
+        self.max_retry = max_retry_seconds
+        self._seen_active = None
+        self._loading_active = None
+        self._failed_active = None
+        self._active_failures = 0
+        self._retry_at = 0.0
+        self._thread = None
+
+    def ready_timestamps(self):
+        """Saved bundles that are completely written, oldest first"""
+        model_dir = self.ml_models.model_dir
+        ready = []
+        for timestamp in self.ml_models.saved_timestamps():
+            # export_compiled() renames the spec into place after the arrays
+            if os.path.exists(f"{model_dir}/preprocessing_{timestamp}.json"):
+                ready.append(timestamp)
+                continue
+            paths = [f"{model_dir}/{name}_{timestamp}.pkl" for name in PICKLE_ARTIFACTS]
+            if all(os.path.exists(p) for p in paths):
+                if time.time() - max(os.path.getmtime(p) for p in paths) >= self.settle:
+                    ready.append(timestamp)
+        return ready
+
+    def reload(self, timestamp=None):
+        """Load a bundle (default: latest) in the background; returns a Future of bool"""
+        return self._executor.submit(self._load, timestamp)
+
+    def _load(self, timestamp):
+        start = time.perf_counter()
+        success = self.ml_models.load_models(timestamp)
+        REGISTRY.counter('ml_model_reloads_total', {'result': 'success' if success else 'failure'},
+                         'Model bundle loads').inc()
+        if success:
+            REGISTRY.gauge('ml_model_reload_seconds', help_text='Duration of the last model load').set(
+                time.perf_counter() - start)
+        elif timestamp:
+            self._failed.add(timestamp)
+        return success
+
+    def _load_active(self, active):
+        # Pointers count as seen only once loaded: a failed load is retried
+        try:
+            success = self._load(None)
+        finally:
+            self._loading_active = None
+        if success:
+            self._seen_active = active
+            self._failed_active, self._active_failures = None, 0
+        else:
+            if active != self._failed_active:
+                self._failed_active, self._active_failures = active, 0
+            self._active_failures += 1
+            delay = min(self.interval * 2 ** self._active_failures, self.max_retry)
+            self._retry_at = time.monotonic() + delay
+            print(f"⚠️  Loading active models {active} failed, retrying in {delay:.0f}s")
+        return success
+
+    def check(self):
+        """
+        Reload if the active model versions changed, or if a complete
+        unregistered bundle newer than any seen so far was saved
+        """
+        active = self.ml_models.registry.active()
+        if active:
+            # Manifests are written after their artifacts and pointers after
+            # manifests, so a changed pointer always refers to complete files
+            if active in (self._seen_active, self._loading_active):
+                return None
+            if active == self._failed_active and time.monotonic() < self._retry_at:
+                return None
+            served = self.ml_models.model_versions
+            if all(served.get(name) == bundle_id for name, bundle_id in active.items()):
+                self._seen_active = active
+                return None
+            print(f"🔄 Active models changed ({active}), reloading...")
+            self._loading_active = active
+            return self._executor.submit(self._load_active, active)
+
+        ready = self.ready_timestamps()
+        if not ready:
+            return None
+        latest = ready[-1]
+        if latest in self._seen or latest in self._failed or latest == self.ml_models.model_version:
+            self._seen.add(latest)
+            return None
+        self._seen.add(latest)
+        print(f"🔄 New model bundle {latest}, reloading...")
+        return self.reload(latest)
+
+    def start(self):
+        """Start polling; bundles already on disk are not reloaded"""
+        if self._thread is not None:
+            return
+        self._seen.update(self.ready_timestamps())
+        self._seen_active = self.ml_models.registry.active()
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Model watcher error: {e}")
@@ -0,0 +1,156 @@
+"""
+ONNX Export and onnxruntime Inference
+- Each model is exported as one graph including its preprocessing: one
+  named input per feature (strings for categoricals, float64 otherwise),
+  the categorical code lookup, the scaler, and the tree ensemble
+- Scaling runs in float64 and the result is cast to float32 before the trees,
+  exactly as scikit-learn does, so predictions match it to float32 precision
+- OnnxModel serves an exported graph with onnxruntime on CPU (no pandas or
+  scikit-learn import)
+
+skl2onnx/onnx (export) and onnxruntime (serving) are optional; they are
+imported only when used.
+"""
+
+import json
+
+import numpy as np
+
+# Default-domain opset for Cast/Concat/Sub/Div and ai.onnx.ml 3 for
+# LabelEncoder (string -> float) and the tree ensembles
+TARGET_OPSET = {'': 17, 'ai.onnx.ml': 3}
+
+
+def available():
+    """True if onnxruntime can be imported"""
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_onnx(model, features, category_codes, scaling, path):
+    """
+    Export a fitted RandomForestClassifier / GradientBoostingRegressor with
+    its preprocessing as one ONNX graph
+
+    Args:
+        model: fitted scikit-learn model (trained on the encoded feature matrix)
+        features: feature columns in model order (the graph's input names)
+        category_codes: column -> {value string: code} for categorical columns
+        scaling: {'mean': [...], 'scale': [...]} applied before the model, or None
+        path: output file
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    is_classifier = hasattr(model, 'classes_')
+    options = {id(model): {'zipmap': False}} if is_classifier else None
+    graph_model = convert_sklearn(model, initial_types=[('X', FloatTensorType([None, len(features)]))],
+                                  options=options, target_opset=TARGET_OPSET)
+    graph = graph_model.graph
+
+    inputs, nodes, columns = [], [], []
+    for col in features:
+        codes = category_codes.get(col)
+        if codes is None:
+            inputs.append(helper.make_tensor_value_info(col, TensorProto.DOUBLE, [None, 1]))
+            columns.append(col)
+            continue
+        inputs.append(helper.make_tensor_value_info(col, TensorProto.STRING, [None, 1]))
+        keys = sorted(codes, key=codes.get)
+        # Unknown values become NaN (the API rejects them before scoring)
+        nodes.append(helper.make_node(
+            'LabelEncoder', [col], [f'{col}_code'], domain='ai.onnx.ml',
+            keys_strings=keys, values_floats=[float(codes[k]) for k in keys], default_float=float('nan')
+        ))
+        nodes.append(helper.make_node('Cast', [f'{col}_code'], [f'{col}_encoded'], to=TensorProto.DOUBLE))
+        columns.append(f'{col}_encoded')
+
+    nodes.append(helper.make_node('Concat', columns, ['encoded'], axis=1))
+    features_out = 'encoded'
+    if scaling:
+        graph.initializer.extend([
+            numpy_helper.from_array(np.asarray(scaling['mean'], dtype=np.float64)[None, :], 'scaler_mean'),
+            numpy_helper.from_array(np.asarray(scaling['scale'], dtype=np.float64)[None, :], 'scaler_scale')
+        ])
+        nodes.append(helper.make_node('Sub', ['encoded', 'scaler_mean'], ['centered']))
+        nodes.append(helper.make_node('Div', ['centered', 'scaler_scale'], ['scaled']))
+        features_out = 'scaled'
+    nodes.append(helper.make_node('Cast', [features_out], ['X'], to=TensorProto.FLOAT))
+
+    # Preprocessing feeds the converted model's 'X' input
+    model_nodes = list(graph.node)
+    del graph.node[:]
+    graph.node.extend(nodes + model_nodes)
+    del graph.input[:]
+    graph.input.extend(inputs)
+
+    # LabelEncoder with string keys and float values needs ai.onnx.ml >= 2
+    for opset in graph_model.opset_import:
+        if opset.domain == 'ai.onnx.ml':
+            opset.version = max(opset.version, 2)
+
+    metadata = {'features': json.dumps(features)}
+    if is_classifier:
+        metadata['classes'] = json.dumps(np.asarray(model.classes_).tolist())
+    helper.set_model_props(graph_model, metadata)
+    onnx.checker.check_model(graph_model)
+    onnx.save_model(graph_model, path)
+
+
+class OnnxModel:
+    """
+    An exported graph served with onnxruntime. It takes the raw feature
+    records (encoding and scaling are part of the graph), so serving code
+    passes records instead of the encoded matrix (`takes_records`).
+    """
+
+    takes_records = True
+
+    def __init__(self, session, features, categorical, classes=None):
+        self.session = session
+        self.features = features
+        self.categorical = categorical
+        self.classes_ = classes
+        outputs = [output.name for output in session.get_outputs()]
+        # Classifiers: [label, probabilities]; regressors: [variable]
+        self._output = outputs[-1]
+
+    @classmethod
+    def load(cls, path, threads=0):
+        """Create a CPU session; threads=0 lets onnxruntime use every core"""
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        metadata = session.get_modelmeta().custom_metadata_map
+        classes = np.asarray(json.loads(metadata['classes'])) if 'classes' in metadata else None
+        categorical = {i.name for i in session.get_inputs() if i.type == 'tensor(string)'}
+        return cls(session, json.loads(metadata['features']), categorical, classes)
+
+    def _feed(self, records):
+        # Categorical inputs are looked up by their string form, like the code tables
+        return {
+            col: np.array([[str(r[col])] for r in records], dtype=object) if col in self.categorical
+            else np.array([[float(r[col])] for r in records], dtype=np.float64)
+            for col in self.features
+        }
+
+    def _run(self, records):
+        return self.session.run([self._output], self._feed(records))[0]
+
+    def predict_proba(self, records):
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._run(records).astype(np.float64)
+
+    def predict(self, records):
+        if self.classes_ is not None:
+            return self.classes_[np.argmax(self.predict_proba(records), axis=1)]
+        return self._run(records)[:, 0].astype(np.float64)
@@ -0,0 +1,106 @@
+"""
+Prediction Result Cache
+- LRU + TTL cache of model outputs
+- Keys are (model name, model version, encoded feature vector bytes), so
+  inputs that encode identically share an entry and a model reload never
+  serves stale results
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {}  # model -> {'hits', 'misses', 'evictions', 'expirations'}
+        self._counters = {}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _count(self, model, event, n=1):
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        stats[event] += n
+        counter = self._counters.get((model, event))
+        if counter is None:
+            counter = self._counters[(model, event)] = REGISTRY.counter(
+                'ml_prediction_cache_events_total', {'model': model, 'event': event},
+                'Prediction cache hits, misses, evictions and expirations')
+        counter.inc(n)
+
+    def _lookup(self, key, now):
+        """Value for key or None; caller holds the lock and counts hits/misses"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < now:
+            del self._data[key]
+            self._count(key[0], 'expirations')
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key):
+        """Cached result for key, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            self._count(key[0], 'misses' if value is None else 'hits')
+            return value
+
+    def get_many(self, keys):
+        """Cached results (None where missing) for keys of one model"""
+        if not self.enabled or not keys:
+            return [None] * len(keys)
+        with self._lock:
+            now = time.monotonic()
+            values = [self._lookup(key, now) for key in keys]
+            misses = values.count(None)
+            self._count(keys[0][0], 'hits', len(values) - misses)
+            self._count(keys[0][0], 'misses', misses)
+            return values
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        if not self.enabled:
+            return
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl
+            for key, value in items:
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                evicted, _ = self._data.popitem(last=False)
+                self._count(evicted[0], 'evictions')
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            per_model = {}
+            for model, counts in self._stats.items():
+                lookups = counts['hits'] + counts['misses']
+                per_model[model] = {**counts, 'hit_rate': counts['hits'] / lookups if lookups else None}
+            return {
+                'enabled': self.enabled,
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'models': per_model
+            }
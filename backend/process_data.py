@@ -8,6 +8,9 @@ from dotenv import load_dotenv
 import boto3
 import pandas as pd
 from io import StringIO
+from datetime import datetime
+from sketches import AnalyticsSketches
+from analytics_snapshots import publish_snapshot
 
 # Load environment variables
 load_dotenv()
@@ -149,6 +152,14 @@ if visits_data:
     analytics['disease_distribution'] = [{'disease': k, 'count': int(v)} for k, v in disease_dist.items()]
     print(f"   ✅ Top 10 diseases calculated")
 
+# Mergeable sketches for approximate distinct counts, percentiles and top-K
+sketches = AnalyticsSketches()
+if patients_data:
+    sketches.update_from_patients(patients_data)
+if visits_data:
+    sketches.update_from_visits(visits_data)
+print(f"   ✅ Sketches built (~{sketches.distinct_patients.count()} distinct patients)")
+
 # Step 6: Save to MongoDB
 print("\n💾 Step 6: Saving to MongoDB...")
 try:
@@ -171,11 +182,19 @@ try:
         db.prescriptions_processed.insert_many(prescriptions_data)
         print(f"   ✅ Saved {len(prescriptions_data)} prescriptions to MongoDB")
     
-    # Save analytics
+    # Save analytics as a new immutable, versioned snapshot
     if analytics:
-        db.analytics.delete_many({})
-        db.analytics.insert_one(analytics)
-        print(f"   ✅ Saved analytics to MongoDB")
+        snapshot = publish_snapshot(db, analytics, source='pandas')
+        print(f"   ✅ Saved analytics snapshot v{snapshot['version']} (run {snapshot['run_id']})")
+    
+    # Save sketches next to the analytics document
+    if patients_data or visits_data:
+        db.analytics_sketches.replace_one(
+            {'_id': 'pipeline'},
+            {'sketches': sketches.to_document(), 'updated_at': datetime.now()},
+            upsert=True
+        )
+        print(f"   ✅ Saved analytics sketches to MongoDB")
     
     client.close()
     
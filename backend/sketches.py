@@ -0,0 +1,365 @@
+"""
+Streaming Sketches for Approximate Healthcare Analytics
+- HyperLogLog: distinct patient counts
+- KLL: quantiles of length_of_stay, severity_score and bmi
+- Space-Saving: heavy-hitter diagnoses (top-K)
+
+Every sketch is mergeable and serializes to a compact byte blob, so the
+processors keep their own sketch document, the API workers merge theirs into
+one shared document, and the analytics endpoints combine them at read time.
+"""
+
+import hashlib
+import json
+import math
+import zlib
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+
+QUANTILE_FIELDS = ['length_of_stay', 'severity_score', 'bmi']
+PATIENT_QUANTILE_FIELDS = ['bmi']
+VISIT_QUANTILE_FIELDS = ['length_of_stay', 'severity_score']
+
+
+def _hash64(values):
+    """Stable 64-bit hashes (independent of PYTHONHASHSEED) for any values"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(str(v).encode('utf-8'), digest_size=8).digest(), 'little')
+         for v in values),
+        dtype=np.uint64,
+        count=len(values)
+    )
+
+
+def _to_float_array(values):
+    """Coerce raw values (numbers, numeric strings, None) to floats, dropping bad ones"""
+    out = []
+    for v in values:
+        try:
+            f = float(v)
+        except (TypeError, ValueError):
+            continue
+        if not math.isnan(f):
+            out.append(f)
+    return np.asarray(out, dtype=np.float64)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2^p registers"""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, value):
+        self.update_many([value])
+
+    def update_many(self, values):
+        values = [v for v in values if v is not None and v != '']
+        if not values:
+            return
+        hashes = _hash64(values)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        # Rank = position of the leftmost 1-bit in the remaining (64 - p) bits.
+        # frexp gives the bit length exactly because (64 - p) <= 53 mantissa bits.
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = ((64 - self.p) - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge HyperLogLog with p={other.p} into p={self.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros > 0:
+            # Small-range correction (linear counting)
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def relative_error(self):
+        """Standard error of the estimate (one sigma)"""
+        return 1.04 / math.sqrt(self.m)
+
+    def to_bytes(self):
+        return bytes([self.p]) + zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, blob):
+        sketch = cls(p=blob[0])
+        sketch.registers = np.frombuffer(zlib.decompress(blob[1:]), dtype=np.uint8).copy()
+        return sketch
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang, Liberty) with compactor levels"""
+
+    def __init__(self, k=200, c=2.0 / 3.0, seed=None):
+        self.k = k
+        self.c = c
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def _size(self):
+        return sum(len(level) for level in self.levels)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for h in range(len(self.levels)):
+                level = self.levels[h]
+                if len(level) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                level = np.sort(level)
+                # An odd item out stays behind so the total weight is preserved
+                keep = level[-1:] if len(level) % 2 else level[:0]
+                even = level[:len(level) - len(keep)]
+                promoted = even[self._rng.integers(2)::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                if self._size() < self._max_size():
+                    break
+
+    def update(self, value):
+        self.update_many([value])
+
+    def update_many(self, values):
+        values = _to_float_array(values)
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def count(self):
+        return int(sum(len(level) << h for h, level in enumerate(self.levels)))
+
+    def quantiles(self, qs):
+        """Approximate values at the given quantiles (0..1)"""
+        if self.count() == 0:
+            return [None for _ in qs]
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level), 1 << h, dtype=np.int64) for h, level in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind='stable')
+        values, cumulative = values[order], np.cumsum(weights[order])
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+            elif q >= 1:
+                results.append(self.max)
+            else:
+                i = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+                results.append(float(values[min(i, len(values) - 1)]))
+        return results
+
+    def rank_error(self):
+        """Normalized rank error at 99% confidence (empirical KLL bound)"""
+        return 1.854 / self.k ** 0.9657
+
+    def to_bytes(self):
+        return zlib.compress(json.dumps({
+            'k': self.k,
+            'c': self.c,
+            'min': self.min if self.count() else None,
+            'max': self.max if self.count() else None,
+            'levels': [level.tolist() for level in self.levels]
+        }).encode('utf-8'))
+
+    @classmethod
+    def from_bytes(cls, blob):
+        data = json.loads(zlib.decompress(blob).decode('utf-8'))
+        sketch = cls(k=data['k'], c=data['c'])
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in data['levels']]
+        if data['min'] is not None:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters with a fixed number of counters"""
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counters = {}  # item -> [count, error]
+        self.n = 0
+
+    def update(self, item, weight=1):
+        self.update_many([item] * weight)
+
+    def update_many(self, items):
+        batch = Counter(str(i) for i in items if i is not None and i != '')
+        for item, weight in batch.most_common():
+            self.n += weight
+            if item in self.counters:
+                self.counters[item][0] += weight
+            elif len(self.counters) < self.capacity:
+                self.counters[item] = [weight, 0]
+            else:
+                victim = min(self.counters, key=lambda key: self.counters[key][0])
+                min_count = self.counters.pop(victim)[0]
+                self.counters[item] = [min_count + weight, min_count]
+
+    def _floor(self):
+        """Upper bound on the count of any item not being tracked"""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other):
+        floor_self, floor_other = self._floor(), other._floor()
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            count_a, error_a = self.counters.get(item, (floor_self, floor_self))
+            count_b, error_b = other.counters.get(item, (floor_other, floor_other))
+            merged[item] = [count_a + count_b, error_a + error_b]
+        top = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[:self.capacity]
+        self.counters = {item: counts for item, counts in top}
+        self.n += other.n
+        return self
+
+    def top(self, k=10):
+        items = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:k]
+        return [
+            {'item': item, 'count': count, 'error': error, 'guaranteed_count': count - error}
+            for item, (count, error) in items
+        ]
+
+    def max_overcount(self):
+        """Worst-case overestimate of any reported count"""
+        return self.n // self.capacity
+
+    def to_bytes(self):
+        return zlib.compress(json.dumps({
+            'capacity': self.capacity,
+            'n': self.n,
+            'counters': self.counters
+        }).encode('utf-8'))
+
+    @classmethod
+    def from_bytes(cls, blob):
+        data = json.loads(zlib.decompress(blob).decode('utf-8'))
+        sketch = cls(capacity=data['capacity'])
+        sketch.n = data['n']
+        sketch.counters = {item: list(counts) for item, counts in data['counters'].items()}
+        return sketch
+
+
+class AnalyticsSketches:
+    """The set of sketches kept for the analytics layer"""
+
+    def __init__(self):
+        self.distinct_patients = HyperLogLog()
+        self.quantiles = {field: KLLSketch() for field in QUANTILE_FIELDS}
+        self.top_diagnoses = SpaceSaving()
+
+    def update_from_patients(self, records):
+        """Fold patient records (list of dicts) into the sketches"""
+        self.distinct_patients.update_many([r.get('patient_id') for r in records])
+        for field in PATIENT_QUANTILE_FIELDS:
+            self.quantiles[field].update_many([r.get(field) for r in records])
+
+    def update_from_visits(self, records):
+        """Fold visit records (list of dicts) into the sketches"""
+        self.distinct_patients.update_many([r.get('patient_id') for r in records])
+        for field in VISIT_QUANTILE_FIELDS:
+            self.quantiles[field].update_many([r.get(field) for r in records])
+        self.top_diagnoses.update_many([
+            r.get('diagnosis_description') or r.get('diagnosis_code') for r in records
+        ])
+
+    def merge(self, other):
+        self.distinct_patients.merge(other.distinct_patients)
+        for field in QUANTILE_FIELDS:
+            self.quantiles[field].merge(other.quantiles[field])
+        self.top_diagnoses.merge(other.top_diagnoses)
+        return self
+
+    def to_document(self):
+        """Serialize to a MongoDB-friendly dict of byte blobs"""
+        return {
+            'distinct_patients': self.distinct_patients.to_bytes(),
+            'quantiles': {field: sketch.to_bytes() for field, sketch in self.quantiles.items()},
+            'top_diagnoses': self.top_diagnoses.to_bytes()
+        }
+
+    @classmethod
+    def from_document(cls, doc):
+        sketches = cls()
+        sketches.distinct_patients = HyperLogLog.from_bytes(bytes(doc['distinct_patients']))
+        for field, blob in doc.get('quantiles', {}).items():
+            sketches.quantiles[field] = KLLSketch.from_bytes(bytes(blob))
+        sketches.top_diagnoses = SpaceSaving.from_bytes(bytes(doc['top_diagnoses']))
+        return sketches
+
+
+def load_merged_sketches(collection, extra=None):
+    """Merge every sketch document in `collection` (plus an optional local sketch)"""
+    merged = AnalyticsSketches()
+    if collection is not None:
+        for doc in collection.find({}, {'sketches': 1}):
+            if doc.get('sketches'):
+                merged.merge(AnalyticsSketches.from_document(doc['sketches']))
+    if extra is not None:
+        merged.merge(extra)
+    return merged
+
+
+def merge_into_document(collection, doc_id, sketches, attempts=5):
+    """
+    Merge `sketches` into the stored sketch document `doc_id` (created if
+    missing). Each write checks the revision it read, so merges racing from
+    several workers are retried rather than lost.
+
+    Returns:
+        True once merged, False if every attempt lost the race
+    """
+    for _ in range(attempts):
+        doc = collection.find_one({'_id': doc_id})
+        merged = AnalyticsSketches()
+        if doc is not None and doc.get('sketches'):
+            merged.merge(AnalyticsSketches.from_document(doc['sketches']))
+        merged.merge(sketches)
+        revision = doc.get('revision') if doc is not None else None
+        update = {'sketches': merged.to_document(), 'revision': (revision or 0) + 1, 'updated_at': datetime.now()}
+        if doc is None:
+            try:
+                collection.insert_one({'_id': doc_id, **update})
+                return True
+            except DuplicateKeyError:
+                continue
+        if collection.replace_one({'_id': doc_id, 'revision': revision}, update).matched_count:
+            return True
+    return False
@@ -0,0 +1,300 @@
+"""
+Synthetic Healthcare Data Generator
+Writes patients, visits and prescriptions with the raw columns the
+processors (process_data.py, pyspark_processor.py) read, for load tests of
+the API, the processors and training at any scale:
+
+- Vectorized NumPy: every column of a shard is drawn at once (no per-row
+  Python loops), and the visits and prescriptions follow from the patients
+- Realistic dependencies: severity grows with age, BMI, smoking and the
+  diagnosis; the length of stay with severity; readmissions with all of
+  them, and a readmitted visit is followed by a visit within 30 days
+- Referential integrity: every visit belongs to a generated patient and
+  every prescription to a generated visit (of the same patient); visit
+  gaps and counts agree with the visit dates
+- Shards: patients are split in shards of --shard-size, each drawn from its
+  own seed (seed, shard) and written by a process pool as
+  {out}/{table}/part-{shard:05d}.{csv,parquet}, so the output only depends on
+  the seed and shard size, not on the number of processes. The layout
+  matches the raw/{table}/ prefixes the processors read from S3.
+- Dirty rows (--dirty-rate): a share of the rows get the problems the
+  processors clean: missing ids, unparsable or out-of-range numbers,
+  unknown patients and exact duplicates
+
+Usage:
+    python synthetic_data.py --patients 1000000 --out synthetic/        # CSV shards
+    python synthetic_data.py --patients 1000000 --format parquet       # needs pyarrow
+    python synthetic_data.py --patients 50000 --dirty-rate 0.02 --seed 7
+    aws s3 sync synthetic/ s3://$AWS_BUCKET_NAME/raw/                 # feed the processors
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+TABLES = ['patients', 'visits', 'prescriptions']
+COLUMNS = {
+    'patients': ['patient_id', 'age', 'gender', 'bmi', 'smoker_status', 'alcohol_use'],
+    'visits': [
+        'visit_id', 'patient_id', 'visit_date', 'diagnosis_code', 'diagnosis_description', 'severity_score',
+        'length_of_stay', 'previous_visit_gap_days', 'number_of_previous_visits', 'readmitted_within_30_days'
+    ],
+    'prescriptions': [
+        'prescription_id', 'patient_id', 'visit_id', 'medication_name', 'dosage', 'quantity', 'days_supply'
+    ]
+}
+FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+DEFAULT_SHARD_SIZE = 100000
+START_DATE = '2024-01-01'
+
+# ICD-10 code, description, share of visits, base severity (1-10), medications
+DIAGNOSES = [
+    ('I10', 'Essential hypertension', 0.16, 3.0, [('Lisinopril', '10 mg'), ('Amlodipine', '5 mg')]),
+    ('E11.9', 'Type 2 diabetes mellitus', 0.13, 4.0, [('Metformin', '500 mg'), ('Glipizide', '5 mg')]),
+    ('J18.9', 'Pneumonia', 0.09, 6.0, [('Azithromycin', '250 mg'), ('Ceftriaxone', '1 g')]),
+    ('I50.9', 'Heart failure', 0.07, 7.0, [('Furosemide', '40 mg'), ('Carvedilol', '6.25 mg')]),
+    ('J44.1', 'COPD with acute exacerbation', 0.07, 6.0, [('Prednisone', '40 mg'), ('Albuterol', '90 mcg')]),
+    ('N39.0', 'Urinary tract infection', 0.08, 3.5, [('Nitrofurantoin', '100 mg'), ('Ciprofloxacin', '500 mg')]),
+    ('I21.4', 'Acute myocardial infarction', 0.04, 8.5, [('Aspirin', '81 mg'), ('Atorvastatin', '80 mg')]),
+    ('A41.9', 'Sepsis', 0.03, 9.0, [('Vancomycin', '1 g'), ('Piperacillin-tazobactam', '4.5 g')]),
+    ('I63.9', 'Cerebral infarction', 0.03, 8.0, [('Clopidogrel', '75 mg'), ('Atorvastatin', '40 mg')]),
+    ('N18.3', 'Chronic kidney disease, stage 3', 0.05, 5.0, [('Losartan', '50 mg')]),
+    ('K35.80', 'Acute appendicitis', 0.03, 6.5, [('Cefazolin', '2 g'), ('Oxycodone', '5 mg')]),
+    ('S72.001A', 'Fracture of femur', 0.03, 7.0, [('Enoxaparin', '40 mg'), ('Oxycodone', '5 mg')]),
+    ('F32.9', 'Major depressive disorder', 0.06, 3.0, [('Sertraline', '50 mg'), ('Escitalopram', '10 mg')]),
+    ('J45.909', 'Asthma', 0.06, 3.0, [('Albuterol', '90 mcg'), ('Fluticasone', '110 mcg')]),
+    ('M54.50', 'Low back pain', 0.07, 2.0, [('Ibuprofen', '600 mg'), ('Cyclobenzaprine', '10 mg')])
+]
+DAYS_SUPPLY = [7, 14, 30, 90]
+
+# Table -> (column, bad value) problems of the dirty rows (plus exact duplicates)
+DIRTY_VALUES = {
+    'patients': [('patient_id', None), ('age', 'unknown'), ('age', -1), ('age', 200), ('bmi', 'N/A')],
+    'visits': [
+        ('visit_id', None), ('patient_id', None), ('patient_id', 'P_UNKNOWN'), ('severity_score', 'high'),
+        ('length_of_stay', -3), ('visit_date', 'not a date')
+    ],
+    'prescriptions': [('prescription_id', None), ('visit_id', None), ('quantity', 'ten'), ('days_supply', -7)]
+}
+
+
+def _ids(prefix, numbers, width):
+    return prefix + pd.Series(numbers).astype(str).str.zfill(width).to_numpy(dtype=object)
+
+
+def generate_patients(rng, first_patient, n_patients, id_width=6):
+    """Patients first_patient ... first_patient + n_patients - 1"""
+    children = rng.random(n_patients) < 0.08
+    age = np.where(children, rng.integers(0, 18, n_patients),
+                   np.clip(rng.normal(54, 17, n_patients), 18, 99).astype(np.int64))
+    bmi = np.where(children, rng.normal(18, 3, n_patients), rng.normal(26.5 + 0.04 * (age - 45), 5.5))
+    smoker = ~children & (rng.random(n_patients) < 0.12 + 0.1 * (age < 50))
+    alcohol = ~children & (rng.random(n_patients) < 0.3)
+    return pd.DataFrame({
+        'patient_id': _ids('P', np.arange(first_patient, first_patient + n_patients), id_width),
+        'age': age,
+        'gender': rng.choice(['Male', 'Female', 'Other'], n_patients, p=[0.49, 0.49, 0.02]).astype(object),
+        'bmi': np.round(np.clip(bmi, 12, 60), 1),
+        'smoker_status': np.where(smoker, 'yes', 'no').astype(object),
+        'alcohol_use': np.where(alcohol, 'yes', 'no').astype(object)
+    })
+
+
+def generate_visits(patients_df, rng, start_date=START_DATE, days=730):
+    """
+    1+ visits per patient of `patients_df` (its age, bmi and smoker_status
+    drive the visits; missing values get typical ones), dated from
+    start_date over about `days` days
+    """
+    n_patients = len(patients_df)
+    age = pd.to_numeric(patients_df['age'], errors='coerce').fillna(50).to_numpy(np.float64)
+    bmi = pd.to_numeric(patients_df['bmi'], errors='coerce').fillna(27).to_numpy(np.float64)
+    smoker = (patients_df['smoker_status'].astype(object) == 'yes').to_numpy()
+    counts = np.minimum(1 + rng.poisson(0.4 + age / 60 + 0.4 * smoker), 20)
+    n_visits = int(counts.sum())
+    owner = np.repeat(np.arange(n_patients), counts)
+    first = np.cumsum(counts) - counts
+    visit_number = np.arange(n_visits) - np.repeat(first, counts)
+    age, bmi, smoker = age[owner], bmi[owner], smoker[owner]
+
+    weights = np.array([d[2] for d in DIAGNOSES])
+    diagnosis = rng.choice(len(DIAGNOSES), n_visits, p=weights / weights.sum())
+    base = np.array([d[3] for d in DIAGNOSES])[diagnosis]
+    severity = np.clip(np.round(base + 0.03 * (age - 50) + 0.8 * smoker + 0.05 * (bmi - 27)
+                                + rng.normal(0, 1.5, n_visits)), 1, 10).astype(np.int64)
+    length_of_stay = np.minimum(1 + rng.poisson(0.6 * severity), 60)
+    logit = (-2.2 + 0.35 * (severity - 5) + 0.02 * (age - 50) + 0.15 * np.minimum(visit_number, 5)
+             + 0.05 * (length_of_stay - 4))
+    readmitted = rng.random(n_visits) < 1 / (1 + np.exp(-logit))
+
+    # Days from a visit to the next one of the same patient: within 30 after a readmission
+    gap_after = np.where(readmitted, rng.integers(length_of_stay + 1, length_of_stay + 31),
+                         length_of_stay + 31 + rng.exponential(120, n_visits).astype(np.int64))
+    gap = np.concatenate([[0], gap_after[:-1]])
+    gap[first] = 0
+    offsets = np.cumsum(gap)
+    offsets -= np.repeat(offsets[first], counts)
+    offsets += np.repeat(rng.integers(0, days, n_patients), counts)
+
+    patient_ids = patients_df['patient_id'].astype(object).to_numpy()[owner]
+    return pd.DataFrame({
+        'visit_id': patient_ids + '_V' + (visit_number + 1).astype(str).astype(object),
+        'patient_id': patient_ids,
+        'visit_date': pd.Timestamp(start_date) + pd.to_timedelta(offsets, unit='D'),
+        'diagnosis_code': np.array([d[0] for d in DIAGNOSES], dtype=object)[diagnosis],
+        'diagnosis_description': np.array([d[1] for d in DIAGNOSES], dtype=object)[diagnosis],
+        'severity_score': severity,
+        'length_of_stay': length_of_stay,
+        'previous_visit_gap_days': gap,
+        'number_of_previous_visits': visit_number,
+        'readmitted_within_30_days': np.where(readmitted, 'Yes', 'No').astype(object)
+    })
+
+
+def generate_prescriptions(visits_df, rng):
+    """0+ prescriptions per visit, from the medications of its diagnosis"""
+    codes = {d[0]: i for i, d in enumerate(DIAGNOSES)}
+    diagnosis = visits_df['diagnosis_code'].map(codes).to_numpy()
+    counts = np.minimum(rng.poisson(1.2, len(visits_df)), 5)
+    owner = np.repeat(np.arange(len(visits_df)), counts)
+    number = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # Medications of every diagnosis in one table, indexed by an offset per diagnosis
+    options = [d[4] for d in DIAGNOSES]
+    start = np.cumsum([0] + [len(o) for o in options])[:-1]
+    medications = np.array([name for o in options for name, _ in o], dtype=object)
+    dosages = np.array([dose for o in options for _, dose in o], dtype=object)
+    sizes = np.array([len(o) for o in options])
+    chosen = start[diagnosis[owner]] + (rng.random(len(owner)) * sizes[diagnosis[owner]]).astype(np.int64)
+    days_supply = rng.choice(DAYS_SUPPLY, len(owner), p=[0.3, 0.2, 0.4, 0.1])
+
+    visit_ids = visits_df['visit_id'].to_numpy(dtype=object)[owner]
+    return pd.DataFrame({
+        'prescription_id': visit_ids + '_RX' + (number + 1).astype(str).astype(object),
+        'patient_id': visits_df['patient_id'].to_numpy(dtype=object)[owner],
+        'visit_id': visit_ids,
+        'medication_name': medications[chosen],
+        'dosage': dosages[chosen],
+        'quantity': days_supply * rng.integers(1, 4, len(owner)),
+        'days_supply': days_supply
+    })
+
+
+def add_dirty_rows(df, table, rng, rate):
+    """
+    Give about `rate` of the rows one DIRTY_VALUES problem each, or a
+    duplicate; returns a new frame (touched columns become object dtype)
+    """
+    df = df.copy()
+    dirty = np.flatnonzero(rng.random(len(df)) < rate)
+    problems = rng.integers(0, len(DIRTY_VALUES[table]) + 1, len(dirty))
+    for i, (column, value) in enumerate(DIRTY_VALUES[table]):
+        rows = dirty[problems == i]
+        if len(rows):
+            df[column] = df[column].astype(object)
+            df.iloc[rows, df.columns.get_loc(column)] = value
+    duplicates = df.iloc[dirty[problems == len(DIRTY_VALUES[table])]]
+    return pd.concat([df, duplicates], ignore_index=True)
+
+
+def generate_frames(n_patients, seed=42, shard=0, first_patient=0, id_width=6, dirty_rate=0.0,
+                    start_date=START_DATE, days=730):
+    """
+    One shard as DataFrames: table -> frame with the COLUMNS of the table
+    (visit_date as datetime64). The same (seed, shard) always gives the same rows.
+    """
+    rng = np.random.default_rng([seed, shard])
+    patients_df = generate_patients(rng, first_patient, n_patients, id_width)
+    visits_df = generate_visits(patients_df, rng, start_date, days)
+    frames = {
+        'patients': patients_df,
+        'visits': visits_df,
+        'prescriptions': generate_prescriptions(visits_df, rng)
+    }
+    if dirty_rate:
+        frames = {table: add_dirty_rows(df, table, rng, dirty_rate) for table, df in frames.items()}
+    return frames
+
+
+def write_shard(out_dir, shard, first_patient, n_patients, seed=42, fmt='csv', dirty_rate=0.0, id_width=6):
+    """Generate and write shard `shard`; returns table -> rows written"""
+    frames = generate_frames(n_patients, seed, shard, first_patient, id_width, dirty_rate)
+    for table, df in frames.items():
+        path = os.path.join(out_dir, table, f"part-{shard:05d}{FORMATS[fmt]}")
+        if fmt == 'parquet':
+            # Dirty columns mix numbers and text: store them as text, like the CSVs
+            mixed = [col for col in df.columns if df[col].dtype == object]
+            df.astype({col: 'string' for col in mixed}).to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False, date_format='%Y-%m-%d')
+    return {table: len(df) for table, df in frames.items()}
+
+
+def generate(out_dir, n_patients, seed=42, fmt='csv', dirty_rate=0.0, shard_size=DEFAULT_SHARD_SIZE,
+             processes=None):
+    """
+    Write n_patients and their visits and prescriptions as shards under
+    out_dir, `processes` at a time (default: available_cores())
+
+    Returns:
+        {'rows': table -> rows written, 'shards', 'seconds'}
+    """
+    from ml_models import available_cores
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+    start = time.perf_counter()
+    for table in TABLES:
+        os.makedirs(os.path.join(out_dir, table), exist_ok=True)
+    id_width = max(6, len(str(max(0, n_patients - 1))))
+    shards = [(shard, first, min(shard_size, n_patients - first))
+              for shard, first in enumerate(range(0, n_patients, shard_size))]
+    args = [(out_dir, shard, first, size, seed, fmt, dirty_rate, id_width) for shard, first, size in shards]
+
+    processes = min(processes or available_cores(), len(shards))
+    if processes <= 1:
+        results = [write_shard(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(write_shard, *zip(*args)))
+    return {
+        'rows': {table: sum(r[table] for r in results) for table in TABLES},
+        'shards': len(shards),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic patients, visits and prescriptions")
+    parser.add_argument('--patients', type=int, default=100000, help="patients to generate")
+    parser.add_argument('--out', default='synthetic_data', help="output directory (one sub-directory per table)")
+    parser.add_argument('--format', choices=list(FORMATS), default='csv')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dirty-rate', type=float, default=0.0,
+                        help="share of rows with a data problem or duplicated (default: none)")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help="patients per shard")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="shards written at a time (default: all available cores)")
+    args = parser.parse_args()
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+
+    print(f"🧪 Generating {args.patients:,} patients into {args.out}/ ({args.format})...")
+    summary = generate(args.out, args.patients, args.seed, args.format, args.dirty_rate, args.shard_size,
+                       args.processes)
+    for table, rows in summary['rows'].items():
+        print(f"   ✅ {table}: {rows:,} rows")
+    total = sum(summary['rows'].values())
+    print(f"⏱️  {summary['shards']} shard(s) in {summary['seconds']:.1f}s "
+          f"({total / summary['seconds']:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Analytics Snapshot Tests
+Checks that publish_snapshot numbers versions and replaces the legacy
+analytics document, that diff_snapshots compares distributions by label,
+and that SnapshotCache swaps in new versions and keeps serving the cached
+one while MongoDB fails. Uses mongomock in place of a MongoDB server.
+"""
+
+import time
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from analytics_snapshots import SnapshotCache, diff_snapshots, publish_snapshot, to_public
+
+mongomock = pytest.importorskip('mongomock')
+
+
+def test_publish_numbers_versions():
+    db = mongomock.MongoClient().db
+    first = publish_snapshot(db, {'total_patients': 10}, 'pandas')
+    second = publish_snapshot(db, {'total_patients': 12}, 'pyspark')
+    assert (first['version'], second['version']) == (1, 2) and first['run_id'] != second['run_id']
+    assert db.analytics_snapshots.count_documents({}) == 2
+
+    latest = list(db.analytics.find())
+    assert len(latest) == 1 and latest[0]['total_patients'] == 12 and latest[0]['version'] == 2
+    public = to_public(db.analytics_snapshots.find_one({'version': 2}))
+    assert '_id' not in public and isinstance(public['created_at'], str)
+    assert public['analytics'] == {'total_patients': 12} and public['source'] == 'pyspark'
+
+
+def test_diff_snapshots():
+    old = {'analytics': {'total_patients': 10, 'gender_distribution': [
+        {'gender': 'F', 'count': 6}, {'gender': 'M', 'count': 4}], 'dropped': 1}}
+    new = {'analytics': {'total_patients': 12, 'gender_distribution': [
+        {'gender': 'F', 'count': 6}, {'gender': 'M', 'count': 5}, {'gender': 'Other', 'count': 1}]}}
+    assert diff_snapshots(old, new) == {
+        'dropped': {'from': 1, 'to': None},
+        'gender_distribution': {'M': {'from': 4, 'to': 5, 'delta': 1},
+                                'Other': {'from': 0, 'to': 1, 'delta': 1}},
+        'total_patients': {'from': 10, 'to': 12},
+    }
+    assert diff_snapshots(old, old) == {}
+
+
+def test_cache_swaps_versions_and_survives_errors(monkeypatch):
+    db = mongomock.MongoClient().db
+    cache = SnapshotCache(db.analytics_snapshots, check_interval=0, max_backoff=60)
+    assert cache.latest() is None
+    publish_snapshot(db, {'total_patients': 10}, 'pandas')
+    assert cache.latest()['version'] == 1 and '_id' not in cache.latest()
+    publish_snapshot(db, {'total_patients': 12}, 'pandas')
+    assert cache.latest()['analytics'] == {'total_patients': 12}
+    assert cache.get_version(1)['analytics'] == {'total_patients': 10}
+    assert [v['version'] for v in cache.list_versions()] == [2, 1]
+
+    # A failing check serves the cached snapshot and backs off
+    calls = []
+
+    def unavailable(*args, **kwargs):
+        calls.append(args)
+        raise ServerSelectionTimeoutError('no servers')
+
+    cache.check_interval = 1
+    monkeypatch.setattr(cache, 'collection', type('Down', (), {'find_one': staticmethod(unavailable)})())
+    before = time.monotonic()
+    assert cache.refresh()['version'] == 2
+    assert cache._next_check >= before + 2
+    assert cache.latest()['version'] == 2 and len(calls) == 1  # not retried before the backoff
+    cache.refresh()
+    assert cache._next_check >= before + 4
+
+    monkeypatch.setattr(cache, 'collection', db.analytics_snapshots)
+    publish_snapshot(db, {'total_patients': 14}, 'pandas')
+    assert cache.refresh()['version'] == 3 and cache._failures == 0
@@ -0,0 +1,90 @@
+"""
+API Validation Tests
+Checks that the Flask endpoints answer bad query parameters and request
+bodies with a 400 and a message rather than a 500. Runs without MongoDB:
+the app falls back to its in-memory store, and mongomock stands in for
+the analytics snapshot and sketch collections.
+"""
+
+import pytest
+
+import app as backend
+from analytics_snapshots import SnapshotCache, publish_snapshot
+from sketches import AnalyticsSketches
+
+
+def test_analytics_query_params():
+    client = backend.app.test_client()
+    assert client.get('/api/analytics/top-diagnoses?k=3').status_code == 200
+    for k in ['abc', '0', '-2', '1.5']:
+        response = client.get(f'/api/analytics/top-diagnoses?k={k}')
+        assert response.status_code == 400 and not response.get_json()['success']
+
+    assert client.get('/api/analytics/percentiles?field=bmi&q=0,0.5,1').status_code == 200
+    for q in ['abc', '1.5', '-0.1', 'nan', '0.5,inf']:
+        response = client.get(f'/api/analytics/percentiles?field=bmi&q={q}')
+        assert response.status_code == 400 and not response.get_json()['success']
+
+
+def test_batch_prediction_validation(trained_models, monkeypatch):
+    from benchmark_ml import sample_records
+
+    ml, patients_df, visits_df = trained_models
+    monkeypatch.setattr(backend, 'ml_models', ml)
+    monkeypatch.setattr(backend, 'ML_MAX_BATCH_ROWS', 5)
+    client = backend.app.test_client()
+    records = sample_records(patients_df, visits_df, 5)
+
+    for body in [{}, {'records': []}, {'records': {'age': 60}}, {'records': records + records[:1]},
+                 {'records': records, 'models': ['readmission', 'survival']}]:
+        response = client.post('/api/ml/predict/batch', json=body)
+        assert response.status_code == 400 and not response.get_json()['success'], body
+    assert 'max 5' in client.post('/api/ml/predict/batch', json={'records': records * 2}).get_json()['message']
+
+    # Rows that cannot be scored fail on their own
+    body = {'records': [records[0], 'not a record', dict(records[1], bmi='nan')], 'models': ['risk_score']}
+    response = client.post('/api/ml/predict/batch', json=body)
+    data = response.get_json()
+    assert response.status_code == 200 and data['count'] == 3 and data['failed'] == 2
+    assert 'risk_score' in data['results'][0]['risk_score']
+    assert data['results'][1]['risk_score'] == {'error': 'Record must be a JSON object'}
+    assert data['results'][2]['risk_score'] == {'error': 'bmi must be a number'}
+
+
+def test_analytics_versions_limit(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().db
+    for total in [10, 12, 14]:
+        publish_snapshot(db, {'total_patients': total}, 'pandas')
+    monkeypatch.setattr(backend, 'analytics_cache', SnapshotCache(db.analytics_snapshots, check_interval=0))
+    monkeypatch.setattr(backend, 'ANALYTICS_MAX_VERSIONS', 2)
+    client = backend.app.test_client()
+
+    for limit in ['abc', '0', '-1', '1.5']:
+        response = client.get(f'/api/analytics/versions?limit={limit}')
+        assert response.status_code == 400 and not response.get_json()['success']
+    assert client.get('/api/analytics/versions?limit=1').get_json()['count'] == 1
+    # Capped at ANALYTICS_MAX_VERSIONS
+    data = client.get('/api/analytics/versions?limit=1000').get_json()
+    assert [v['version'] for v in data['versions']] == [3, 2]
+
+
+def test_sketch_flushes_share_one_document(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(backend, 'db', db)
+    monkeypatch.setattr(backend, 'SKETCH_FLUSH_SECONDS', 0)
+    monkeypatch.setattr(backend, 'live_sketches', AnalyticsSketches())
+
+    backend.record_sketches(patients=[{'patient_id': 'P1', 'bmi': 25}])
+    backend.record_sketches(patients=[{'patient_id': 'P2', 'bmi': 27}])
+    assert [doc['_id'] for doc in db.analytics_sketches.find()] == ['api']
+    assert backend.current_sketches().distinct_patients.count() == 2
+
+    # A failed flush keeps the sketches for the next one
+    def unavailable(*args):
+        raise RuntimeError('no servers')
+
+    monkeypatch.setattr(backend, 'merge_into_document', unavailable)
+    backend.record_sketches(patients=[{'patient_id': 'P3', 'bmi': 29}])
+    assert backend.live_sketches.distinct_patients.count() == 1
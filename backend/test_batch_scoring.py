@@ -0,0 +1,50 @@
+"""
+Bulk Offline Scoring Tests
+Checks the visit/patient join of batch_scoring (prev_severity across chunk
+boundaries, visits without a visit_id) and that chunk scoring matches the
+online predictions.
+"""
+
+import math
+
+import batch_scoring
+
+
+def test_records_carry_prev_severity_across_chunks():
+    patients = {'P1': {'patient_id': 'P1', 'age': 60, 'gender': 'F', 'bmi': math.nan}}
+    visits = [
+        {'visit_id': 'V1', 'patient_id': 'P1', 'severity_score': 3},
+        {'visit_id': 'V2', 'patient_id': 'P1', 'severity_score': 5},
+        {'visit_id': 'V3', 'patient_id': 'P2', 'severity_score': 7},
+    ]
+    first = batch_scoring.build_records(visits[:1], patients)
+    rest = batch_scoring.build_records(visits[1:], patients, ('P1', first[-1]['severity_score']))
+    records = first + rest
+    assert [r['prev_severity'] for r in records] == [None, 3, None]
+    assert records[0]['bmi'] is None  # NaN counts as missing
+    assert records[2]['age'] is None  # visit without a patient document
+
+    # A visit without a visit_id is not scored but is still the previous visit
+    keyless = [visits[0], dict(visits[1], visit_id=None), dict(visits[1], visit_id='V2b')]
+    records = batch_scoring.build_records(keyless, patients)
+    assert [(r['visit_id'], r['prev_severity']) for r in records] == [('V1', None), ('V2b', 5)]
+
+
+def test_score_chunk_matches_online_predictions(trained_models):
+    ml, patients_df, visits_df = trained_models
+    model_dir = ml.model_dir
+    ml.save_models()
+    batch_scoring._init_worker(model_dir)
+
+    visits = visits_df.sort_values(['patient_id', 'visit_date']).head(200).to_dict('records')
+    patients = {p['patient_id']: p for p in patients_df.to_dict('records')}
+    records = batch_scoring.build_records(visits, patients)
+    documents = batch_scoring.score_chunk(records)
+
+    assert [d['visit_id'] for d in documents] == [r['visit_id'] for r in records]
+    for record, doc in zip(records, documents):
+        assert doc['readmission'] == ml.predict_readmission(record)
+        if record['prev_severity'] is None:
+            assert doc['disease_progression'] is None
+        else:
+            assert doc['disease_progression'] == ml.predict_disease_progression(record)
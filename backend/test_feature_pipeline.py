@@ -0,0 +1,85 @@
+"""
+Feature Pipeline Tests
+Checks that feature_pipeline.FeaturePipeline fills and encodes training
+frames like the LabelEncoders did, that fill values are learned once and
+reused on update data, and that the pipelines saved in a bundle encode
+single rows, record batches and DataFrames into the same matrices.
+"""
+
+import numpy as np
+import pandas as pd
+
+from benchmark_ml import sample_records, synthetic_frames
+from feature_pipeline import FeaturePipeline
+from ml_models import BATCH_MODELS, CATEGORICAL_COLS, MODEL_FEATURES, READMISSION_FEATURES, HealthcareMLModels
+
+
+def test_fill_and_encode_training_frames(tmp_path):
+    root = str(tmp_path)
+    patients_df, visits_df = synthetic_frames(400, 42)
+    patients_df.loc[patients_df.index[:20], 'bmi'] = None
+    patients_df.loc[patients_df.index[5:15], 'smoker_status'] = None
+    for dtype in ['object', 'category']:
+        patients = patients_df.astype({col: dtype for col in CATEGORICAL_COLS})
+        ml = HealthcareMLModels(model_dir=root, cache_size=0)
+        merged = ml.merge_visits(patients, visits_df)
+
+        # Same codes as LabelEncoder on the filled strings: 'Unknown' sorts in
+        raw = visits_df.merge(patients_df, on='patient_id', how='left')
+        smoker = raw['smoker_status'].fillna('Unknown').astype(str)
+        assert list(ml.label_encoders['smoker_status'].classes_) == sorted(smoker.unique())
+        assert (merged['smoker_status'] == np.searchsorted(sorted(smoker.unique()), smoker)).all()
+        bmi = raw['bmi'].median()
+        assert ml.fill_values['readmission']['bmi'] == bmi
+        assert np.allclose(merged['bmi'], raw['bmi'].fillna(bmi))
+        assert ml.fill_values['risk_score'] == {col: ml.fill_values['readmission'][col]
+                                               for col in MODEL_FEATURES['risk_score']}
+
+    # Update data is filled with the training medians, not its own
+    update = visits_df.iloc[:50].copy()
+    update['length_of_stay'] = update['length_of_stay'].astype(float)
+    update.loc[update.index[:5], 'length_of_stay'] = None
+    filled = ml.merge_visits(patients_df, update)
+    assert (filled['length_of_stay'].iloc[:5] == ml.fill_values['readmission']['length_of_stay']).all()
+    X, _ = ml.prepare_disease_progression_data(visits_df)
+    assert list(X.columns) == MODEL_FEATURES['disease_progression']
+    assert set(ml.fill_values['disease_progression']) == set(MODEL_FEATURES['disease_progression'])
+
+    # Categories without a code are rejected, as LabelEncoder did
+    pipeline = ml.feature_pipelines()['readmission']
+    try:
+        pipeline.encode_frame(raw.head(3).assign(gender='Nonbinary'))
+        assert False, "unknown category accepted"
+    except ValueError as e:
+        assert 'gender' in str(e)
+
+
+def test_bundle_pipelines_encode_every_path_alike(trained_models):
+    trained, patients_df, visits_df = trained_models
+    trained.save_models('20260101_000000')
+    entry = trained.registry.manifest('20260101_000000')['models']['readmission']
+    assert entry['preprocessing']['columns'] == READMISSION_FEATURES
+    assert entry['preprocessing']['fill'] == trained.fill_values['readmission']
+    assert entry['preprocessing']['scaling'] is not None
+
+    serving = HealthcareMLModels(model_dir=trained.model_dir, cache_size=0)
+    assert serving.load_models()
+    records = sample_records(patients_df, visits_df, 200)
+    for name in BATCH_MODELS:
+        pipeline = serving._bundle.preprocessing[name]
+        assert pipeline.to_dict() == trained.feature_pipelines()[name].to_dict()
+        assert pipeline.scaled == (name == 'readmission')
+
+        rows = [{col: record[col] for col in pipeline.columns} for record in records]
+        single = np.vstack([serving._encode_row(name, row).copy() for row in rows])
+        batch, errors = pipeline.encode_records(rows)
+        frame = pipeline.transform(pd.DataFrame(rows))
+        assert not errors
+        assert np.array_equal(single, pipeline.scale_rows(batch))
+        assert np.array_equal(single, frame)
+
+    # Specs saved before pipelines: codes and scaling only
+    legacy = {'category_codes': serving.category_codes, 'scaling': None}
+    pipeline = FeaturePipeline.from_dict(legacy, MODEL_FEATURES['risk_score'])
+    assert pipeline.columns == MODEL_FEATURES['risk_score'] and pipeline.fill == {}
+    assert set(pipeline.category_codes) == set(CATEGORICAL_COLS) and not pipeline.scaled
@@ -0,0 +1,75 @@
+"""
+Feature Store Tests
+Checks that feature_store.FeatureStore materializes the training features
+once per data version, serves the same training data as the prepare
+methods, and that bulk scoring from it matches scoring the raw records.
+"""
+
+import numpy as np
+
+from batch_scoring import STORE_ARRAYS, build_records, prediction_document, score_store_rows
+from benchmark_ml import synthetic_frames
+from feature_store import FeatureStore, data_version
+from ml_models import BATCH_MODELS, HealthcareMLModels
+
+
+def test_materialized_once_per_data_version(tmp_path):
+    root = str(tmp_path)
+    patients_df, visits_df = synthetic_frames(300, 42)
+    patients_df.loc[patients_df.index[3], 'bmi'] = None
+    store = FeatureStore(f"{root}/features")
+    ml = HealthcareMLModels(model_dir=f"{root}/models", cache_size=0)
+    version, built = store.materialize(ml, patients_df, visits_df)
+    assert built and store.latest() == version
+
+    prepared = {
+        'readmission': ml.prepare_readmission_data(patients_df, visits_df),
+        'risk_score': ml.prepare_risk_score_data(patients_df, visits_df),
+        'disease_progression': ml.prepare_disease_progression_data(visits_df)
+    }
+    for name, (X, y) in store.datasets(version).items():
+        X_prepared, y_prepared = prepared[name]
+        assert list(X.columns) == list(X_prepared.columns)
+        assert np.allclose(X.to_numpy(float), X_prepared.to_numpy(float))
+        assert np.allclose(y.to_numpy(float), np.asarray(y_prepared, dtype=float))
+    # Read-only: the training matrix is the memory-mapped file, not a copy
+    assert not store.datasets(version)['readmission'][0].to_numpy().flags.writeable
+    encoders = store.label_encoders(version)
+    assert {col: list(e.classes_) for col, e in encoders.items()} == \
+        {col: list(e.classes_) for col, e in ml.label_encoders.items()}
+
+    # Same data: reused; changed data: a new version
+    fresh = HealthcareMLModels(model_dir=f"{root}/models", cache_size=0)
+    assert store.materialize(fresh, patients_df.copy(), visits_df.copy()) == (version, False)
+    visits_df.loc[visits_df.index[0], 'severity_score'] += 1
+    assert data_version(patients_df, visits_df) != version
+    changed, built = store.materialize(fresh, patients_df, visits_df)
+    assert built and store.versions() == [version, changed]
+    assert store.prune(keep=0) == [version] and store.versions() == [changed]
+
+
+def test_bulk_scoring_matches_records(trained_models):
+    ml, patients_df, visits_df = trained_models
+    root = ml.model_dir
+    visits_df.loc[visits_df.index[7], 'length_of_stay'] = None
+    store = FeatureStore(root)
+    version, _ = store.materialize(HealthcareMLModels(model_dir=root, cache_size=0), patients_df, visits_df)
+    assert store.category_codes(version) == ml.category_codes
+
+    arrays = store.arrays(version, STORE_ARRAYS)
+    documents = {doc['visit_id']: doc for doc in score_store_rows(ml, arrays, 0, len(visits_df))}
+    assert len(documents) == len(visits_df)
+
+    visits = visits_df.sort_values(['patient_id', 'visit_date']).to_dict('records')
+    patients = {patient['patient_id']: patient for patient in patients_df.to_dict('records')}
+    records = build_records(visits, patients)
+    for record, result in zip(records, ml.predict_batch(records, BATCH_MODELS)):
+        expected = prediction_document(record, result)
+        stored = documents[record['visit_id']]
+        for name in BATCH_MODELS:
+            if expected[name] is not None and 'error' in expected[name]:
+                assert stored[name] == {'error': 'Missing feature values'}
+            else:
+                assert stored[name] == expected[name]
+        assert stored['visit_date'] == expected['visit_date']
+        assert stored['severity_score'] == expected['severity_score']
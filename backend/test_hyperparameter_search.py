@@ -0,0 +1,64 @@
+"""
+Hyperparameter Search Tests
+Checks that hyperparameter_search.search caches the preprocessed folds once,
+halves the candidates rung by rung within its time budget, and that the
+chosen hyperparameters are trained with, saved in the bundle and reused.
+"""
+
+import os
+
+import numpy as np
+
+from benchmark_ml import synthetic_frames
+from hyperparameter_search import FOLD_PARTS, candidates, search
+from ml_models import HYPERPARAMETERS, HealthcareMLModels
+
+
+def test_successive_halving_on_cached_folds(tmp_path):
+    root = str(tmp_path)
+    patients_df, visits_df = synthetic_frames(800, 42)
+    ml = HealthcareMLModels(model_dir=f"{root}/models", cache_size=0)
+    X, y = ml.prepare_readmission_data(patients_df, visits_df)
+    report = search('readmission', X, y, n_jobs=2, n_candidates=4, factor=2, folds=2,
+                    cache_dir=f"{root}/cache")
+
+    # Scaled and SMOTE-balanced once per fold, then memory-mapped by the trials
+    X_train = np.load(f"{root}/cache/readmission/fold0_X_train.npy", mmap_mode='r')
+    y_train = np.load(f"{root}/cache/readmission/fold0_y_train.npy")
+    assert sorted(os.listdir(f"{root}/cache/readmission")) == \
+        sorted(f"fold{i}_{part}.npy" for i in range(2) for part in FOLD_PARTS)
+    # Scaled ages (raw mean ~54), shifted a little by the older readmitted SMOTE rows
+    assert abs(float(np.mean(X_train[:, 0]))) < 0.5 and (y_train == 1).sum() == (y_train == 0).sum()
+
+    assert [rung['candidates'] for rung in report['rungs']] == [4, 2, 1]
+    rows = [rung['rows'] for rung in report['rungs']]
+    assert rows == sorted(rows) and rows[-1] == len(X_train)
+    assert report['trials'] == (4 + 2 + 1) * 2 and not report['stopped_early']
+    assert report['best'] in [{**HYPERPARAMETERS['readmission'], **c} for c in candidates('readmission', 4)]
+    assert report['rungs'][0]['default_score'] is not None
+
+    # No time for a second rung: the best of the first one wins
+    X, y = ml.prepare_risk_score_data(patients_df, visits_df)
+    report = search('risk_score', X, y, n_jobs=1, n_candidates=4, factor=2, folds=2, time_budget=0)
+    assert report['stopped_early'] and len(report['rungs']) == 1
+
+
+def test_best_configuration_saved_in_bundle(tmp_path):
+    model_dir = str(tmp_path)
+    patients_df, visits_df = synthetic_frames(300, 42)
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    ml.hyperparameters['risk_score'] = {'n_estimators': 20, 'max_depth': 3, 'learning_rate': 0.2}
+    ml.search_reports['risk_score'] = {'metric': 'r2', 'score': 0.99}
+    ml.train_all({'risk_score': ml.prepare_risk_score_data(patients_df, visits_df),
+                  'disease_progression': ml.prepare_disease_progression_data(visits_df)}, processes=1)
+    assert ml.risk_model.n_estimators == 20 and ml.risk_model.learning_rate == 0.2
+    ml.save_models('20260101_000000')
+
+    models = ml.registry.manifest('20260101_000000')['models']
+    assert models['risk_score']['hyperparameters'] == ml.hyperparameters['risk_score']
+    assert models['risk_score']['search'] == {'metric': 'r2', 'score': 0.99}
+    assert models['disease_progression']['hyperparameters'] == HYPERPARAMETERS['disease_progression']
+
+    # The next training starts from the active models' configuration
+    fresh = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    assert fresh.load_hyperparameters()['risk_score'] == ml.hyperparameters['risk_score']
@@ -0,0 +1,138 @@
+"""
+Incremental Training Tests
+Checks that HealthcareMLModels.update_models adds trees fitted on new visits
+to the saved models (rebalancing the new readmission rows) and records the
+watermark, that the watermark survives the processors rewriting the visits,
+and that drifted or too few new rows leave the models unchanged.
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import ml_models
+from benchmark_ml import sample_records, subset, synthetic_frames
+from ml_models import BATCH_MODELS, MODEL_ATTRS, READMISSION_FEATURES, HealthcareMLModels
+from train_models import latest_visit, visits_after
+
+
+def _train(model_dir):
+    patients_df, visits_df = synthetic_frames(1500, 42)
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    ml.train_all({
+        'readmission': ml.prepare_readmission_data(patients_df, visits_df),
+        'risk_score': ml.prepare_risk_score_data(patients_df, visits_df),
+        'disease_progression': ml.prepare_disease_progression_data(visits_df)
+    }, processes=1)
+    ml.watermark = 'w1'
+    ml.save_models('20260101_000000')
+    return patients_df, visits_df
+
+
+def _new_visits(n_patients, seed):
+    """Visits of new patients (renamed so they do not collide with the trained ones)"""
+    patients_df, visits_df = synthetic_frames(n_patients, seed)
+    for frame in (patients_df, visits_df):
+        frame['patient_id'] = 'N' + frame['patient_id']
+    visits_df['visit_id'] = 'N' + visits_df['visit_id']
+    return patients_df, visits_df
+
+
+def _trees(ml):
+    return {name: getattr(ml, MODEL_ATTRS[name]).n_estimators for name in BATCH_MODELS}
+
+
+def test_update_adds_trees_and_moves_watermark(tmp_path, monkeypatch):
+    model_dir = str(tmp_path)
+    _train(model_dir)
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    assert ml.load_for_update() is None and ml.watermark == 'w1'
+    before = _trees(ml)
+    records = sample_records(*synthetic_frames(50, 1), 20)
+    expected = [ml.predict_readmission(subset(r, READMISSION_FEATURES))['probability'] for r in records]
+
+    patients_df, visits_df = _new_visits(300, 7)
+    datasets = ml.prepare_update_data(patients_df, visits_df, np.ones(len(visits_df), dtype=bool))
+    # The new readmission rows are rebalanced like the training rows
+    rebalanced = []
+    rebalance_classes = ml_models.rebalance_classes
+    monkeypatch.setattr(ml_models, 'rebalance_classes', lambda X, y, strategy: rebalanced.append((len(y), strategy))
+                        or rebalance_classes(X, y, strategy))
+    action, report = ml.update_models(datasets)
+    assert action == 'updated', report
+    assert rebalanced == [(len(datasets['readmission'][1]), 'smote')] and ml.rebalance == 'smote'
+    assert ml.readmission_model.class_weight == 'balanced'
+    for name, trees in _trees(ml).items():
+        assert trees == before[name] + report[name]['trees_added']
+    updated = [ml.predict_readmission(subset(r, READMISSION_FEATURES))['probability'] for r in records]
+    assert updated != expected
+
+    ml.watermark = 'w2'
+    ml.save_models('20260102_000000')
+    entry = ml.registry.manifest('20260102_000000')['models']['readmission']
+    assert entry['training']['watermark'] == 'w2' and entry['training']['updates'] == 1
+    assert entry['training']['updated_rows'] == len(datasets['readmission'][0])
+
+    # The updated bundle is served, and can be updated again
+    served = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    assert served.load_models() and served.model_version == '20260102_000000'
+    assert [served.predict_readmission(subset(r, READMISSION_FEATURES))['probability']
+            for r in records] == updated
+    again = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    assert again.load_for_update() is None and again.watermark == 'w2' and _trees(again) == _trees(ml)
+
+
+def test_drift_and_small_batches_leave_models_unchanged(tmp_path):
+    model_dir = str(tmp_path)
+    _train(model_dir)
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    assert ml.load_for_update() is None
+    before = _trees(ml)
+
+    patients_df, visits_df = _new_visits(300, 7)
+    patients_df['age'] += 40
+    action, report = ml.update_models(
+        ml.prepare_update_data(patients_df, visits_df, np.ones(len(visits_df), dtype=bool)))
+    assert action == 'retrain' and 'age drifted' in report['readmission']['reason']
+
+    patients_df, visits_df = _new_visits(20, 7)
+    action, report = ml.update_models(
+        ml.prepare_update_data(patients_df, visits_df, np.ones(len(visits_df), dtype=bool)))
+    assert action == 'skipped' and 'minimum' in report['readmission']['reason']
+    assert _trees(ml) == before
+
+    # Only the rows marked new are used; the earlier visits give the progression history
+    patients_df, visits_df = _new_visits(300, 7)
+    new_rows = (visits_df['number_of_previous_visits'] > 0).to_numpy()
+    datasets = ml.prepare_update_data(patients_df, visits_df, new_rows)
+    assert len(datasets['readmission'][0]) == new_rows.sum()
+    # Progression rows: new visits with an earlier visit of the same patient
+    has_earlier = visits_df.sort_values(['patient_id', 'visit_date']).groupby('patient_id').cumcount() > 0
+    assert len(datasets['disease_progression'][0]) == (new_rows & has_earlier.sort_index().to_numpy()).sum()
+
+
+
+def test_watermark_survives_reprocessing():
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().db
+    visits = [{'visit_id': f"V{i}", 'visit_date': f"2024-01-0{1 + i // 2}"} for i in range(6)]
+    db.visits_processed.insert_many([dict(v) for v in visits])
+    watermark = latest_visit(db)
+    assert watermark == {'visit_date': '2024-01-03', 'visit_id': 'V5'}
+
+    # The processors rewrite the collection: every visit gets a new _id
+    db.visits_processed.delete_many({})
+    db.visits_processed.insert_many([dict(v) for v in visits])
+    assert latest_visit(db, visits_after(watermark)) is None
+
+    db.visits_processed.insert_many([{'visit_id': 'V6', 'visit_date': '2024-01-03'},
+                                     {'visit_id': 'V0b', 'visit_date': '2024-01-01'}])
+    assert latest_visit(db, visits_after(watermark)) == {'visit_date': '2024-01-03', 'visit_id': 'V6'}
+    assert db.visits_processed.count_documents(visits_after(watermark)) == 1
+
+    # Datetime visit dates round-trip through the JSON manifest
+    db.visits_processed.insert_one({'visit_id': 'V7', 'visit_date': datetime(2024, 2, 1)})
+    dated = json.loads(json.dumps(latest_visit(db, {'visit_id': 'V7'})))
+    assert dated['datetime'] and db.visits_processed.count_documents(visits_after(dated)) == 0
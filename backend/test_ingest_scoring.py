@@ -0,0 +1,87 @@
+"""
+Score-on-Ingest Tests
+Checks that ingest_scoring.IngestScorer joins ingested visits with patient
+and history features, stores the predictions and serves the latest one.
+"""
+
+import pytest
+
+from ingest_scoring import IngestScorer, with_history
+from ml_models import HealthcareMLModels
+
+
+def test_history_features_from_previous_visit():
+    last = {'visit_date': '2024-01-01', 'severity_score': 4.0, 'number_of_previous_visits': 2}
+    record = with_history({'visit_id': 'V4', 'patient_id': 'P1', 'visit_date': '2024-01-31'}, last)
+    assert record['prev_severity'] == 4.0
+    assert record['number_of_previous_visits'] == 3
+    assert record['previous_visit_gap_days'] == 30
+
+    first = with_history({'visit_id': 'V1', 'patient_id': 'P1', 'visit_date': '2024-01-01'}, None)
+    assert first['prev_severity'] is None and first['number_of_previous_visits'] == 0
+
+    # A later stored visit (or the visit itself) is not history
+    earlier = with_history({'visit_id': 'V0', 'patient_id': 'P1', 'visit_date': '2023-12-01'}, last)
+    again = with_history({'visit_id': 'V3', 'patient_id': 'P1', 'visit_date': '2024-01-01'}, {**last, 'visit_id': 'V3'})
+    for record in (earlier, again):
+        assert record['prev_severity'] is None and record['previous_visit_gap_days'] == 0
+
+
+def test_ingested_visits_scored_and_stored(trained_models):
+    ml, patients_df, visits_df = trained_models
+    patient = patients_df.iloc[0].to_dict()
+    store = {'patients': [patient]}
+    scorer = IngestScorer(ml, memory_store=store)
+
+    first = {'visit_id': 'NEW1', 'patient_id': patient['patient_id'], 'visit_date': '2024-03-01',
+             'severity_score': 6, 'length_of_stay': 3}
+    second = {'visit_id': 'NEW2', 'patient_id': patient['patient_id'], 'visit_date': '2024-03-21',
+              'severity_score': 8, 'length_of_stay': 5}
+    documents = scorer.submit([second, first]).result(timeout=10)
+
+    assert [d['visit_id'] for d in documents] == ['NEW2', 'NEW1']
+    by_id = {d['visit_id']: d for d in documents}
+    assert by_id['NEW1']['disease_progression'] is None  # first visit
+    assert 'error' not in by_id['NEW2']['disease_progression']
+
+    expected = ml.predict_readmission({**patient, **second, 'previous_visit_gap_days': 20,
+                                       'number_of_previous_visits': 1})
+    assert by_id['NEW2']['readmission'] == expected
+
+    current = scorer.current(patient['patient_id'])
+    assert current['visit_id'] == 'NEW2' and current['source'] == 'ingest'
+    assert len(store['predictions']) == 2
+
+
+def test_backfilled_visits_take_history_from_earlier_visits(trained_models):
+    ml, patients_df, visits_df = trained_models
+    patient = patients_df.iloc[0].to_dict()
+    pid = patient['patient_id']
+    visits = [
+        {'visit_id': 'NEW1', 'patient_id': pid, 'visit_date': '2024-03-01', 'severity_score': 6, 'length_of_stay': 3},
+        {'visit_id': 'NEW3', 'patient_id': pid, 'visit_date': '2024-05-01', 'severity_score': 9, 'length_of_stay': 2},
+        {'visit_id': 'NEW2', 'patient_id': pid, 'visit_date': '2024-03-21', 'severity_score': 8, 'length_of_stay': 5},
+    ]
+    scorer = IngestScorer(ml, memory_store={'patients': [patient]})
+    stored = scorer.score(visits[:2])
+    backfilled, = scorer.score(visits[2:])
+    expected = ml.predict_readmission({**patient, **visits[2], 'previous_visit_gap_days': 20,
+                                       'number_of_previous_visits': 1})
+    assert backfilled['readmission'] == expected and backfilled['number_of_previous_visits'] == 1
+    assert scorer.current(pid)['visit_id'] == 'NEW3'
+
+    # The same lookups against MongoDB (latest of many patients in one query)
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient().db
+    db.predictions.insert_many([dict(doc, _id=doc['visit_id']) for doc in stored])
+    scorer = IngestScorer(ml, db)
+    latest = scorer._latest_predictions({pid, 'P-none'})
+    assert list(latest) == [pid] and latest[pid]['visit_id'] == 'NEW3' and '_id' not in latest[pid]
+    assert scorer.current(pid, before=visits[2])['visit_id'] == 'NEW1'
+    assert scorer.current(pid, before=visits[1])['visit_id'] == 'NEW1'
+
+
+def test_unloaded_models_skip_scoring(tmp_path):
+    scorer = IngestScorer(HealthcareMLModels(model_dir=str(tmp_path)), memory_store={})
+    assert scorer.submit([{'visit_id': 'V1', 'patient_id': 'P1'}]).result(timeout=10) == []
+    assert scorer.current('P1') is None
@@ -0,0 +1,124 @@
+"""
+Micro-Batching Tests
+Checks that micro_batching.MicroBatcher coalesces concurrent requests into
+batches, adapts its wait window to the arrival rate, fails only the request
+whose record cannot be scored, skips requests that timed out and keeps its
+worker thread alive through unexpected errors.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from micro_batching import MicroBatcher
+
+
+class Scorer:
+    """score_fn doubling numbers; the first call can be held until released"""
+
+    def __init__(self, hold=False):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def __call__(self, records):
+        self.batches.append(list(records))
+        self.started.set()
+        self.release.wait(5)
+        if 'bad' in records:
+            raise ValueError('bad record')
+        return [record * 2 for record in records]
+
+
+def test_concurrent_requests_share_batches():
+    scorer = Scorer(hold=True)
+    batcher = MicroBatcher('test_coalesce', scorer, max_batch_size=8, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        first = pool.submit(batcher.submit, 0)
+        assert scorer.started.wait(5)
+        # Queued while the worker is busy: scored together, at most 8 per call
+        futures = [pool.submit(batcher.submit, i) for i in range(1, 11)]
+        time.sleep(0.1)
+        scorer.release.set()
+        assert first.result() == 0
+        assert [f.result() for f in futures] == [2 * i for i in range(1, 11)]
+    assert scorer.batches[0] == [0]
+    assert sorted(r for batch in scorer.batches[1:] for r in batch) == list(range(1, 11))
+    assert len(scorer.batches) <= 3 and max(len(b) for b in scorer.batches) <= 8
+
+
+def test_window_adapts_to_arrival_rate():
+    batcher = MicroBatcher('test_window', Scorer(), max_batch_size=64, max_wait_ms=2)
+    assert batcher.current_window() == 0.0  # no traffic: no waiting
+    batcher._arrival_rate = 100.0  # 0.2 expected arrivals per window
+    assert batcher.current_window() == 0.0
+    batcher._arrival_rate = 10000.0  # fills 63 rows in 6.3 ms: wait the whole 2 ms
+    assert batcher.current_window() == 0.002
+    batcher._arrival_rate = 100000.0  # fills a batch in 0.63 ms
+    assert abs(batcher.current_window() - 63 / 100000.0) < 1e-12
+
+    # The rate follows the observed batches (EWMA)
+    batcher._arrival_rate, batcher._last_batch_start = 0.0, None
+    batcher._update_rate(1, 10.0)
+    for i in range(1, 60):
+        batcher._update_rate(10, 10.0 + i * 0.001)  # 10 rows per ms
+    assert abs(batcher._arrival_rate - 10000.0) < 1.0
+
+
+def test_bad_record_fails_only_its_request():
+    scorer = Scorer(hold=True)
+    batcher = MicroBatcher('test_isolation', scorer, max_batch_size=8, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        first = pool.submit(batcher.submit, 0)
+        assert scorer.started.wait(5)
+        futures = [pool.submit(batcher.submit, record) for record in [1, 'bad', 3]]
+        time.sleep(0.1)
+        scorer.release.set()
+        assert first.result() == 0
+        assert futures[0].result() == 2 and futures[2].result() == 6
+        try:
+            futures[1].result()
+            assert False, "bad record scored"
+        except ValueError:
+            pass
+    # The failed batch was scored again row by row
+    assert [1] in scorer.batches and [3] in scorer.batches
+
+
+def test_timed_out_requests_are_skipped():
+    scorer = Scorer(hold=True)
+    batcher = MicroBatcher('test_timeout', scorer, max_batch_size=8, max_wait_ms=0)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(batcher.submit, 0)
+        assert scorer.started.wait(5)
+        try:
+            batcher.submit(7, timeout=0.05)
+            assert False, "no timeout"
+        except TimeoutError:
+            pass
+        scorer.release.set()
+        assert first.result() == 0
+    assert batcher.submit(5) == 10
+    assert all(7 not in batch for batch in scorer.batches)
+
+
+def test_worker_survives_unexpected_errors():
+    batcher = MicroBatcher('test_survival', Scorer(), max_batch_size=8, max_wait_ms=0)
+    assert batcher.submit(1) == 2
+    worker = batcher._worker
+    update_rate = batcher._update_rate
+
+    def broken(*args):
+        batcher._update_rate = update_rate
+        raise RuntimeError('metrics failed')
+
+    batcher._update_rate = broken
+    try:
+        batcher.submit(2, timeout=5)
+        assert False, "error not reported"
+    except RuntimeError:
+        pass
+    assert batcher.submit(3, timeout=5) == 6
+    assert batcher._worker is worker and worker.is_alive()
@@ -0,0 +1,89 @@
+"""
+Model Registry Tests
+Checks manifests, per-model active pointers, checksums and pruning of
+model_registry.ModelRegistry through HealthcareMLModels.save/load_models.
+"""
+
+import os
+
+from benchmark_ml import sample_records, subset
+import model_registry
+from ml_models import HealthcareMLModels, READMISSION_FEATURES, RISK_FEATURES
+
+
+def test_models_are_versioned_independently(trained_models):
+    trained, patients_df, visits_df = trained_models
+    model_dir = trained.model_dir
+    trained.save_models('20260101_000000')
+
+    manifest = trained.registry.manifest('20260101_000000')
+    assert set(manifest['models']) == {'readmission', 'risk_score', 'disease_progression'}
+    readmission = manifest['models']['readmission']
+    assert readmission['features'] == READMISSION_FEATURES
+    assert 'accuracy' in readmission['metrics']
+    assert set(readmission['checksums']) == set(readmission['artifacts'].values())
+
+    # Retrain only the risk model: only its pointer moves
+    trained.readmission_model = trained.disease_progression_model = None
+    trained.train_risk_scoring_model(*trained.prepare_risk_score_data(patients_df, visits_df))
+    trained.save_models('20260102_000000')
+    assert trained.registry.active() == {
+        'readmission': '20260101_000000',
+        'risk_score': '20260102_000000',
+        'disease_progression': '20260101_000000'
+    }
+
+    serving = HealthcareMLModels(model_dir=model_dir)
+    assert serving.load_models()
+    record = sample_records(patients_df, visits_df, 1)[0]
+    assert serving.predict_readmission(subset(record, READMISSION_FEATURES))['model_version'] == '20260101_000000'
+    assert serving.predict_risk_score(subset(record, RISK_FEATURES))['model_version'] == '20260102_000000'
+
+    # Roll the risk model back
+    trained.registry.activate('20260101_000000', ['risk_score'])
+    assert serving.load_models()
+    assert serving.model_version == '20260101_000000'
+
+    # Both bundles are still referenced; a third unreferenced one is pruned
+    trained.save_models('20260103_000000', activate=False)
+    assert trained.registry.prune(keep=0) == ['20260102_000000', '20260103_000000']
+    assert not any('20260103_000000' in f for f in os.listdir(model_dir))
+    assert serving.load_models()
+
+
+def test_checksum_mismatch_is_detected(trained_models, monkeypatch):
+    trained, _, _ = trained_models
+    model_dir = trained.model_dir
+    trained.save_models('20260101_000000')
+    entry = trained.registry.manifest('20260101_000000')['models']['risk_score']
+    serving = HealthcareMLModels(model_dir=model_dir, lazy_load=False)
+    assert serving.load_models()
+
+    # Reloads do not hash unchanged files again
+    hashed = []
+    file_checksum = model_registry.file_checksum
+    monkeypatch.setattr(model_registry, 'file_checksum', lambda path: hashed.append(path) or file_checksum(path))
+    assert serving.load_models()
+    assert hashed == []
+    with open(os.path.join(model_dir, entry['artifacts']['compiled']), 'ab') as f:
+        f.write(b'\0')
+    assert not serving.load_models()
+    assert hashed == [os.path.join(model_dir, entry['artifacts']['compiled'])]
+
+
+def test_loaded_bundle_keeps_its_preprocessing(trained_models):
+    trained, _, _ = trained_models
+    model_dir = trained.model_dir
+    trained.save_models('20260101_000000')
+    serving = HealthcareMLModels(model_dir=model_dir)
+    serving.label_encoders, serving.fill_values = {}, {'readmission': {'bmi': -1.0}}
+    assert serving.load_models()
+
+    # The loaded codes, fill values and scaling become the working set,
+    # so compiling or saving from the loaded models republishes them
+    assert serving.fill_values == trained.fill_values
+    assert serving.preprocessing_spec() == trained.preprocessing_spec()
+    assert list(serving.scaler.mean_) == list(trained.scaler.mean_)
+    serving.compile_preprocessing()
+    for name, pipeline in trained.feature_pipelines().items():
+        assert serving._bundle.preprocessing[name].to_dict() == pipeline.to_dict()
@@ -0,0 +1,89 @@
+"""
+Model Tier Tests
+Checks the fast tier: students distilled from the full models, their tier
+report, and per-request tier selection after save/load.
+"""
+
+import numpy as np
+
+from benchmark_ml import sample_records, subset, synthetic_frames
+from ml_models import (HealthcareMLModels, FAST_TIER_PARAMS, READMISSION_FEATURES,
+                       RISK_FEATURES, distill)
+
+
+def train_tiered(model_dir, n_patients=500):
+    patients_df, visits_df = synthetic_frames(n_patients, 42)
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=100, fast_tier=True)
+    ml.train_readmission_model(*ml.prepare_readmission_data(patients_df, visits_df))
+    ml.train_risk_scoring_model(*ml.prepare_risk_score_data(patients_df, visits_df))
+    ml.train_disease_progression_model(*ml.prepare_disease_progression_data(visits_df))
+    return ml, patients_df, visits_df
+
+
+def test_distilled_students_follow_teacher():
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5))
+    y = np.digitize(X[:, 0] + 0.5 * X[:, 1] + 0.3 * rng.normal(size=len(X)), [-0.5, 0.5])
+    teacher = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=0).fit(X, y)
+    student = distill(teacher, X, FAST_TIER_PARAMS['disease_progression'])
+
+    assert len(student.estimators_) == 10 and max(e.tree_.max_depth for e in student.estimators_) <= 6
+    X_test = rng.normal(size=(1000, 5))
+    assert np.mean(student.predict(X_test) == teacher.predict(X_test)) > 0.85
+    assert np.abs(student.predict_proba(X_test) - teacher.predict_proba(X_test)).mean() < 0.1
+
+
+def test_tier_report_and_saved_tiers(tmp_path):
+    model_dir = str(tmp_path)
+    trained, patients_df, visits_df = train_tiered(model_dir)
+    for name, tiers in trained.tier_reports.items():
+        assert set(tiers) == {'full', 'fast'}
+        assert tiers['fast']['n_trees'] < tiers['full']['n_trees']
+        assert tiers['fast']['memory_bytes'] * 5 < tiers['full']['memory_bytes']
+        assert tiers['fast']['batch_us_per_row'] < tiers['full']['batch_us_per_row']
+    assert trained.tier_reports['risk_score']['fast']['metrics']['r2_vs_full'] > 0.9
+
+    trained.save_models('20260101_000000')
+    entry = trained.registry.manifest('20260101_000000')['models']['readmission']
+    assert {'compiled', 'fast_compiled', 'pickle', 'fast_pickle'} <= set(entry['artifacts'])
+    assert set(entry['checksums']) == set(entry['artifacts'].values())
+    assert set(entry['tiers']) == {'full', 'fast'}
+
+    serving = HealthcareMLModels(model_dir=model_dir)
+    assert serving.load_models()
+    record = subset(sample_records(patients_df, visits_df, 1)[0], READMISSION_FEATURES)
+    full = serving.predict_readmission(record)
+    fast = serving.predict_readmission(record, tier='fast')
+    assert full['tier'] == 'full' and fast['tier'] == 'fast'
+    # Tiers are cached separately and match the trained models
+    assert serving.predict_readmission(record) == full
+    X = trained._encode_row('readmission', record).copy()
+    expected = trained.fast_models['readmission_model'].predict_proba(X)[0, 1]
+    assert abs(fast['probability'] - expected) < 1e-12
+
+    batch = serving.predict_batch([record, record], ['readmission'], tier='fast')
+    assert batch[0]['readmission'] == fast
+    assert serving._bundle.loaded == ['readmission_model', 'fast_readmission_model']
+
+
+def test_fast_tier_falls_back_to_full(tmp_path):
+    model_dir = str(tmp_path)
+    trained, patients_df, visits_df = train_tiered(model_dir, n_patients=300)
+    # Retraining without the option drops the stale student of that model
+    trained.fast_tier = False
+    trained.train_risk_scoring_model(*trained.prepare_risk_score_data(patients_df, visits_df))
+    assert 'risk_model' not in trained.fast_models
+    trained.save_models('20260101_000000')
+
+    serving = HealthcareMLModels(model_dir=model_dir)
+    assert serving.load_models()
+    record = subset(sample_records(patients_df, visits_df, 1)[0], RISK_FEATURES)
+    result = serving.predict_risk_score(record, tier='fast')
+    assert result['tier'] == 'full'
+    try:
+        serving.predict_risk_score(record, tier='tiny')
+        assert False, "unknown tier accepted"
+    except ValueError:
+        pass
@@ -0,0 +1,87 @@
+"""
+Model Hot Reload Tests
+Checks that model_watcher.ModelWatcher picks up newly saved bundles and
+that predictions keep succeeding while bundles are swapped, and that an
+active pointer whose load failed is retried.
+"""
+
+import threading
+
+from benchmark_ml import sample_records, subset
+from ml_models import HealthcareMLModels, READMISSION_FEATURES
+from model_watcher import ModelWatcher
+
+
+def test_watcher_swaps_in_new_bundle_under_load(trained_models):
+    trained, patients_df, visits_df = trained_models
+    model_dir = trained.model_dir
+    trained.save_models()
+    first_version = trained.model_version
+
+    serving = HealthcareMLModels(model_dir=model_dir)
+    assert serving.load_models()
+    assert serving.model_version == first_version
+    assert serving._bundle.loaded == []  # models load on first use
+
+    watcher = ModelWatcher(serving)
+    watcher.start()
+    assert watcher.check() is None  # nothing new yet
+
+    rows = [subset(r, READMISSION_FEATURES) for r in sample_records(patients_df, visits_df, 50)]
+    failures, versions = [], set()
+    stop = threading.Event()
+
+    def predict_forever():
+        while not stop.is_set():
+            for row in rows:
+                result = serving.predict_readmission(row)
+                if 'error' in result:
+                    failures.append(result)
+                versions.add(result.get('model_version'))
+
+    serving.predict_readmission(rows[0])
+    assert serving._bundle.loaded == ['readmission_model']
+
+    threads = [threading.Thread(target=predict_forever) for _ in range(4)]
+    for t in threads:
+        t.start()
+
+    # A new bundle with a later timestamp is saved and activated
+    new_version = first_version[:-1] + chr(ord(first_version[-1]) + 1)
+    trained.save_models(new_version)
+    future = watcher.check()
+    assert future is not None and future.result()
+
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert serving.model_version == new_version
+    assert not failures
+    assert versions <= {first_version, new_version}
+    assert watcher.check() is None
+
+
+def test_failed_reload_of_active_pointer_is_retried(trained_models, monkeypatch):
+    trained, _, _ = trained_models
+    model_dir = trained.model_dir
+    trained.save_models('20260101_000000')
+    serving = HealthcareMLModels(model_dir=model_dir)
+    assert serving.load_models()
+    watcher = ModelWatcher(serving, interval_seconds=5)
+    watcher.start()
+
+    # The new pointer's first load fails (e.g. a bad checksum)
+    trained.save_models('20260102_000000')
+    monkeypatch.setattr(serving, 'load_models', lambda timestamp=None: False)
+    future = watcher.check()
+    assert future is not None and not future.result()
+    assert serving.model_version == '20260101_000000'
+    assert watcher.check() is None  # backing off
+
+    monkeypatch.undo()
+    watcher._retry_at = 0.0  # the delay has passed
+    future = watcher.check()
+    assert future is not None and future.result()
+    assert serving.model_version == '20260102_000000'
+    assert watcher.check() is None
@@ -0,0 +1,60 @@
+"""
+ONNX Backend Parity Tests
+Checks that the ONNX graphs exported by save_models(), which include the
+encoding and scaling, served with onnxruntime match scikit-learn.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('skl2onnx')
+
+from benchmark_ml import sample_records, train_synthetic_models
+from ml_models import BATCH_MODELS, HealthcareMLModels
+from onnx_backend import OnnxModel
+
+
+def test_onnx_backend_matches_sklearn(tmp_path):
+    # More patients than the shared fixture: enough rows for stable parity
+    model_dir = str(tmp_path)
+    trained, patients_df, visits_df = train_synthetic_models(n_patients=1000)
+    trained.model_dir = model_dir
+    trained.save_models()
+    records = sample_records(patients_df, visits_df, 2000)
+    expected = trained.predict_batch(records)
+
+    serving = HealthcareMLModels(model_dir=model_dir, cache_size=0, backend='onnx')
+    assert serving.load_models()
+    actual = serving.predict_batch(records)
+    assert isinstance(serving._bundle.readmission_model, OnnxModel)
+
+    for want, got in zip(expected, actual):
+        assert got['readmission']['readmission_risk'] == want['readmission']['readmission_risk']
+        assert abs(got['readmission']['probability'] - want['readmission']['probability']) < 1e-6
+        assert abs(got['risk_score']['risk_score'] - want['risk_score']['risk_score']) < 1e-4
+        assert got['disease_progression']['progression'] == want['disease_progression']['progression']
+        np.testing.assert_allclose(list(got['disease_progression']['probabilities'].values()),
+                                   list(want['disease_progression']['probabilities'].values()), atol=1e-6)
+
+    # Single-row path, invalid rows and unsupported explanations
+    assert serving.predict_readmission(records[0])['readmission_risk'] == expected[0]['readmission']['readmission_risk']
+    assert 'error' in serving.predict_batch([{'age': 'old'}], BATCH_MODELS)[0]['risk_score']
+    assert 'error' in serving.predict_risk_score(records[0], explain=True)['explanation']
+    explained = serving.predict_batch(records[:3], ['risk_score'], explain=True)
+    explanations = [row['risk_score']['explanation'] for row in explained]
+    assert 'error' in explanations[0] and len({id(e) for e in explanations}) == 3  # not one shared dict
+
+
+def test_onnx_backend_falls_back_to_sklearn(trained_models):
+    trained, patients_df, visits_df = trained_models
+    model_dir = trained.model_dir
+    trained.save_models()
+    manifest = trained.registry.manifest(trained.model_version)
+    for entry in manifest['models'].values():
+        del entry['artifacts']['onnx']
+    trained.registry.register(trained.model_version, manifest['models'], manifest['shared_artifacts'])
+
+    serving = HealthcareMLModels(model_dir=model_dir, backend='onnx', lazy_load=False)
+    assert serving.load_models()
+    assert type(serving._bundle.risk_model).__name__ == 'GradientBoostingRegressor'
@@ -0,0 +1,55 @@
+"""
+Parallel Training Tests
+Checks that HealthcareMLModels.train_all gives the same models whether the
+three trainings run in worker processes or one after another in-process.
+"""
+
+import numpy as np
+
+from benchmark_ml import synthetic_frames
+from ml_models import HealthcareMLModels
+
+
+def prepared(model_dir, n_patients=400):
+    patients_df, visits_df = synthetic_frames(n_patients, 42)
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    datasets = {
+        'readmission': ml.prepare_readmission_data(patients_df, visits_df),
+        'risk_score': ml.prepare_risk_score_data(patients_df, visits_df),
+        'disease_progression': ml.prepare_disease_progression_data(visits_df)
+    }
+    return ml, datasets
+
+
+def test_parallel_matches_sequential(tmp_path):
+    model_dir = str(tmp_path)
+    sequential, datasets = prepared(model_dir)
+    parallel, _ = prepared(model_dir)
+    seq_scores = sequential.train_all(datasets, n_jobs=2, processes=1)
+    par_scores = parallel.train_all(datasets, n_jobs=3, processes=3)
+    assert seq_scores == par_scores
+
+    X, _ = datasets['readmission']
+    X = sequential.scaler.transform(X)
+    assert np.array_equal(sequential.readmission_model.predict_proba(X),
+                          parallel.readmission_model.predict_proba(X))
+    assert np.array_equal(sequential.scaler.mean_, parallel.scaler.mean_)
+    X = datasets['disease_progression'][0].to_numpy(dtype=np.float64)
+    assert np.array_equal(sequential.disease_progression_model.predict(X),
+                          parallel.disease_progression_model.predict(X))
+
+    # The core budget is a training-time setting only
+    for ml in (sequential, parallel):
+        assert ml.readmission_model.n_jobs is None and ml.disease_progression_model.n_jobs is None
+    assert set(parallel.training_metrics) == {'readmission', 'risk_score', 'disease_progression'}
+
+
+def test_failed_model_is_reported(tmp_path):
+    model_dir = str(tmp_path)
+    ml, datasets = prepared(model_dir, n_patients=200)
+    X, y = datasets['disease_progression']
+    datasets['disease_progression'] = (X.iloc[:0], y.iloc[:0])
+    results = ml.train_all(datasets, processes=1)
+    assert isinstance(results['disease_progression'], Exception)
+    assert 0 <= results['readmission'] <= 1
+    assert ml.disease_progression_model is None
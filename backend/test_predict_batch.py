@@ -0,0 +1,114 @@
+"""
+Batch Prediction Tests
+Checks that HealthcareMLModels.predict_batch scores every valid record like
+the single-row predictions, on every backend, and that a record which
+cannot be scored (not an object, missing or unknown values, non-finite
+numbers) only gets an error entry of its own. Also checks the single-row
+fast path (per-thread buffers, scaled in place) against predict_batch.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmark_ml import sample_records, subset
+from ml_models import MODEL_FEATURES, HealthcareMLModels
+
+
+def bad_records(record):
+    """Records that cannot be scored, made from a good one"""
+    return [
+        'not a record',
+        dict(record, bmi='nan'),
+        dict(record, bmi=float('inf')),
+        dict(record, bmi='1e400'),
+        {k: v for k, v in record.items() if k != 'age'},
+        dict(record, gender='Nonbinary'),
+    ]
+
+
+BAD_RECORD_ERRORS = [
+    'Record must be a JSON object',
+    'bmi must be a number',
+    'bmi must be a number',
+    'bmi must be a number',
+    'Missing required field: age',
+    'Unknown value for gender: Nonbinary',
+]
+
+
+def test_predict_batch_matches_single_rows_and_isolates_bad_rows(trained_models):
+    trained, patients_df, visits_df = trained_models
+    model_dir = trained.model_dir
+    trained.save_models('20260101_000000')
+    models = {'trained': trained}
+    for backend in ['compiled', 'sklearn']:
+        models[backend] = HealthcareMLModels(model_dir=model_dir, cache_size=0, backend=backend)
+        assert models[backend].load_models()
+
+    records = sample_records(patients_df, visits_df, 40)
+    bad = bad_records(records[0])
+    batch = records[:20] + bad + records[20:]
+    for label, ml in models.items():
+        results = ml.predict_batch(batch)
+        assert len(results) == len(batch)
+        single = {
+            'readmission': ml.predict_readmission,
+            'risk_score': ml.predict_risk_score,
+            'disease_progression': ml.predict_disease_progression,
+        }
+        for record, result in zip(records, results[:20] + results[20 + len(bad):]):
+            for name, predict in single.items():
+                assert result[name] == predict(subset(record, MODEL_FEATURES[name])), (label, name)
+
+        for message, result in zip(BAD_RECORD_ERRORS, results[20:20 + len(bad)]):
+            assert result['readmission'] == {'error': message}, label
+            assert result['risk_score'] == {'error': message}, label
+        # The same values are errors on the single-row path too
+        for record in bad[1:4]:
+            assert ml.predict_readmission(record) == {'error': 'bmi must be a number'}
+
+        # Only the requested models run
+        assert set(ml.predict_batch(records[:2], ['risk_score'])[0]) == {'risk_score'}
+
+
+def test_single_row_fast_path_matches_batch_across_threads(trained_models):
+    trained, patients_df, visits_df = trained_models
+    model_dir = trained.model_dir
+    trained.save_models('20260101_000000')
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    assert ml.load_models()
+
+    records = sample_records(patients_df, visits_df, 400)
+    expected = ml.predict_batch(records)
+    single = {
+        'readmission': ml.predict_readmission,
+        'risk_score': ml.predict_risk_score,
+        'disease_progression': ml.predict_disease_progression,
+    }
+
+    # Each thread encodes into its own buffer, scaled in place: rows
+    # scored at the same time never see each other's values
+    def score(shard):
+        return [(i, {name: predict(subset(records[i], MODEL_FEATURES[name]))
+                     for name, predict in single.items()}) for i in shard]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        shards = [range(k, len(records), 8) for k in range(8)]
+        for results in pool.map(score, shards):
+            for i, result in results:
+                assert result == expected[i], i
+
+    # The returned buffer is the thread's own, reused by the next call
+    first = ml._encode_row('readmission', records[0])
+    copy = first.copy()
+    assert ml._encode_row('readmission', records[1]) is first
+    pipeline = ml._bundle.preprocessing['readmission']
+    batch, _ = pipeline.encode_records(records[:1])
+    assert np.array_equal(copy, pipeline.scale_rows(batch))
+    other = []
+    thread = threading.Thread(target=lambda: other.append(ml._encode_row('readmission', records[0])))
+    thread.start()
+    thread.join()
+    assert other[0] is not first and np.array_equal(other[0], copy)
@@ -0,0 +1,49 @@
+"""
+Prediction Cache Tests
+Checks LRU/TTL behaviour of prediction_cache.PredictionCache and that
+HealthcareMLModels serves identical results from the cache.
+"""
+
+import time
+
+from benchmark_ml import sample_records, subset
+from ml_models import READMISSION_FEATURES
+from prediction_cache import PredictionCache
+
+
+def test_lru_eviction():
+    cache = PredictionCache(max_entries=2, ttl_seconds=60)
+    cache.put(('m', 'v1', b'a'), {'x': 1})
+    cache.put(('m', 'v1', b'b'), {'x': 2})
+    cache.get(('m', 'v1', b'a'))  # 'a' becomes most recently used
+    cache.put(('m', 'v1', b'c'), {'x': 3})
+    assert cache.get(('m', 'v1', b'b')) is None
+    assert cache.get(('m', 'v1', b'a')) == {'x': 1}
+    stats = cache.stats()['models']['m']
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 2 and stats['misses'] == 1
+
+
+def test_ttl_expiry():
+    cache = PredictionCache(max_entries=10, ttl_seconds=0.01)
+    cache.put(('m', 'v1', b'a'), {'x': 1})
+    time.sleep(0.02)
+    assert cache.get(('m', 'v1', b'a')) is None
+    assert cache.stats()['models']['m']['expirations'] == 1
+
+
+def test_model_results_cached_and_invalidated(trained_models):
+    ml, patients_df, visits_df = trained_models
+    ml.prediction_cache = PredictionCache(max_entries=1000, ttl_seconds=60)
+    records = sample_records(patients_df, visits_df, 20)
+    rows = [subset(r, READMISSION_FEATURES) for r in records]
+
+    first = [ml.predict_readmission(row) for row in rows]
+    # Same values in another spelling encode to the same row
+    second = [ml.predict_readmission({k: str(v) for k, v in row.items()}) for row in rows]
+    batch = [r['readmission'] for r in ml.predict_batch(records, ['readmission'])]
+    assert first == second == batch
+    assert ml.prediction_cache.stats()['models']['readmission']['hits'] == 40
+
+    ml.compile_preprocessing()  # what training or loading does
+    assert ml.prediction_cache.stats()['size'] == 0
@@ -0,0 +1,67 @@
+"""
+Class Rebalancing Tests
+Checks the readmission rebalancing strategies of ml_models.rebalance_classes
+(SMOTE, chunked SMOTE, undersampling, class weights only) and that training
+uses and records the strategy a HealthcareMLModels was created with.
+"""
+
+import numpy as np
+
+from benchmark_ml import synthetic_frames
+from ml_models import REBALANCE_STRATEGIES, HealthcareMLModels, rebalance_classes
+
+
+def test_strategies():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 4))
+    y = (rng.random(3000) < 0.2).astype(int)
+    counts = np.bincount(y)
+
+    X_fit, y_fit, applied = rebalance_classes(X, y, 'smote')
+    assert applied == 'smote' and np.bincount(y_fit).tolist() == [counts[0], counts[0]]
+    assert np.array_equal(X_fit[:len(X)], X)  # the original rows come first
+
+    # Chunks are balanced on their own: about balanced overall, same majority rows
+    X_fit, y_fit, applied = rebalance_classes(X, y, 'chunked_smote', chunk_rows=1000)
+    assert applied == 'chunked_smote' and np.bincount(y_fit)[0] == counts[0]
+    assert abs(np.bincount(y_fit)[1] - counts[0]) <= 3
+    assert np.array_equal(np.sort(X_fit[y_fit == 0], axis=0), np.sort(X[y == 0], axis=0))
+
+    X_fit, y_fit, applied = rebalance_classes(X, y, 'undersample')
+    assert np.bincount(y_fit).tolist() == [counts[1], counts[1]]
+    X_fit, y_fit, applied = rebalance_classes(X, y, 'class_weight')
+    assert X_fit.shape == X.shape and np.array_equal(y_fit, y)
+
+    # Too few minority rows for SMOTE's neighbours: the class weights balance instead
+    few = np.zeros(3000, dtype=int)
+    few[:3] = 1
+    X_fit, y_fit, applied = rebalance_classes(X, few, 'smote')
+    assert applied == 'class_weight' and len(X_fit) == len(X)
+    try:
+        rebalance_classes(X, y, 'oversample')
+        assert False, "unknown strategy accepted"
+    except ValueError:
+        pass
+
+
+def test_training_uses_strategy(tmp_path):
+    root = str(tmp_path)
+    patients_df, visits_df = synthetic_frames(400, 42)
+    for strategy in REBALANCE_STRATEGIES:
+        ml = HealthcareMLModels(model_dir=root, cache_size=0, rebalance=strategy)
+        X, y = ml.prepare_readmission_data(patients_df, visits_df)
+        # train_all hands the strategy to the trainer (in this process with processes=1)
+        ml.train_all({'readmission': (X, y)}, processes=1)
+        metrics = ml.training_metrics['readmission']
+        assert metrics['rebalance'] == strategy and 'auc_roc' in metrics
+        if strategy == 'undersample':
+            assert metrics['n_fit'] < metrics['n_train']
+        elif strategy == 'class_weight':
+            assert metrics['n_fit'] == metrics['n_train']
+        else:
+            assert metrics['n_fit'] > metrics['n_train']
+    try:
+        HealthcareMLModels(model_dir=root, cache_size=0, rebalance='oversample')
+        assert False, "unknown strategy accepted"
+    except ValueError:
+        pass
@@ -0,0 +1,37 @@
+"""
+Risk Model Engine Tests
+Checks that the risk model trains as a HistGradientBoostingRegressor with
+the categorical columns split natively, and that the saved bundle records
+the estimator and serves the same predictions compiled as in training.
+"""
+
+from benchmark_ml import sample_records, subset, synthetic_frames
+from ml_models import RISK_FEATURES, HIST_HYPERPARAMETERS, HealthcareMLModels
+from tree_engine import CompiledEnsemble
+
+
+def test_hist_boosting_risk_model_round_trip(tmp_path):
+    model_dir = str(tmp_path)
+    patients_df, visits_df = synthetic_frames(1000, 42)
+    ml = HealthcareMLModels(model_dir=model_dir, cache_size=0, risk_engine='hist_gradient_boosting')
+    ml.train_all({'risk_score': ml.prepare_risk_score_data(patients_df, visits_df),
+                  'disease_progression': ml.prepare_disease_progression_data(visits_df)}, processes=1)
+    assert type(ml.risk_model).__name__ == 'HistGradientBoostingRegressor'
+    assert ml.risk_model.is_categorical_.any()
+    records = [subset(r, RISK_FEATURES) for r in sample_records(patients_df, visits_df, 50)]
+    expected = [ml.predict_risk_score(r)['risk_score'] for r in records]
+    ml.save_models('20260101_000000')
+
+    entry = ml.registry.manifest('20260101_000000')['models']['risk_score']
+    assert entry['estimator'] == 'HistGradientBoostingRegressor'
+    assert entry['hyperparameters'] == HIST_HYPERPARAMETERS
+    assert 'compiled' in entry['artifacts']
+
+    served = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    assert served.load_models()
+    assert isinstance(served._bundle.risk_model, CompiledEnsemble)
+    for record, want in zip(records, expected):
+        assert abs(served.predict_risk_score(record)['risk_score'] - want) < 1e-6
+
+    # The default engine does not reuse the histogram hyperparameters
+    assert 'risk_score' not in HealthcareMLModels(model_dir=model_dir, cache_size=0).load_hyperparameters()
@@ -0,0 +1,98 @@
+"""
+Sketch Accuracy Tests
+Checks the streaming sketches against exact answers on synthetic data, and
+that merges into a shared sketch document are not lost when writers race
+(mongomock in place of a MongoDB server).
+"""
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from sketches import AnalyticsSketches, HyperLogLog, KLLSketch, SpaceSaving, load_merged_sketches, merge_into_document
+
+
+def test_hyperloglog_within_error_bound():
+    rng = np.random.default_rng(42)
+    ids = [f"P{i}" for i in rng.integers(0, 100000, 200000)]
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update_many(ids[:100000])
+    right.update_many(ids[100000:])
+    merged = HyperLogLog.from_bytes(left.to_bytes()).merge(right)
+    exact = len(set(ids))
+    assert abs(merged.count() - exact) / exact < 4 * merged.relative_error()
+
+
+def test_kll_quantiles_within_rank_error():
+    rng = np.random.default_rng(42)
+    values = rng.exponential(5, 200000)
+    sketch = KLLSketch(seed=42)
+    for chunk in np.array_split(values, 8):
+        sketch.update_many(chunk)
+    sketch = KLLSketch.from_bytes(sketch.to_bytes())
+    assert sketch.count() == len(values)
+    sorted_values = np.sort(values)
+    for q, estimate in zip([0.1, 0.5, 0.9, 0.99], sketch.quantiles([0.1, 0.5, 0.9, 0.99])):
+        rank = np.searchsorted(sorted_values, estimate) / len(values)
+        assert abs(rank - q) <= sketch.rank_error()
+
+
+def test_space_saving_finds_heavy_hitters():
+    rng = np.random.default_rng(42)
+    items = rng.zipf(1.5, 100000)
+    left, right = SpaceSaving(capacity=50), SpaceSaving(capacity=50)
+    left.update_many(items[:50000])
+    right.update_many(items[50000:])
+    merged = SpaceSaving.from_bytes(left.to_bytes()).merge(right)
+    exact = Counter(str(i) for i in items)
+    for entry in merged.top(5):
+        assert entry['guaranteed_count'] <= exact[entry['item']] <= entry['count']
+        assert entry['count'] - exact[entry['item']] <= merged.max_overcount()
+    assert [e['item'] for e in merged.top(3)] == [item for item, _ in exact.most_common(3)]
+
+
+def test_analytics_sketches_round_trip():
+    sketches = AnalyticsSketches()
+    sketches.update_from_patients([{'patient_id': 'P1', 'bmi': '27.5'}, {'patient_id': 'P2', 'bmi': None}])
+    sketches.update_from_visits([{'patient_id': 'P1', 'length_of_stay': 4, 'severity_score': 7,
+                                  'diagnosis_description': 'Diabetes'}])
+    restored = AnalyticsSketches.from_document(sketches.to_document())
+    assert restored.distinct_patients.count() == 2
+    assert restored.quantiles['bmi'].quantiles([0.5]) == [27.5]
+    assert restored.top_diagnoses.top(1)[0]['item'] == 'Diabetes'
+
+
+def test_merge_into_shared_document():
+    mongomock = pytest.importorskip('mongomock')
+    collection = mongomock.MongoClient().db.analytics_sketches
+    batches = [[{'patient_id': f'P{i}', 'bmi': 20 + i}] for i in range(3)]
+    for batch in batches[:2]:
+        sketches = AnalyticsSketches()
+        sketches.update_from_patients(batch)
+        assert merge_into_document(collection, 'api', sketches)
+    assert collection.count_documents({}) == 1
+    assert collection.find_one({'_id': 'api'})['revision'] == 2
+
+    # Another worker writes between this one's read and write: merged again on top of it
+    class Racing:
+        def __init__(self):
+            self.raced = False
+
+        def find_one(self, query):
+            doc = collection.find_one(query)
+            if not self.raced:
+                self.raced = True
+                other = AnalyticsSketches()
+                other.update_from_patients(batches[2])
+                merge_into_document(collection, 'api', other)
+            return doc
+
+        def __getattr__(self, name):
+            return getattr(collection, name)
+
+    sketches = AnalyticsSketches()
+    sketches.update_from_patients([{'patient_id': 'P9', 'bmi': 30}])
+    assert merge_into_document(Racing(), 'api', sketches)
+    merged = load_merged_sketches(collection)
+    assert merged.distinct_patients.count() == 4 and merged.quantiles['bmi'].count() == 4
@@ -0,0 +1,51 @@
+"""
+Prediction Stage Timing Tests
+Checks that metrics.StageTimer records each prediction stage into the
+per-model, per-version histograms and the per-request trace.
+"""
+
+from metrics import StageTimer, server_timing, stage_summary, trace_stages
+from prediction_cache import PredictionCache
+
+
+def test_laps_feed_histograms_and_trace():
+    with trace_stages() as stages:
+        timer = StageTimer('test_model', 'v1')
+        timer.lap('parse')
+        timer.lap('model')
+        total = timer.finish()
+    assert [stage for stage, _ in stages] == ['test_model.parse', 'test_model.model', 'test_model.total']
+    assert abs(total - sum(seconds for _, seconds in timer.stages)) < 1e-12
+
+    # Timers outside a trace still record their histograms
+    StageTimer('test_model', 'v1').lap('parse')
+    summary = stage_summary()['test_model']['v1']
+    assert summary['parse']['count'] == 2 and summary['total']['count'] == 1
+
+    header = server_timing([('a.parse', 0.0012)])
+    assert header == 'a.parse;dur=1.200'
+
+
+def test_predictions_record_stages_by_version(trained_models):
+    ml, patients_df, visits_df = trained_models
+    patient = patients_df.iloc[0].to_dict()
+    visit = visits_df.iloc[0].to_dict()
+    record = {**patient, **visit, 'prev_severity': 5}
+    version = ml.model_versions['readmission']
+    ml.prediction_cache = PredictionCache(max_entries=100)
+
+    with trace_stages() as stages:
+        ml.predict_readmission(record)
+        ml.predict_readmission(record)  # cache hit: no model stage
+    names = [stage for stage, _ in stages]
+    assert names == ['readmission.encode', 'readmission.scale', 'readmission.cache', 'readmission.model',
+                     'readmission.format', 'readmission.encode', 'readmission.scale', 'readmission.cache']
+
+    with trace_stages() as stages:
+        ml.predict_batch([record] * 3, ['risk_score'])
+    assert [stage for stage, _ in stages] == ['risk_score.encode', 'risk_score.cache', 'risk_score.model',
+                                              'risk_score.format']
+
+    summary = stage_summary()
+    assert summary['readmission'][version]['model']['count'] >= 1
+    assert summary['risk_score'][ml.model_versions['risk_score']]['model']['count'] >= 1
@@ -0,0 +1,74 @@
+"""
+Synthetic Data Generator Tests
+Checks that synthetic_data generates consistent patients, visits and
+prescriptions with the processors' columns, that the written shards only
+depend on the seed, and that dirty rows are the kind the processors clean.
+"""
+
+import filecmp
+import os
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import COLUMNS, TABLES, generate, generate_frames
+
+
+def test_frames_are_consistent():
+    frames = generate_frames(3000, seed=7)
+    patients, visits, prescriptions = (frames[table] for table in TABLES)
+    for table in TABLES:
+        assert list(frames[table].columns) == COLUMNS[table]
+    assert patients['patient_id'].is_unique and visits['visit_id'].is_unique
+    assert prescriptions['prescription_id'].is_unique
+
+    # Every visit has a patient, every prescription the visit's patient
+    assert visits['patient_id'].isin(patients['patient_id']).all()
+    owners = visits.set_index('visit_id')['patient_id']
+    assert (prescriptions['visit_id'].map(owners) == prescriptions['patient_id']).all()
+
+    # Counts and gaps agree with the dates; a readmission is followed within 30 days of discharge
+    previous = visits.groupby('patient_id')['visit_date'].shift()
+    assert (visits['number_of_previous_visits'] == visits.groupby('patient_id').cumcount()).all()
+    assert ((visits['visit_date'] - previous).dt.days.fillna(0) == visits['previous_visit_gap_days']).all()
+    following = visits.groupby('patient_id')['visit_date'].shift(-1)
+    days_out = (following - visits['visit_date']).dt.days - visits['length_of_stay']
+    readmitted = visits['readmitted_within_30_days'] == 'Yes'
+    assert (days_out[readmitted & following.notna()] <= 30).all()
+    assert (days_out[~readmitted & following.notna()] > 30).all()
+
+    # Severity follows age; readmissions follow severity
+    merged = visits.merge(patients, on='patient_id')
+    assert np.corrcoef(merged['age'], merged['severity_score'])[0, 1] > 0.1
+    assert merged[readmitted]['severity_score'].mean() > merged[~readmitted]['severity_score'].mean() + 1
+
+    again = generate_frames(3000, seed=7)
+    assert all(again[table].equals(frames[table]) for table in TABLES)
+
+
+def test_shards_and_dirty_rows(tmp_path):
+    root = str(tmp_path)
+    sequential = generate(f"{root}/a", 2500, seed=3, shard_size=1000, processes=1)
+    parallel = generate(f"{root}/b", 2500, seed=3, shard_size=1000, processes=2)
+    assert sequential['shards'] == 3 and sequential['rows'] == parallel['rows']
+    for table in TABLES:
+        files = sorted(os.listdir(f"{root}/a/{table}"))
+        assert files == [f"part-0000{i}.csv" for i in range(3)]
+        assert all(filecmp.cmp(f"{root}/a/{table}/{f}", f"{root}/b/{table}/{f}", shallow=False) for f in files)
+    patients = pd.concat(pd.read_csv(f"{root}/a/patients/{f}") for f in sorted(os.listdir(f"{root}/a/patients")))
+    assert len(patients) == 2500 and patients['patient_id'].is_unique
+    assert patients['patient_id'].iloc[-1] == 'P002499'
+
+    # Dirty rows: what the processors drop or coerce, plus duplicates
+    dirty = generate_frames(2000, seed=3, dirty_rate=0.05)
+    clean = generate_frames(2000, seed=3)
+    patients = dirty['patients']
+    age = pd.to_numeric(patients['age'], errors='coerce')
+    assert patients['patient_id'].isna().any() and age.isna().any() and (age > 150).any()
+    assert patients.duplicated().any() and not clean['patients'].duplicated().any()
+    assert pd.to_numeric(dirty['visits']['severity_score'], errors='coerce').isna().any()
+    assert not dirty['visits']['patient_id'].dropna().isin(clean['patients']['patient_id']).all()
+    # About 5% of the rows are changed or duplicated
+    n = len(clean['patients'])
+    changed = (patients.iloc[:n].astype(str) != clean['patients'].astype(str)).any(axis=1).sum()
+    assert 0.03 < (changed + len(patients) - n) / n < 0.07
@@ -0,0 +1,70 @@
+"""
+Training Data Loader Tests
+Checks that training_data.load_frame builds typed, categorical frames chunk
+by chunk and that the models prepare the same training data from them as
+from plain object-column DataFrames.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmark_ml import synthetic_frames
+from ml_models import HealthcareMLModels
+from training_data import PATIENT_COLUMNS, VISIT_COLUMNS, load_frame
+
+
+def test_typed_columns_across_chunks():
+    documents = [
+        {'patient_id': 'P2', 'visit_date': datetime(2024, 1, 2), 'severity_score': 4, 'length_of_stay': 2,
+         'readmitted_within_30_days': 'Yes'},
+        {'patient_id': 'P1', 'visit_date': '2024-01-05', 'severity_score': None, 'length_of_stay': 'n/a'},
+        {'patient_id': 'P3', 'visit_date': None, 'severity_score': 7.5, 'length_of_stay': 3,
+         'readmitted_within_30_days': 'No'},
+    ]
+    encoders = {}
+    visits = load_frame(iter(documents), VISIT_COLUMNS, encoders, chunk_size=2)
+
+    assert list(visits.columns) == list(VISIT_COLUMNS)
+    assert visits['severity_score'].dtype == np.float64 and visits['visit_date'].dtype == 'datetime64[ns]'
+    assert list(visits['patient_id'].cat.categories) == ['P1', 'P2', 'P3']
+    assert list(visits['patient_id']) == ['P2', 'P1', 'P3']
+    assert visits['severity_score'].isna().tolist() == [False, True, False]
+    assert visits['length_of_stay'].isna().tolist() == [False, True, False]
+    assert visits['visit_date'].isna().tolist() == [False, False, True]
+    assert visits['readmitted_within_30_days'].isna().tolist() == [False, True, False]
+
+    # A second frame sharing the encoders reuses the patient_id codes
+    patients = load_frame([{'patient_id': 'P3', 'age': 40}], PATIENT_COLUMNS, encoders)
+    assert patients['patient_id'].cat.codes.tolist() == [2]
+    assert len(load_frame([], PATIENT_COLUMNS)) == 0
+
+
+def test_prepared_data_matches_object_frames(tmp_path):
+    patients_df, visits_df = synthetic_frames(400, 42)
+    patients_df.loc[patients_df.index[::9], 'gender'] = None
+    patient_docs = patients_df.to_dict('records')
+    visit_docs = visits_df.to_dict('records')
+
+    encoders = {}
+    typed_patients = load_frame(patient_docs, PATIENT_COLUMNS, encoders, chunk_size=100)
+    typed_visits = load_frame(visit_docs, VISIT_COLUMNS, encoders, chunk_size=100)
+    typed_patients['patient_id'] = typed_patients['patient_id'].cat.set_categories(
+        typed_visits['patient_id'].cat.categories)
+    assert typed_visits.memory_usage(deep=True).sum() < pd.DataFrame(visit_docs).memory_usage(deep=True).sum()
+
+    model_dir = str(tmp_path)
+    plain = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    typed = HealthcareMLModels(model_dir=model_dir, cache_size=0)
+    for prepare in ['prepare_readmission_data', 'prepare_risk_score_data']:
+        X, y = getattr(plain, prepare)(pd.DataFrame(patient_docs), pd.DataFrame(visit_docs))
+        X_typed, y_typed = getattr(typed, prepare)(typed_patients, typed_visits)
+        assert np.allclose(X.to_numpy(float), X_typed.to_numpy(float), rtol=1e-6)
+        assert np.allclose(y.to_numpy(float), y_typed.to_numpy(float), rtol=1e-5)
+    X, y = plain.prepare_disease_progression_data(pd.DataFrame(visit_docs))
+    X_typed, y_typed = typed.prepare_disease_progression_data(typed_visits)
+    assert np.allclose(X.to_numpy(float), X_typed.to_numpy(float))
+    assert (y.to_numpy() == y_typed.to_numpy()).all()
+    assert {col: list(e.classes_) for col, e in plain.label_encoders.items()} == \
+        {col: list(e.classes_) for col, e in typed.label_encoders.items()}
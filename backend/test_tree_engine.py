@@ -0,0 +1,132 @@
+"""
+Compiled Tree Engine Parity Tests
+Checks tree_engine.CompiledEnsemble against scikit-learn outputs.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestClassifier
+
+from tree_engine import CompiledEnsemble
+
+rng = np.random.default_rng(42)
+X_train = rng.normal(size=(3000, 9))
+X_test = rng.normal(size=(5000, 9))
+
+
+def round_trip(model, filename='model.npz'):
+    """Compile, save and reload a model"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, filename)
+        CompiledEnsemble.from_sklearn(model).save(path)
+        return CompiledEnsemble.load(path)
+
+
+def test_readmission_forest_parity():
+    y = (X_train[:, 0] + rng.normal(size=len(X_train)) > 0.5).astype(int)
+    model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42,
+                                   class_weight='balanced').fit(X_train, y)
+    compiled = round_trip(model)
+    np.testing.assert_allclose(compiled.predict_proba(X_test), model.predict_proba(X_test), atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X_test), model.predict(X_test))
+    np.testing.assert_allclose(compiled.predict_proba(X_test[:1]), model.predict_proba(X_test[:1]), atol=1e-12)
+
+
+def test_progression_forest_parity():
+    y = np.digitize(X_train[:, 1] + 0.5 * rng.normal(size=len(X_train)), [-0.5, 0.5])
+    model = RandomForestClassifier(n_estimators=100, max_depth=8, random_state=42,
+                                   class_weight='balanced').fit(X_train[:, :4], y)
+    compiled = round_trip(model)
+    np.testing.assert_allclose(compiled.predict_proba(X_test[:, :4]), model.predict_proba(X_test[:, :4]), atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X_test[:, :4]), model.predict(X_test[:, :4]))
+
+
+def test_risk_boosting_parity():
+    y = np.clip(20 + 5 * X_train[:, 5] + 3 * X_train[:, 0] + rng.normal(size=len(X_train)), 0, 100)
+    model = GradientBoostingRegressor(n_estimators=100, max_depth=5, learning_rate=0.1,
+                                      random_state=42).fit(X_train[:, :8], y)
+    compiled = round_trip(model)
+    np.testing.assert_allclose(compiled.predict(X_test[:, :8]), model.predict(X_test[:, :8]), atol=1e-9)
+
+
+def test_hist_boosting_parity():
+    # Column 8 holds category codes (as the label encoders produce), split natively
+    X = np.column_stack([X_train[:, :8], rng.integers(0, 40, len(X_train))])
+    X_new = np.column_stack([X_test[:, :8], rng.integers(0, 40, len(X_test))])
+    y = 20 + 5 * X[:, 5] + 3 * X[:, 0] + 4 * (X[:, 8] % 3 == 0) + rng.normal(size=len(X))
+    model = HistGradientBoostingRegressor(max_iter=100, max_depth=5, early_stopping=False, random_state=42,
+                                          categorical_features=[8]).fit(X, y)
+    compiled = round_trip(model, 'model.joblib')
+    assert compiled.bitset_idx is not None and (compiled.bitset_idx >= 0).any()
+    np.testing.assert_allclose(compiled.predict(X_new), model.predict(X_new), atol=1e-9)
+    np.testing.assert_allclose(compiled.predict(X_new[:1]), model.predict(X_new[:1]), atol=1e-9)
+    bias, contributions = compiled.contributions(X_new)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), model.predict(X_new), atol=1e-9)
+    assert np.abs(contributions[:, 8]).max() > np.abs(contributions[:, [2, 3, 4, 6, 7]]).max()
+
+    # Missing values follow each node's missing_go_to_left; categories not
+    # seen in training (or out of the 0-255 range) are routed as missing
+    X_missing = X.copy()
+    X_missing[rng.random(len(X)) < 0.1, 5] = np.nan
+    X_missing[rng.random(len(X)) < 0.1, 8] = np.nan
+    model = HistGradientBoostingRegressor(max_iter=100, max_depth=5, early_stopping=False, random_state=42,
+                                          categorical_features=[8]).fit(X_missing, y)
+    compiled = round_trip(model, 'model.joblib')
+    assert compiled.missing_left.any() and not compiled.missing_left.all()
+    X_odd = X_new.copy()
+    X_odd[::4, 5] = np.nan
+    X_odd[1::4, 8] = np.nan
+    X_odd[2::4, 8] = rng.choice([40, 41, 100, 255, 300, -1], len(X_odd[2::4]))
+    np.testing.assert_allclose(compiled.predict(X_odd), model.predict(X_odd), atol=1e-9)
+    bias, contributions = compiled.contributions(X_odd)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), model.predict(X_odd), atol=1e-9)
+
+
+def saabas_reference(model, x):
+    """Contributions of one row by walking each sklearn tree's decision path"""
+    n_outputs = model.n_classes_ if hasattr(model, 'n_classes_') else 1
+    contributions = np.zeros((len(x), n_outputs))
+    estimators = np.asarray(model.estimators_, dtype=object).ravel()
+    for estimator in estimators:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :]
+        value = value / value.sum(axis=1, keepdims=True) if n_outputs > 1 else value
+        path = estimator.decision_path(x[None, :]).indices
+        for parent, child in zip(path[:-1], path[1:]):
+            contributions[tree.feature[parent]] += value[child] - value[parent]
+    if n_outputs > 1:
+        return contributions / len(estimators)
+    return model.learning_rate * contributions[:, 0]
+
+
+def test_contributions_match_decision_paths():
+    y = np.digitize(X_train[:, 1] + 0.5 * rng.normal(size=len(X_train)), [-0.5, 0.5])
+    forest = RandomForestClassifier(n_estimators=30, max_depth=8, random_state=42).fit(X_train, y)
+    compiled = round_trip(forest, 'model.joblib')
+    bias, contributions = compiled.contributions(X_test)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), forest.predict_proba(X_test), atol=1e-12)
+    for i in range(5):
+        np.testing.assert_allclose(contributions[i], saabas_reference(forest, X_test[i]), atol=1e-12)
+
+    y = 20 + 5 * X_train[:, 5] + 3 * X_train[:, 0] + rng.normal(size=len(X_train))
+    boosting = GradientBoostingRegressor(n_estimators=50, max_depth=4, random_state=42).fit(X_train, y)
+    compiled = round_trip(boosting)
+    bias, contributions = compiled.contributions(X_test)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), boosting.predict(X_test), atol=1e-9)
+    for i in range(5):
+        np.testing.assert_allclose(contributions[i], saabas_reference(boosting, X_test[i]), atol=1e-9)
+    # Features the model never splits on get nothing
+    assert np.abs(contributions[:, [2, 3, 4, 6, 7, 8]]).max() < np.abs(contributions[:, 5]).max() / 10
+
+
+def test_memory_mapped_round_trip():
+    y = (X_train[:, 2] > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=42).fit(X_train, y)
+    compiled = round_trip(model, 'model.joblib')
+    # Hot arrays are served straight from the mapping, not copied
+    for array in (compiled.feature, compiled.threshold, compiled.children, compiled.value):
+        assert isinstance(array.base, np.memmap) or isinstance(array, np.memmap)
+        assert not array.flags.writeable
+    np.testing.assert_allclose(compiled.predict_proba(X_test), model.predict_proba(X_test), atol=1e-12)
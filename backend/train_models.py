@@ -1,13 +1,33 @@
 """
 Train Machine Learning Models using MongoDB data
 Run this script to train all three ML models with your 12,000+ patient records
+
+Usage:
+    python train_models.py                 # train the three models in parallel on all cores
+    python train_models.py --fast-tier     # also distill compact fast-tier models
+    python train_models.py --jobs 4        # core budget for training
+    python train_models.py --sequential    # one model after another in this process
+    python train_models.py --chunk-size 100000   # documents converted at a time while loading
+    python train_models.py --feature-store DIR   # where the encoded features are materialized
+    python train_models.py --incremental   # update the active models with the visits added since
+                                           # their last training (full training when they need it)
+    python train_models.py --search        # search the hyperparameters first (see hyperparameter_search.py)
+    python train_models.py --search --search-budget 600   # seconds of search before training
+    python train_models.py --risk-engine hist_gradient_boosting   # risk model engine (see RISK_ENGINES)
+    python train_models.py --rebalance class_weight   # readmission class balancing (see REBALANCE_STRATEGIES)
 """
 
-import pandas as pd
+from datetime import datetime
+
 import numpy as np
-from pymongo import MongoClient
-from ml_models import HealthcareMLModels
+from pymongo import DESCENDING, MongoClient
+from ml_models import DEFAULT_REBALANCE, DEFAULT_RISK_ENGINE, REBALANCE_STRATEGIES, RISK_ENGINES, HealthcareMLModels
+from feature_store import FEATURE_STORE_DIR, FeatureStore
+from hyperparameter_search import search_all
+from synthetic_data import generate_visits
+from training_data import DEFAULT_CHUNK_SIZE, load_training_frames
 from dotenv import load_dotenv
+import argparse
 import os
 
 # Load environment variables
@@ -17,185 +37,312 @@ load_dotenv()
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 MONGO_DB = os.getenv('MONGO_DB', 'healthcare_analytics')
 
-print("="*60)
-print("🏥 Healthcare ML Model Training Pipeline")
-print("="*60)
-
-# Connect to MongoDB
-print("\n📊 Connecting to MongoDB...")
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DB]
-
-# Load data from MongoDB
-print("📥 Loading patient data from MongoDB...")
-patients_cursor = db.patients_processed.find()
-patients_df = pd.DataFrame(list(patients_cursor))
-print(f"✅ Loaded {len(patients_df)} patient records")
-
-print("📥 Loading visit data from MongoDB...")
-visits_cursor = db.visits_processed.find()
-visits_df = pd.DataFrame(list(visits_cursor))
-print(f"✅ Loaded {len(visits_df)} visit records")
-
-# Generate synthetic visit data if needed
-if len(visits_df) < 100 and len(patients_df) > 100:
-    print("\n🔧 Generating synthetic visit data from patient records...")
-    
-    # Create synthetic visits based on patient data
-    synthetic_visits = []
-    np.random.seed(42)
-    
-    for _, patient in patients_df.head(1000).iterrows():  # Use first 1000 patients
-        # Generate 1-3 visits per patient
-        num_visits = np.random.randint(1, 4)
-        
-        for i in range(num_visits):
-            visit = {
-                'visit_id': f"{patient['patient_id']}_V{i+1}",
-                'patient_id': patient['patient_id'],
-                'visit_date': pd.Timestamp.now() - pd.Timedelta(days=np.random.randint(1, 365)),
-                'severity_score': np.random.randint(1, 11),
-                'length_of_stay': np.random.randint(1, 15),
-                'previous_visit_gap_days': np.random.randint(7, 180) if i > 0 else 0,
-                'number_of_previous_visits': i,
-                'readmitted_within_30_days': np.random.choice([0, 1], p=[0.7, 0.3])
-            }
-            synthetic_visits.append(visit)
-    
-    visits_df = pd.DataFrame(synthetic_visits)
-    print(f"✅ Generated {len(visits_df)} synthetic visit records")
-
-# Check if we have enough data
-if len(patients_df) < 100:
-    print("⚠️  Warning: Insufficient patient data. Need at least 100 records.")
-    print("   Please run PySpark processor to load more data.")
-    exit(1)
-
-# Merge patient data with visits for training
-print("\n🔧 Preparing training dataset...")
-merged_df = visits_df.merge(patients_df, on='patient_id', how='left')
-print(f"✅ Merged dataset: {len(merged_df)} records")
-
-# Initialize ML models
-print("\n🔧 Initializing ML models...")
-ml_models = HealthcareMLModels()
-
-# Train Model 1: Readmission Prediction
-print("\n" + "="*60)
-print("MODEL 1: 30-DAY READMISSION PREDICTION")
-print("="*60)
-try:
-    X_readmission, y_readmission = ml_models.prepare_readmission_data(patients_df, visits_df)
+
+WATERMARK_ORDER = [('visit_date', DESCENDING), ('visit_id', DESCENDING)]
+
+
+def latest_visit(db, query=None):
+    """
+    visit_date and visit_id of the newest visit, the watermark of the data a
+    training run sees; None without visits. The processors rewrite
+    visits_processed (new _ids every run), so the watermark is keyed on the
+    visits' own fields. Visits backfilled with earlier dates than the
+    watermark are only picked up by a full training.
+    """
+    db.visits_processed.create_index(WATERMARK_ORDER)
+    latest = db.visits_processed.find_one(query or {}, {'visit_date': 1, 'visit_id': 1, '_id': 0},
+                                          sort=WATERMARK_ORDER)
+    if latest is None:
+        return None
+    date = latest.get('visit_date')
+    if isinstance(date, datetime):  # saved in the JSON manifest
+        return {'visit_date': date.isoformat(), 'visit_id': latest.get('visit_id'), 'datetime': True}
+    return {'visit_date': date, 'visit_id': latest.get('visit_id')}
+
+
+def visits_after(watermark):
+    """Query of the visits after a watermark (later date, or same date and later visit_id)"""
+    date = watermark['visit_date']
+    if watermark.get('datetime'):
+        date = datetime.fromisoformat(date)
+    return {'$or': [
+        {'visit_date': {'$gt': date}},
+        {'visit_date': date, 'visit_id': {'$gt': watermark['visit_id']}}
+    ]}
+
+
+def update_incrementally(db, args):
+    """
+    Update the active models with the visits added after their watermark
+    (see HealthcareMLModels.update_models)
+
+    Returns:
+        False when the models need a full training instead
+    """
+    print("\n🔁 Incremental update...")
+    ml_models = HealthcareMLModels(fast_tier=args.fast_tier, n_jobs=args.jobs)
+    reason = ml_models.load_for_update()
+    if reason:
+        print(f"⚠️  Cannot update: {reason}")
+        return False
+
+    if not isinstance(ml_models.watermark, dict):
+        print("⚠️  Cannot update: the models were saved with an _id watermark (before visit_date/visit_id ones)")
+        return False
+    after = visits_after(ml_models.watermark)
+    watermark = latest_visit(db, after)
+    if watermark is None:
+        print("✅ No new visits since the last training")
+        return True
+    # Bounded by the new watermark: visits inserted from here on wait for the next run
+    new = {'$and': [after, {'$nor': [visits_after(watermark)]}]}
+    new_visit_ids, patient_ids = set(), set()
+    for visit in db.visits_processed.find(new, {'visit_id': 1, 'patient_id': 1, '_id': 0}):
+        new_visit_ids.add(visit.get('visit_id'))
+        patient_ids.add(visit.get('patient_id'))
+
+    # The progression features need the earlier visits of those patients too
+    patients_df, visits_df = load_training_frames(db, args.chunk_size, patient_ids)
+    new_rows = visits_df['visit_id'].isin(new_visit_ids)
+    print(f"✅ Loaded {int(new_rows.sum())} new visits of {len(patient_ids)} patients "
+          f"({len(visits_df)} visits with their history)")
+    try:
+        datasets = ml_models.prepare_update_data(patients_df, visits_df, new_rows)
+    except ValueError as e:
+        print(f"⚠️  Cannot update: {e}")
+        return False
+
+    action, report = ml_models.update_models(datasets)
+    for name, checks in report.items():
+        details = ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in checks.items())
+        print(f"   {name}: {details}")
+    if action == 'retrain':
+        return False
+    if action == 'skipped':
+        print("⏳ Too few new rows to update; they are used by the next run")
+        return True
+
+    print("\n💾 Saving updated models...")
+    ml_models.watermark = watermark
+    ml_models.save_models()
+    return True
+
+
+def main(args):
+    print("="*60)
+    print("🏥 Healthcare ML Model Training Pipeline")
+    print("="*60)
+
+    # Connect to MongoDB
+    print("\n📊 Connecting to MongoDB...")
+    client = MongoClient(MONGO_URI)
+    db = client[MONGO_DB]
+
+    if args.incremental:
+        if update_incrementally(db, args):
+            client.close()
+            return
+        print("\n🔁 Falling back to a full training")
+
+    # Stream the feature columns from MongoDB into typed frames; visits
+    # inserted after the watermark are picked up by the next incremental run
+    print("📥 Loading patient and visit data from MongoDB...")
+    watermark = latest_visit(db)
+    patients_df, visits_df = load_training_frames(db, chunk_size=args.chunk_size)
+    print(f"✅ Loaded {len(patients_df)} patient records")
+    print(f"✅ Loaded {len(visits_df)} visit records")
+    print(f"   In memory: {(patients_df.memory_usage(deep=True).sum() + visits_df.memory_usage(deep=True).sum()) / 1e6:.1f} MB")
+
+    # Generate synthetic visit data if needed
+    if len(visits_df) < 100 and len(patients_df) > 100:
+        print("\n🔧 Generating synthetic visit data from patient records...")
+        visits_df = generate_visits(patients_df, np.random.default_rng(42))
+        watermark = None  # nothing to update incrementally from
+        print(f"✅ Generated {len(visits_df)} synthetic visit records")
+
+    # Check if we have enough data
+    if len(patients_df) < 100:
+        print("⚠️  Warning: Insufficient patient data. Need at least 100 records.")
+        print("   Please run PySpark processor to load more data.")
+        exit(1)
+
+    # Initialize ML models
+    print("\n🔧 Initializing ML models...")
+    ml_models = HealthcareMLModels(fast_tier=args.fast_tier, risk_engine=args.risk_engine, rebalance=args.rebalance)
+    ml_models.watermark = watermark
+
+    # Join and encode the features once per data version (fits the shared
+    # label encoders and fill values); an unchanged data set reuses the stored matrices
+    print("\n🗄️  Materializing features...")
+    store = FeatureStore(args.feature_store)
+    version, built = store.materialize(ml_models, patients_df, visits_df)
+    print(f"{'✅ Built' if built else '♻️  Reusing'} feature store version {version}")
+    # Visits are joined with their patient (left join): one training row per visit
+    print(f"✅ Training dataset: {len(visits_df)} records")
+    ml_models.label_encoders = store.label_encoders(version)
+    ml_models.fill_values = store.fill_values(version)
+    datasets = store.datasets(version)
+
+    print("\n" + "="*60)
+    print("MODEL 1: 30-DAY READMISSION PREDICTION")
+    print("="*60)
+    X_readmission, y_readmission = datasets['readmission']
     print(f"📊 Training data shape: {X_readmission.shape}")
     print(f"📊 Target distribution: {y_readmission.value_counts().to_dict()}")
-    
-    accuracy_readmission = ml_models.train_readmission_model(X_readmission, y_readmission)
-    print(f"🎯 Final Accuracy: {accuracy_readmission:.2%}")
-except Exception as e:
-    print(f"❌ Error training readmission model: {e}")
-
-# Train Model 2: Risk Scoring
-print("\n" + "="*60)
-print("MODEL 2: HEALTH RISK SCORING (0-100)")
-print("="*60)
-try:
-    X_risk, y_risk = ml_models.prepare_risk_score_data(patients_df, visits_df)
+
+    print("\n" + "="*60)
+    print("MODEL 2: HEALTH RISK SCORING (0-100)")
+    print("="*60)
+    X_risk, y_risk = datasets['risk_score']
     print(f"📊 Training data shape: {X_risk.shape}")
     print(f"📊 Risk score range: {y_risk.min():.2f} - {y_risk.max():.2f}")
-    
-    r2_risk = ml_models.train_risk_scoring_model(X_risk, y_risk)
-    print(f"🎯 Final R² Score: {r2_risk:.3f}")
-except Exception as e:
-    print(f"❌ Error training risk scoring model: {e}")
-
-# Train Model 3: Disease Progression
-print("\n" + "="*60)
-print("MODEL 3: DISEASE PROGRESSION PREDICTION")
-print("="*60)
-try:
+
+    print("\n" + "="*60)
+    print("MODEL 3: DISEASE PROGRESSION PREDICTION")
+    print("="*60)
     if len(visits_df) > 20:  # Need sufficient visit history
-        X_progression, y_progression = ml_models.prepare_disease_progression_data(visits_df)
+        X_progression, y_progression = datasets['disease_progression']
         print(f"📊 Training data shape: {X_progression.shape}")
         print(f"📊 Progression distribution: {y_progression.value_counts().to_dict()}")
-        
-        accuracy_progression = ml_models.train_disease_progression_model(X_progression, y_progression)
-        print(f"🎯 Final Accuracy: {accuracy_progression:.2%}")
     else:
         print("⚠️  Insufficient visit history for disease progression model")
-except Exception as e:
-    print(f"❌ Error training disease progression model: {e}")
-
-# Save all models
-print("\n" + "="*60)
-print("💾 SAVING TRAINED MODELS")
-print("="*60)
-ml_models.save_models()
-
-# Test predictions with sample data
-print("\n" + "="*60)
-print("🧪 TESTING PREDICTIONS WITH SAMPLE DATA")
-print("="*60)
-
-# Sample patient for testing (use values matching the actual data format)
-sample_patient_readmission = {
-    'age': 65,
-    'gender': 'Male',
-    'bmi': 28.5,
-    'smoker_status': 'yes',
-    'alcohol_use': 'no',
-    'severity_score': 7,
-    'length_of_stay': 4,
-    'previous_visit_gap_days': 45,
-    'number_of_previous_visits': 3
-}
-
-sample_patient_risk = {
-    'age': 65,
-    'gender': 'Male',
-    'bmi': 28.5,
-    'smoker_status': 'yes',
-    'alcohol_use': 'no',
-    'severity_score': 7,
-    'length_of_stay': 4,
-    'number_of_previous_visits': 3
-}
-
-print("\n📋 Sample Patient Profile:")
-for key, value in sample_patient_readmission.items():
-    print(f"   {key}: {value}")
-
-# Test readmission prediction
-print("\n🔮 Readmission Prediction:")
-readmission_result = ml_models.predict_readmission(sample_patient_readmission)
-print(f"   Risk Level: {readmission_result.get('readmission_risk', 'N/A')}")
-print(f"   Probability: {readmission_result.get('probability', 0):.1%}")
-print(f"   Recommendation: {readmission_result.get('recommendation', 'N/A')}")
-
-# Test risk scoring
-print("\n🔮 Health Risk Score:")
-risk_result = ml_models.predict_risk_score(sample_patient_risk)
-print(f"   Risk Score: {risk_result.get('risk_score', 0):.1f}/100")
-print(f"   Category: {risk_result.get('category', 'N/A')}")
-
-# Test disease progression
-print("\n🔮 Disease Progression:")
-sample_visit = {
-    'prev_severity': 5,
-    'length_of_stay': 4,
-    'previous_visit_gap_days': 45,
-    'number_of_previous_visits': 3
-}
-progression_result = ml_models.predict_disease_progression(sample_visit)
-print(f"   Trend: {progression_result.get('progression', 'N/A')}")
-print(f"   Confidence: {progression_result.get('confidence', 0):.1%}")
-
-print("\n" + "="*60)
-print("✅ MODEL TRAINING COMPLETE!")
-print("="*60)
-print("\n📝 Next Steps:")
-print("   1. Models saved in 'ml_models_saved/' directory")
-print("   2. Use app.py API endpoints for real-time predictions")
-print("   3. Integrate predictions into frontend dashboard")
-print("   4. Monitor model performance over time")
-
-client.close()
+        del datasets['disease_progression']
+
+    # Choose the hyperparameters: search them, or keep those of the active models
+    if args.search:
+        print("\n" + "="*60)
+        print("🔎 HYPERPARAMETER SEARCH")
+        print("="*60)
+        ml_models.search_reports = search_all(datasets, n_jobs=args.jobs, time_budget=args.search_budget,
+                                              risk_engine=args.risk_engine, rebalance=args.rebalance)
+        for name, report in ml_models.search_reports.items():
+            ml_models.hyperparameters[name] = report['best']
+            print(f"🏆 {name}: {report['best']} ({report['metric']} {report['score']:.3f}, "
+                  f"{report['trials']} trials in {report['seconds']:.0f}s"
+                  f"{', stopped early' if report['stopped_early'] else ''})")
+    else:
+        for name, params in ml_models.load_hyperparameters().items():
+            print(f"⚙️  {name}: {params} (from the active models)")
+
+    # Train the models concurrently (one process each) within the core budget
+    print("\n" + "="*60)
+    print("🧠 TRAINING MODELS")
+    print("="*60)
+    results = ml_models.train_all(datasets, n_jobs=args.jobs, processes=1 if args.sequential else None)
+    labels = {
+        'readmission': "Readmission Accuracy",
+        'risk_score': "Risk Scoring R² Score",
+        'disease_progression': "Disease Progression Accuracy"
+    }
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            print(f"❌ Error training {name} model: {result}")
+        elif name == 'risk_score':
+            print(f"🎯 {labels[name]}: {result:.3f}")
+        else:
+            print(f"🎯 {labels[name]}: {result:.2%}")
+
+    # Compare the full and fast tiers
+    if ml_models.tier_reports:
+        print("\n" + "="*60)
+        print("⚡ MODEL TIERS")
+        print("="*60)
+        ml_models.print_tier_report()
+
+    # Save all models
+    print("\n" + "="*60)
+    print("💾 SAVING TRAINED MODELS")
+    print("="*60)
+    ml_models.save_models()
+
+    # Test predictions with sample data
+    print("\n" + "="*60)
+    print("🧪 TESTING PREDICTIONS WITH SAMPLE DATA")
+    print("="*60)
+
+    # Sample patient for testing (use values matching the actual data format)
+    sample_patient_readmission = {
+        'age': 65,
+        'gender': 'Male',
+        'bmi': 28.5,
+        'smoker_status': 'yes',
+        'alcohol_use': 'no',
+        'severity_score': 7,
+        'length_of_stay': 4,
+        'previous_visit_gap_days': 45,
+        'number_of_previous_visits': 3
+    }
+
+    sample_patient_risk = {
+        'age': 65,
+        'gender': 'Male',
+        'bmi': 28.5,
+        'smoker_status': 'yes',
+        'alcohol_use': 'no',
+        'severity_score': 7,
+        'length_of_stay': 4,
+        'number_of_previous_visits': 3
+    }
+
+    print("\n📋 Sample Patient Profile:")
+    for key, value in sample_patient_readmission.items():
+        print(f"   {key}: {value}")
+
+    # Test readmission prediction
+    print("\n🔮 Readmission Prediction:")
+    readmission_result = ml_models.predict_readmission(sample_patient_readmission)
+    print(f"   Risk Level: {readmission_result.get('readmission_risk', 'N/A')}")
+    print(f"   Probability: {readmission_result.get('probability', 0):.1%}")
+    print(f"   Recommendation: {readmission_result.get('recommendation', 'N/A')}")
+
+    # Test risk scoring
+    print("\n🔮 Health Risk Score:")
+    risk_result = ml_models.predict_risk_score(sample_patient_risk)
+    print(f"   Risk Score: {risk_result.get('risk_score', 0):.1f}/100")
+    print(f"   Category: {risk_result.get('category', 'N/A')}")
+
+    # Test disease progression
+    print("\n🔮 Disease Progression:")
+    sample_visit = {
+        'prev_severity': 5,
+        'length_of_stay': 4,
+        'previous_visit_gap_days': 45,
+        'number_of_previous_visits': 3
+    }
+    progression_result = ml_models.predict_disease_progression(sample_visit)
+    print(f"   Trend: {progression_result.get('progression', 'N/A')}")
+    print(f"   Confidence: {progression_result.get('confidence', 0):.1%}")
+
+    print("\n" + "="*60)
+    print("✅ MODEL TRAINING COMPLETE!")
+    print("="*60)
+    print("\n📝 Next Steps:")
+    print("   1. Models saved in 'ml_models_saved/' directory")
+    print("   2. Use app.py API endpoints for real-time predictions")
+    print("   3. Integrate predictions into frontend dashboard")
+    print("   4. Monitor model performance over time")
+
+    client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the healthcare ML models on the MongoDB data")
+    parser.add_argument('--fast-tier', action='store_true', help="also distill compact fast-tier models")
+    parser.add_argument('--jobs', type=int, default=None, help="core budget for training (default: all cores)")
+    parser.add_argument('--sequential', action='store_true',
+                        help="train the models one after another instead of in parallel processes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="documents converted at a time while loading")
+    parser.add_argument('--feature-store', default=FEATURE_STORE_DIR,
+                        help="directory of the materialized features (default: FEATURE_STORE_DIR)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="update the active models with the visits added since their last training")
+    parser.add_argument('--risk-engine', choices=list(RISK_ENGINES), default=DEFAULT_RISK_ENGINE,
+                        help=f"estimator of the risk model (default: {DEFAULT_RISK_ENGINE})")
+    parser.add_argument('--rebalance', choices=REBALANCE_STRATEGIES, default=DEFAULT_REBALANCE,
+                        help=f"how the readmission classes are balanced (default: {DEFAULT_REBALANCE})")
+    parser.add_argument('--search', action='store_true',
+                        help="search the hyperparameters (successive halving) before training")
+    parser.add_argument('--search-budget', type=float, default=None,
+                        help="seconds the search may take (default: no limit)")
+    main(parser.parse_args())
@@ -0,0 +1,182 @@
+"""
+Streaming Training Data Loader
+Builds the training DataFrames from patients_processed / visits_processed
+without holding every document in memory:
+
+- Projections fetch only the feature, join and target fields (no `_id`)
+- Batched cursors are read chunk by chunk; each chunk becomes typed NumPy
+  columns (float64 numbers, datetime64 dates) before the next one is read
+- Text columns (gender, smoker_status, alcohol_use, the readmission target and
+  patient_id) become pandas categoricals: integer codes plus one copy of each
+  distinct value. Patients and visits share the patient_id categories, so the
+  training merge joins on the codes.
+
+Peak memory is about twice the final frames (the chunk arrays and their
+concatenation) plus one chunk of documents.
+
+Usage:
+    python training_data.py                      # load both collections and report their size
+    python training_data.py --chunk-size 100000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB Configuration
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+MONGO_DB = os.getenv('MONGO_DB', 'healthcare_analytics')
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Column -> type of the loaded frame ('category', 'float64', 'datetime64[ns]' or
+# 'object' for unique keys, kept as Python values)
+PATIENT_COLUMNS = {
+    'patient_id': 'category', 'age': 'float64', 'gender': 'category', 'bmi': 'float64',
+    'smoker_status': 'category', 'alcohol_use': 'category'
+}
+VISIT_COLUMNS = {
+    'visit_id': 'object', 'patient_id': 'category', 'visit_date': 'datetime64[ns]', 'severity_score': 'float64',
+    'length_of_stay': 'float64', 'previous_visit_gap_days': 'float64', 'number_of_previous_visits': 'float64',
+    'readmitted_within_30_days': 'category'
+}
+
+
+class CategoryEncoder:
+    """Value -> integer code, grown chunk by chunk (missing values get -1)"""
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, values):
+        local, uniques = pd.factorize(pd.Series(values, dtype=object))
+        # The extra last slot keeps the missing code -1
+        codes = [self.codes.setdefault(value, len(self.codes)) for value in uniques] + [-1]
+        return np.array(codes, dtype=np.int32)[local]
+
+    def categorical(self, codes):
+        """Codes from encode() as a pandas Categorical with sorted categories"""
+        values = list(self.codes)
+        order = sorted(range(len(values)), key=lambda i: str(values[i]))
+        # The extra last slot maps the missing code -1 to itself
+        remap = np.full(len(values) + 1, -1, dtype=np.int32)
+        remap[order] = np.arange(len(values), dtype=np.int32)
+        return pd.Categorical.from_codes(remap[codes], [values[i] for i in order])
+
+
+def _numbers(values):
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Stray text in a numeric field: treat it as missing
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(np.float64)
+
+
+def _dates(values):
+    try:
+        return np.array(values, dtype='datetime64[ns]')
+    except (TypeError, ValueError):
+        # Non-ISO date strings: let pandas parse them, unparseable ones become NaT
+        return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce').to_numpy('datetime64[ns]')
+
+
+def _chunks(documents, chunk_size):
+    chunk = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_frame(documents, columns, encoders=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build a typed DataFrame from documents, one chunk at a time
+
+    Args:
+        documents: a pymongo cursor (or any iterable of dicts)
+        columns: column -> type, as in PATIENT_COLUMNS
+        encoders: column -> CategoryEncoder, shared between frames whose
+            categorical columns should get the same codes (filled in here)
+        chunk_size: documents converted at a time
+
+    Returns:
+        DataFrame with one column per entry of `columns`
+    """
+    encoders = {} if encoders is None else encoders
+    parts = {col: [] for col in columns}
+    for chunk in _chunks(documents, chunk_size):
+        for col, kind in columns.items():
+            values = [document.get(col) for document in chunk]
+            if kind == 'category':
+                parts[col].append(encoders.setdefault(col, CategoryEncoder()).encode(values))
+            elif kind == 'datetime64[ns]':
+                parts[col].append(_dates(values))
+            elif kind == 'object':
+                parts[col].append(np.array(values, dtype=object))
+            else:
+                parts[col].append(_numbers(values))
+
+    data = {}
+    for col, kind in columns.items():
+        dtype = {'category': np.int32, 'object': object}.get(kind, kind)
+        column = np.concatenate(parts.pop(col)) if parts[col] else np.empty(0, dtype=dtype)
+        data[col] = encoders.setdefault(col, CategoryEncoder()).categorical(column) if kind == 'category' else column
+    return pd.DataFrame(data, copy=False)
+
+
+def _projection(columns):
+    return {col: 1 for col in columns} | {'_id': 0}
+
+
+def load_training_frames(db, chunk_size=DEFAULT_CHUNK_SIZE, patient_ids=None):
+    """
+    Load patients_processed and visits_processed for training
+
+    Args:
+        patient_ids: load only these patients and their visits (default: all)
+
+    Returns:
+        (patients_df, visits_df) with the PATIENT_COLUMNS / VISIT_COLUMNS types
+    """
+    query = {} if patient_ids is None else {'patient_id': {'$in': list(patient_ids)}}
+    encoders = {}
+    patients_df = load_frame(
+        db.patients_processed.find(query, _projection(PATIENT_COLUMNS)).batch_size(chunk_size),
+        PATIENT_COLUMNS, encoders, chunk_size
+    )
+    visits_df = load_frame(
+        db.visits_processed.find(query, _projection(VISIT_COLUMNS)).batch_size(chunk_size),
+        VISIT_COLUMNS, encoders, chunk_size
+    )
+    # Visits may name patients missing from patients_processed
+    patients_df['patient_id'] = patients_df['patient_id'].cat.set_categories(visits_df['patient_id'].cat.categories)
+    return patients_df, visits_df
+
+
+def main(args):
+    client = MongoClient(MONGO_URI)
+    start = time.perf_counter()
+    patients_df, visits_df = load_training_frames(client[MONGO_DB], args.chunk_size)
+    elapsed = time.perf_counter() - start
+    for name, frame in [('patients', patients_df), ('visits', visits_df)]:
+        size = frame.memory_usage(deep=True).sum()
+        print(f"✅ {name}: {len(frame):,} rows, {size / 1e6:.1f} MB")
+    print(f"⏱️  Loaded in {elapsed:.1f}s")
+    client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream the training data from MongoDB into typed frames")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="documents converted at a time")
+    main(parser.parse_args())
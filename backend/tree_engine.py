@@ -0,0 +1,386 @@
+"""
+Compiled Tree Ensemble Inference
+- Flattens fitted RandomForest / GradientBoosting / HistGradientBoosting
+  models into contiguous NumPy arrays (feature, threshold, children, value;
+  category bitsets for the categorical splits of histogram boosting)
+- Evaluates every tree for a whole batch with vectorized NumPy
+- Loading and scoring need NumPy/joblib only (no scikit-learn import)
+- Saved arrays are already in their serving dtypes, so `.joblib` artifacts
+  are memory-mapped read-only and shared through the page cache by every
+  process that loads them
+"""
+
+import joblib
+import numpy as np
+
+FOREST_CLASSIFIER = 'forest_classifier'
+BOOSTING_REGRESSOR = 'boosting_regressor'
+
+
+class CompiledEnsemble:
+    """
+    Array form of a tree ensemble. Leaves point to themselves, so a batch
+    is routed by repeating one vectorized step `max_depth` times without
+    any per-row leaf checks.
+    """
+
+    def __init__(self, kind, feature, threshold, children, value, roots, max_depth,
+                 classes=None, init=0.0, learning_rate=1.0, bitset_idx=None, left_categories=None,
+                 input_dtype='float32', missing_left=None):
+        # Arrays are kept as given (np.asarray does not copy), so memory-mapped
+        # artifacts are never duplicated into process memory
+        self.kind = kind
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        # Interleaved (right, left) pairs: next node = children[2 * node + go_left]
+        self.children = np.asarray(children, dtype=np.intp)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.init = float(init)
+        self.learning_rate = float(learning_rate)
+        # Categorical splits (histogram boosting): node -> row of
+        # left_categories (-1 for threshold splits), a 256-bit set per row of
+        # the category codes that go left
+        self.bitset_idx = None if bitset_idx is None else np.asarray(bitset_idx, dtype=np.intp)
+        self.left_categories = None if left_categories is None else np.asarray(left_categories, dtype=np.uint32)
+        # Expanded once to a (rows, 256) boolean table: one lookup per level
+        self._left_table = None if left_categories is None else np.unpackbits(
+            np.ascontiguousarray(self.left_categories, dtype='<u4').view(np.uint8), axis=1, bitorder='little'
+        ).astype(bool)
+        # scikit-learn trees split float32 features, histogram boosting float64
+        self.input_dtype = input_dtype
+        # Histogram boosting: node -> whether missing values (NaN, and
+        # categories out of the 0-255 range) go left; None sends them right
+        self.missing_left = None if missing_left is None else np.asarray(missing_left, dtype=bool)
+
+    @property
+    def left(self):
+        return self.children[1::2]
+
+    @property
+    def right(self):
+        return self.children[0::2]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        arrays = (self.feature, self.threshold, self.children, self.value, self.roots,
+                  self.bitset_idx, self.left_categories, self.missing_left)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted RandomForestClassifier, GradientBoostingRegressor or HistGradientBoostingRegressor"""
+        name = type(model).__name__
+        if name == 'HistGradientBoostingRegressor':
+            return cls._from_hist_boosting(model)
+        if name == 'RandomForestClassifier':
+            trees = [estimator.tree_ for estimator in model.estimators_]
+            values = []
+            for tree in trees:
+                # Per-leaf class fractions, normalized as DecisionTreeClassifier.predict_proba does
+                value = tree.value[:, 0, :].astype(np.float64)
+                total = value.sum(axis=1, keepdims=True)
+                total[total == 0.0] = 1.0
+                values.append(value / total)
+            kind, classes = FOREST_CLASSIFIER, np.asarray(model.classes_)
+            init, learning_rate = 0.0, 1.0
+        elif name == 'GradientBoostingRegressor':
+            trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+            values = [tree.value[:, 0, :1].astype(np.float64) for tree in trees]
+            kind, classes = BOOSTING_REGRESSOR, None
+            if model.init_ == 'zero':
+                init = 0.0
+            else:
+                init = float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+            learning_rate = model.learning_rate
+        else:
+            raise TypeError(f"Cannot compile {name}")
+
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        left, right = [], []
+        for tree, offset in zip(trees, offsets):
+            ids = np.arange(tree.node_count, dtype=np.int32) + offset
+            is_leaf = tree.children_left == -1
+            left.append(np.where(is_leaf, ids, tree.children_left + offset).astype(np.int32))
+            right.append(np.where(is_leaf, ids, tree.children_right + offset).astype(np.int32))
+
+        return cls(
+            kind=kind,
+            feature=np.concatenate([np.maximum(tree.feature, 0) for tree in trees]),
+            threshold=np.concatenate([tree.threshold for tree in trees]),
+            children=_interleave(np.concatenate(left), np.concatenate(right)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=offsets[:-1],
+            max_depth=max(tree.max_depth for tree in trees),
+            classes=classes,
+            init=init,
+            learning_rate=learning_rate
+        )
+
+    @classmethod
+    def _from_hist_boosting(cls, model):
+        """
+        Compile a HistGradientBoostingRegressor: leaf values are already
+        shrunk by the learning rate and added to the baseline prediction.
+        Its internal nodes carry no usable value, so each gets the
+        sample-weighted mean of its children (as scikit-learn trees store),
+        which the feature contributions need. Categories not seen in
+        training are routed like missing values, as scikit-learn does: they
+        are added to the left sets of the nodes that send missing values left.
+        """
+        predictors = [iteration[0] for iteration in model._predictors]
+        features, thresholds, lefts, rights, values, bitset_idx, bitsets = [], [], [], [], [], [], []
+        missing_left = []
+        if model._bin_mapper.is_categorical_.any():
+            known, known_idx = model._bin_mapper.make_known_categories_bitsets()
+        offset = n_bitsets = 0
+        roots = []
+        for predictor in predictors:
+            nodes = predictor.nodes
+            ids = np.arange(len(nodes), dtype=np.intp) + offset
+            leaf = nodes['is_leaf'].astype(bool)
+            left, right = nodes['left'].astype(np.intp), nodes['right'].astype(np.intp)
+            value = nodes['value'].astype(np.float64)
+            count = nodes['count'].astype(np.float64)
+            depth = nodes['depth'].astype(np.intp)
+            for level in range(int(depth.max()) - 1, -1, -1):
+                parents = np.flatnonzero(~leaf & (depth == level))
+                l, r = left[parents], right[parents]
+                value[parents] = (count[l] * value[l] + count[r] * value[r]) / np.maximum(count[l] + count[r], 1.0)
+
+            categorical = nodes['is_categorical'].astype(bool) & ~leaf
+            left_sets = np.array(predictor.raw_left_cat_bitsets, dtype=np.uint32)
+            unknown_left = np.flatnonzero(categorical & nodes['missing_go_to_left'].astype(bool))
+            for node in unknown_left:
+                row = nodes['bitset_idx'][node]
+                left_sets[row] |= ~known[known_idx[nodes['feature_idx'][node]]]
+            roots.append(offset)
+            features.append(nodes['feature_idx'].astype(np.intp))
+            thresholds.append(nodes['num_threshold'].astype(np.float64))
+            lefts.append(np.where(leaf, ids, left + offset))
+            rights.append(np.where(leaf, ids, right + offset))
+            values.append(value[:, None])
+            bitset_idx.append(np.where(categorical, nodes['bitset_idx'].astype(np.intp) + n_bitsets, -1))
+            bitsets.append(left_sets)
+            missing_left.append(nodes['missing_go_to_left'].astype(bool))
+            offset += len(nodes)
+            n_bitsets += len(predictor.raw_left_cat_bitsets)
+
+        bitset_idx = np.concatenate(bitset_idx)
+        has_categories = bool((bitset_idx >= 0).any())
+        return cls(
+            kind=BOOSTING_REGRESSOR,
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=_interleave(np.concatenate(lefts), np.concatenate(rights)),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max(int(predictor.nodes['depth'].max()) for predictor in predictors),
+            init=float(np.ravel(model._baseline_prediction)[0]),
+            learning_rate=1.0,
+            bitset_idx=bitset_idx if has_categories else None,
+            left_categories=np.concatenate(bitsets).astype(np.uint32) if has_categories else None,
+            input_dtype='float64',
+            missing_left=np.concatenate(missing_left)
+        )
+
+    def _leaf_chunks(self, X, chunk_size=1024):
+        """
+        Yield (row slice, leaf node ids of shape (rows, n_trees)) for X,
+        routed in row chunks so the working set stays cache-sized
+        """
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=self.input_dtype)
+        n_rows, n_features = X.shape
+        for start in range(0, n_rows, chunk_size):
+            rows = slice(start, min(start + chunk_size, n_rows))
+            block = X[rows]
+            flat = block.ravel()
+            offsets = (np.arange(block.shape[0], dtype=np.intp) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (block.shape[0], self.n_trees)).copy()
+            for _ in range(self.max_depth):
+                values = flat[offsets + self.feature[nodes]]
+                go_left = values <= self.threshold[nodes]
+                missing = None if self.missing_left is None else np.isnan(values)
+                if self.bitset_idx is not None:
+                    # Threshold nodes (-1) read a table row too; np.where drops it
+                    bitsets = self.bitset_idx[nodes]
+                    codes = np.minimum(np.fmax(values, 0.0), 255.0).astype(np.intp)
+                    go_left = np.where(bitsets >= 0, self._left_table[bitsets, codes], go_left)
+                    if missing is not None:
+                        missing |= (bitsets >= 0) & ((values < 0) | (values > 255))
+                if missing is not None:
+                    go_left = np.where(missing, self.missing_left[nodes], go_left)
+                nodes = self.children[2 * nodes + go_left]
+            yield rows, nodes
+
+    def apply(self, X):
+        """Leaf node index of every (row, tree) pair, shape (n_rows, n_trees)"""
+        X = np.atleast_2d(X)
+        leaves = np.empty((X.shape[0], self.n_trees), dtype=np.intp)
+        for rows, nodes in self._leaf_chunks(X):
+            leaves[rows] = nodes
+        return leaves
+
+    def _sum_leaf_values(self, X):
+        X = np.atleast_2d(X)
+        totals = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for rows, nodes in self._leaf_chunks(X):
+            totals[rows] = self.value[nodes].sum(axis=1)
+        return totals
+
+    def predict_proba(self, X):
+        if self.kind != FOREST_CLASSIFIER:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._sum_leaf_values(X) / self.n_trees
+
+    def predict(self, X):
+        if self.kind == FOREST_CLASSIFIER:
+            return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+        return self.init + self.learning_rate * self._sum_leaf_values(X)[:, 0]
+
+    def _table_outputs(self):
+        # Class fractions sum to 1 at every node, so the last class's
+        # contributions are minus the sum of the others
+        n_out = self.value.shape[1]
+        return n_out - 1 if self.kind == FOREST_CLASSIFIER and n_out > 1 else n_out
+
+    def path_contributions(self, n_features):
+        """
+        (n_nodes, n_features, n_outputs) table: for every node, the summed
+        value changes of the splits on the path from its tree's root,
+        credited to each split's feature. Built level by level on first use
+        and kept for later calls.
+        """
+        cached = getattr(self, '_path_table', None)
+        if cached is not None and cached.shape[1] == n_features:
+            return cached
+
+        n_table = self._table_outputs()
+        table = np.zeros((len(self.feature), n_features, n_table), dtype=np.float64)
+        frontier = self.roots
+        for _ in range(self.max_depth):
+            right, left = self.children[2 * frontier], self.children[2 * frontier + 1]
+            internal = left != frontier
+            parents = frontier[internal]
+            if not len(parents):
+                break
+            features = self.feature[parents]
+            for children in (left[internal], right[internal]):
+                table[children] = table[parents]
+                table[children, features] += self.value[children, :n_table] - self.value[parents, :n_table]
+            frontier = np.concatenate([left[internal], right[internal]])
+        self._path_table = table
+        return table
+
+    def contributions(self, X):
+        """
+        Per-prediction feature contributions (Saabas): every split on a
+        row's decision path credits its feature with the change in node
+        value, so bias + contributions.sum(axis=1) equals the prediction.
+        Rows are routed as in apply() and each leaf's precomputed path
+        contributions (path_contributions) are summed over the trees.
+
+        Returns:
+            (bias, contributions): for classifiers bias has shape (n_classes,)
+            and contributions (n_rows, n_features, n_classes) in probability
+            units; for regressors a float and (n_rows, n_features)
+        """
+        X = np.atleast_2d(X)
+        n_rows, n_features = X.shape
+        n_out, n_table = self.value.shape[1], self._table_outputs()
+        table = self.path_contributions(n_features)
+
+        contributions = np.empty((n_rows, n_features, n_out), dtype=np.float64)
+        for rows, nodes in self._leaf_chunks(X):
+            contributions[rows, :, :n_table] = table[nodes].sum(axis=1)
+        if n_table < n_out:
+            contributions[:, :, -1] = -contributions[:, :, :-1].sum(axis=2)
+
+        root_values = self.value[self.roots]
+        if self.kind == FOREST_CLASSIFIER:
+            return root_values.mean(axis=0), contributions / self.n_trees
+        bias = self.init + self.learning_rate * float(root_values[:, 0].sum())
+        return bias, self.learning_rate * contributions[:, :, 0]
+
+    def _fields(self):
+        fields = {
+            'kind': self.kind,
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'children': self.children,
+            'value': self.value,
+            'roots': self.roots,
+            'max_depth': self.max_depth,
+            'classes': self.classes_,
+            'init': self.init,
+            'learning_rate': self.learning_rate
+        }
+        if self.bitset_idx is not None:
+            fields.update(bitset_idx=self.bitset_idx, left_categories=self.left_categories)
+        if self.missing_left is not None:
+            fields['missing_left'] = self.missing_left
+        if self.input_dtype != 'float32':
+            fields['input_dtype'] = self.input_dtype
+        return fields
+
+    def save(self, path):
+        """
+        Save as `.joblib` (uncompressed, memory-mappable) or, for paths
+        ending in `.npz`, as a NumPy archive that is read fully into memory
+        """
+        if not str(path).endswith('.npz'):
+            joblib.dump(self._fields(), path)
+            return
+        if self.bitset_idx is not None or self.missing_left is not None or self.input_dtype != 'float32':
+            raise ValueError("Histogram boosting ensembles are saved as .joblib only")
+
+        np.savez(
+            path,
+            kind=np.array(self.kind),
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            max_depth=np.array(self.max_depth),
+            classes=self.classes_ if self.classes_ is not None else np.array([]),
+            init=np.array(self.init),
+            learning_rate=np.array(self.learning_rate)
+        )
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load a saved ensemble. `.joblib` arrays are memory-mapped with
+        `mmap_mode` (None reads them into memory).
+        """
+        if not str(path).endswith('.npz'):
+            return cls(**joblib.load(path, mmap_mode=mmap_mode))
+
+        with np.load(path, allow_pickle=False) as data:
+            kind = str(data['kind'])
+            return cls(
+                kind=kind,
+                feature=data['feature'],
+                threshold=data['threshold'],
+                children=_interleave(data['left'], data['right']),
+                value=data['value'],
+                roots=data['roots'],
+                max_depth=int(data['max_depth']),
+                classes=data['classes'] if kind == FOREST_CLASSIFIER else None,
+                init=float(data['init']),
+                learning_rate=float(data['learning_rate'])
+            )
+
+
+def _interleave(left, right):
+    """(right, left) child pairs as one flat intp array"""
+    return np.stack([right, left], axis=1).ravel().astype(np.intp)